@@ -109,6 +109,12 @@ async function run() {
 			break;
 		}
 
+		case 'test:python': {
+			testPython();
+
+			break;
+		}
+
 		case 'coverage': {
 			buildTypescript({ force: false });
 			replacePythonVersion();
@@ -226,6 +232,12 @@ function test() {
 	executeCmd(`jest --silent false --detectOpenHandles ${args}`);
 }
 
+function testPython() {
+	logInfo('testPython()');
+
+	executeCmd(`cd worker && "${PYTHON}" -m unittest discover -s tests && cd ..`);
+}
+
 function installNodeDeps() {
 	logInfo('installNodeDeps()');
 
@@ -9,6 +9,18 @@ import { Logger } from './Logger';
 const NS_MESSAGE_MAX_LEN = 4194313;
 const NS_PAYLOAD_MAX_LEN = 4194304;
 
+// First byte of a binary frame carrying a DataChannel message. JSON messages
+// always start with '{' instead.
+const BINARY_FRAME_KIND = 0x00;
+// Binary frame flag meaning that the payload is a UTF-8 string.
+const BINARY_FRAME_FLAG_STRING = 0x01;
+// Binary frame flag meaning that the payload is a sequence of messages, each
+// one prefixed by its flags (1 byte) and its length (4 bytes).
+const BINARY_FRAME_FLAG_MANY = 0x02;
+// Maximum payload of a binary frame with many messages, more messages go in
+// further frames.
+const BINARY_FRAME_MANY_MAX_SIZE = 1048576;
+
 const logger = new Logger('Channel');
 
 interface Sent {
@@ -81,10 +93,13 @@ export class Channel extends EnhancedEventEmitter {
 					return;
 				}
 
-				// We only expect JSON messages (Channel messages).
+				// We expect JSON messages (Channel messages) and binary frames
+				// (DataChannel messages).
 				// 123 = '{' (a Channel JSON messsage).
 				if (nsPayload[0] === 123) {
 					this.processMessage(JSON.parse(nsPayload));
+				} else if (nsPayload[0] === BINARY_FRAME_KIND) {
+					this.processBinaryFrame(nsPayload);
 				} else {
 					// eslint-disable-next-line no-console
 					console.warn(
@@ -238,6 +253,183 @@ export class Channel extends EnhancedEventEmitter {
 		}
 	}
 
+	/**
+	 * Send a DataChannel message as a binary frame so the payload is neither
+	 * JSON serialized nor base64 encoded.
+	 *
+	 * Binary frame layout:
+	 * - kind (1 byte, BINARY_FRAME_KIND)
+	 * - flags (1 byte)
+	 * - handlerId length (1 byte) + handlerId
+	 * - dataChannelId length (1 byte) + dataChannelId
+	 * - payload (raw bytes, or many messages if BINARY_FRAME_FLAG_MANY)
+	 */
+	notifyBinary(
+		internal: { handlerId: string; dataChannelId: string },
+		data: string | Buffer
+	): void {
+		if (this.#closed) {
+			logger.warn('notifyBinary() | Channel closed');
+
+			return;
+		}
+
+		const flags = typeof data === 'string' ? BINARY_FRAME_FLAG_STRING : 0;
+		const payload = typeof data === 'string' ? Buffer.from(data, 'utf8') : data;
+
+		this.writeBinaryFrame(internal, flags, payload);
+	}
+
+	/**
+	 * Same as notifyBinary() but for many messages, sent within as few binary
+	 * frames as possible.
+	 */
+	notifyBinaryMany(
+		internal: { handlerId: string; dataChannelId: string },
+		messages: (string | Buffer)[]
+	): void {
+		if (this.#closed) {
+			logger.warn('notifyBinaryMany() | Channel closed');
+
+			return;
+		}
+
+		let entries: Buffer[] = [];
+		let size = 0;
+
+		for (const data of messages) {
+			const payload = typeof data === 'string' ? Buffer.from(data, 'utf8') : data;
+			const header = Buffer.allocUnsafe(5);
+
+			header[0] = typeof data === 'string' ? BINARY_FRAME_FLAG_STRING : 0;
+			header.writeUInt32BE(payload.length, 1);
+
+			if (
+				entries.length > 0 &&
+				size + header.length + payload.length > BINARY_FRAME_MANY_MAX_SIZE
+			) {
+				this.writeBinaryFrame(
+					internal,
+					BINARY_FRAME_FLAG_MANY,
+					Buffer.concat(entries, size)
+				);
+
+				entries = [];
+				size = 0;
+			}
+
+			entries.push(header, payload);
+			size += header.length + payload.length;
+		}
+
+		if (entries.length > 0) {
+			this.writeBinaryFrame(
+				internal,
+				BINARY_FRAME_FLAG_MANY,
+				Buffer.concat(entries, size)
+			);
+		}
+	}
+
+	private writeBinaryFrame(
+		internal: { handlerId: string; dataChannelId: string },
+		flags: number,
+		payload: Buffer
+	): void {
+		const handlerId = Buffer.from(internal.handlerId, 'utf8');
+		const dataChannelId = Buffer.from(internal.dataChannelId, 'utf8');
+		const frame = Buffer.concat([
+			Buffer.from([BINARY_FRAME_KIND, flags, handlerId.length]),
+			handlerId,
+			Buffer.from([dataChannelId.length]),
+			dataChannelId,
+			payload,
+		]);
+		const ns = netstring.nsWrite(frame);
+
+		if (Buffer.byteLength(ns) > NS_MESSAGE_MAX_LEN) {
+			logger.error(
+				'writeBinaryFrame() | message too big [length:%s]',
+				Buffer.byteLength(ns)
+			);
+
+			return;
+		}
+
+		// This may throw if closed or remote side ended.
+		try {
+			this.#socket.write(ns);
+		} catch (error) {
+			logger.warn('writeBinaryFrame() | failed: %s', String(error));
+		}
+	}
+
+	private processBinaryFrame(frame: Buffer): void {
+		const flags = frame[1];
+		let offset = 2;
+		const handlerIdLength = frame[offset];
+
+		offset += 1 + handlerIdLength;
+
+		const dataChannelIdLength = frame[offset];
+		const dataChannelId = frame.toString(
+			'utf8',
+			offset + 1,
+			offset + 1 + dataChannelIdLength
+		);
+
+		offset += 1 + dataChannelIdLength;
+
+		if (offset > frame.length) {
+			logger.error('received binary frame is too short');
+
+			return;
+		}
+
+		const payload = frame.subarray(offset);
+
+		if (flags & BINARY_FRAME_FLAG_MANY) {
+			const messages: (string | Buffer)[] = [];
+
+			offset = 0;
+
+			while (offset < payload.length) {
+				if (offset + 5 > payload.length) {
+					logger.error('received binary frame has wrong messages');
+
+					return;
+				}
+
+				const messageFlags = payload[offset];
+				const length = payload.readUInt32BE(offset + 1);
+
+				offset += 5;
+
+				if (offset + length > payload.length) {
+					logger.error('received binary frame has wrong messages');
+
+					return;
+				}
+
+				const message = payload.subarray(offset, offset + length);
+
+				offset += length;
+
+				messages.push(
+					messageFlags & BINARY_FRAME_FLAG_STRING
+						? message.toString('utf8')
+						: message
+				);
+			}
+
+			this.emit(dataChannelId, 'messages', messages);
+		} else if (flags & BINARY_FRAME_FLAG_STRING) {
+			this.emit(dataChannelId, 'message', payload.toString('utf8'));
+		} else {
+			this.emit(dataChannelId, 'binary', payload);
+		}
+	}
+
 	private processMessage(msg: any): void {
 		// If a response retrieve its associated request.
 		if (msg.id) {
@@ -40,6 +40,8 @@ export class FakeRTCDataChannel extends EventTarget implements RTCDataChannel {
 	#binaryType: BinaryType = 'arraybuffer';
 	// NOTE: Deprecated as per spec, but still required by TS/ RTCDataChannel.
 	#priority: RTCPriorityType = 'high';
+	// Messages given to send() not yet sent to the worker.
+	#pendingMessages: (string | Buffer)[] = [];
 
 	constructor(
 		internal: { handlerId: string; dataChannelId: string },
@@ -122,6 +124,8 @@ export class FakeRTCDataChannel extends EventTarget implements RTCDataChannel {
 	set bufferedAmountLowThreshold(value: number) {
 		this.#bufferedAmountLowThreshold = value;
 
+		this.flushMessages();
+
 		this.#channel.notify(
 			'datachannel.setBufferedAmountLowThreshold',
 			this.#internal,
@@ -200,6 +204,9 @@ export class FakeRTCDataChannel extends EventTarget implements RTCDataChannel {
 			return;
 		}
 
+		// Messages already given to send() go first.
+		this.flushMessages();
+
 		this.#readyState = 'closed';
 
 		// Remove notification subscriptions.
@@ -212,31 +219,81 @@ export class FakeRTCDataChannel extends EventTarget implements RTCDataChannel {
 	/**
 	 * We extend the definition of send() to allow Node Buffer. However
 	 * ArrayBufferView and Blob do not exist in Node.
+	 *
+	 * Messages sent within the same tick are given to the worker at once.
 	 */
 	send(data: string | ArrayBuffer | Buffer | ArrayBufferView | Blob): void {
 		if (this.#readyState !== 'open') {
 			throw new InvalidStateError('not open');
 		}
 
-		if (typeof data === 'string') {
-			this.#channel.notify('datachannel.send', this.#internal, data);
-		} else if (data instanceof ArrayBuffer) {
-			const buffer = Buffer.from(data);
-
-			this.#channel.notify(
-				'datachannel.sendBinary',
-				this.#internal,
-				buffer.toString('base64')
-			);
-		} else if (data instanceof Buffer) {
-			this.#channel.notify(
-				'datachannel.sendBinary',
-				this.#internal,
-				data.toString('base64')
+		this.#pendingMessages.push(toMessage(data));
+
+		if (this.#pendingMessages.length === 1) {
+			queueMicrotask(() => this.flushMessages());
+		}
+	}
+
+	/**
+	 * Send many messages at once.
+	 */
+	sendMany(messages: (string | ArrayBuffer | Buffer)[]): void {
+		if (this.#readyState !== 'open') {
+			throw new InvalidStateError('not open');
+		}
+
+		// Validate all of them before sending any.
+		const pendingMessages = messages.map(toMessage);
+
+		this.#pendingMessages.push(...pendingMessages);
+
+		this.flushMessages();
+	}
+
+	private flushMessages(): void {
+		if (this.#pendingMessages.length === 0) {
+			return;
+		}
+
+		const messages = this.#pendingMessages;
+
+		this.#pendingMessages = [];
+
+		// Closed meanwhile by the remote side, so the worker cannot send them.
+		if (this.#readyState !== 'open') {
+			logger.warn(
+				'flushMessages() | DataChannel closed, dropping %d messages',
+				messages.length
 			);
+
+			return;
+		}
+
+		if (messages.length === 1) {
+			this.#channel.notifyBinary(this.#internal, messages[0]);
 		} else {
-			throw new TypeError('invalid data type');
+			this.#channel.notifyBinaryMany(this.#internal, messages);
+		}
+	}
+
+	private dispatchMessage(data: string | Buffer): void {
+		if (typeof data === 'string') {
+			// @ts-expect-error --- On purpose.
+			this.dispatchEvent(new MessageEvent('message', { data }));
+
+			return;
 		}
+
+		// Copy the payload into a standalone ArrayBuffer.
+		const arrayBuffer = data.buffer.slice(
+			data.byteOffset,
+			data.byteOffset + data.byteLength
+		);
+
+		this.dispatchEvent(
+			// @ts-expect-error --- On purpose.
+			new MessageEvent('message', { data: arrayBuffer })
+		);
 	}
 
 	private handleWorkerNotifications(): void {
@@ -268,27 +325,18 @@ export class FakeRTCDataChannel extends EventTarget implements RTCDataChannel {
 						break;
 					}
 
-					case 'message': {
-						// @ts-expect-error --- On purpose.
-						this.dispatchEvent(new MessageEvent('message', { data }));
+					case 'message':
+					case 'binary': {
+						this.dispatchMessage(data as string | Buffer);
 
 						break;
 					}
 
-					case 'binary': {
-						const buffer = Buffer.from(data, 'utf-8');
-						const arrayBuffer = new ArrayBuffer(buffer.length);
-						const view = new Uint8Array(arrayBuffer);
-
-						for (let i = 0; i < buffer.length; ++i) {
-							view[i] = buffer[i];
+					case 'messages': {
+						for (const message of data as (string | Buffer)[]) {
+							this.dispatchMessage(message);
 						}
 
-						this.dispatchEvent(
-							// @ts-expect-error --- On purpose.
-							new MessageEvent('message', { data: arrayBuffer })
-						);
-
 						break;
 					}
 
@@ -321,3 +369,21 @@ export class FakeRTCDataChannel extends EventTarget implements RTCDataChannel {
 		);
 	}
 }
+
+/**
+ * Message to be sent to the worker. Its data is copied since it is not sent
+ * right now.
+ */
+function toMessage(
+	data: string | ArrayBuffer | Buffer | ArrayBufferView | Blob
+): string | Buffer {
+	if (typeof data === 'string') {
+		return data;
+	} else if (data instanceof ArrayBuffer) {
+		return Buffer.from(new Uint8Array(data));
+	} else if (data instanceof Buffer) {
+		return Buffer.from(data);
+	} else {
+		throw new TypeError('invalid data type');
+	}
+}
@@ -23,6 +23,7 @@ import {
 	IceParameters,
 	DtlsRole,
 	RtpCapabilities,
+	RtpEncodingParameters,
 	RtpParameters,
 	SctpCapabilities,
 	SctpStreamParameters,
@@ -37,6 +38,21 @@ const logger = new Logger('Handler');
 const NAME = 'Aiortc';
 const SCTP_NUM_STREAMS = { OS: 65535, MIS: 65535 };
 
+// Native RTP capabilities indexed by Channel. They just depend on the aiortc
+// version used by the worker, so they are requested and parsed once.
+const nativeRtpCapabilitiesByChannel: WeakMap<
+	Channel,
+	Promise<RtpCapabilities>
+> = new WeakMap();
+
+// Request run within a 'handler.batch' request. If dataFrom is given, the
+// result of that earlier request in the batch is used as data.
+type BatchRequest = {
+	method: string;
+	data?: any;
+	dataFrom?: number;
+};
+
 export class Handler extends HandlerInterface {
 	// Internal data.
 	readonly #internal: { handlerId: string };
@@ -59,12 +75,24 @@ export class Handler extends HandlerInterface {
 	readonly #mapLocalIdTracks: Map<string, FakeMediaStreamTrack> = new Map();
 	// Map of MID indexed by local ids.
 	readonly #mapLocalIdMid: Map<string, string> = new Map();
+	// Map of sending encoding parameters indexed by local ids.
+	readonly #mapLocalIdEncoding: Map<string, RtpEncodingParameters> = new Map();
 	// Got transport local and remote parameters.
 	#transportReady = false;
 	// Whether a DataChannel m=application section has been created.
 	#hasDataChannelMediaSection = false;
 	// Next DataChannel id.
 	#nextSendSctpStreamId = 0;
+	// Interval (in milliseconds) of the stats subscription (if any).
+	#statsInterval?: number;
+	// Whether receiving tracks are sent without decoding and re-encoding them.
+	readonly #passthrough: boolean;
+	// Whether the DTLS certificate is shared with other handlers of the worker.
+	readonly #reuseCertificate: boolean;
+	// Last stats notified by the worker indexed by RTCStats id.
+	readonly #stats: Map<string, any> = new Map();
+	// Whether stats have been notified since the subscription.
+	#hasStats = false;
 
 	/**
 	 * Addicional events.
@@ -74,14 +102,23 @@ export class Handler extends HandlerInterface {
 	constructor({
 		internal,
 		channel,
+		statsInterval,
+		passthrough = false,
+		reuseCertificate = false,
 	}: {
 		internal: { handlerId: string };
 		channel: Channel;
+		statsInterval?: number;
+		passthrough?: boolean;
+		reuseCertificate?: boolean;
 	}) {
 		super();
 
 		this.#internal = internal;
 		this.#channel = channel;
+		this.#statsInterval = statsInterval;
+		this.#passthrough = passthrough;
+		this.#reuseCertificate = reuseCertificate;
 	}
 
 	get closed(): boolean {
@@ -123,12 +160,29 @@ export class Handler extends HandlerInterface {
 	async getNativeRtpCapabilities(): Promise<RtpCapabilities> {
 		logger.debug('getNativeRtpCapabilities()');
 
-		const sdp = await this.#channel.request('getRtpCapabilities');
+		let promise = nativeRtpCapabilitiesByChannel.get(this.#channel);
+
+		if (!promise) {
+			promise = this.#channel
+				.request('getRtpCapabilities')
+				.then((sdp: string) => {
+					const sdpObject = sdpTransform.parse(sdp);
 
-		const sdpObject = sdpTransform.parse(sdp);
-		const caps = sdpCommonUtils.extractRtpCapabilities({ sdpObject });
+					return sdpCommonUtils.extractRtpCapabilities({ sdpObject });
+				});
 
-		return caps;
+			nativeRtpCapabilitiesByChannel.set(this.#channel, promise);
+
+			// Do not cache a failure.
+			promise.catch(() =>
+				nativeRtpCapabilitiesByChannel.delete(this.#channel)
+			);
+		}
+
+		const caps = await promise;
+
+		// Callers may modify the given object.
+		return utils.clone<RtpCapabilities>(caps);
 	}
 
 	async getNativeSctpCapabilities(): Promise<SctpCapabilities> {
@@ -185,11 +239,15 @@ export class Handler extends HandlerInterface {
 
 		const options = {
 			rtcConfiguration: { iceServers },
+			reuseCertificate: this.#reuseCertificate,
 		};
 
 		// Notify the worker so it will create a handler.
 		this.#channel
 			.request('createHandler', this.#internal, options)
+			.then(({ latency }: { latency: number }) =>
+				logger.debug(`handler created in the worker [latency:${latency}ms]`)
+			)
 			.catch(error => {
 				logger.error(`handler creation in the worker failed: ${error}`);
 
@@ -200,6 +258,12 @@ export class Handler extends HandlerInterface {
 		this.#running = true;
 
 		this.handleWorkerNotifications();
+
+		if (this.#statsInterval) {
+			this.subscribeStats(this.#statsInterval).catch(error =>
+				logger.error(`stats subscription failed: ${error}`)
+			);
+		}
 	}
 
 	// eslint-disable-next-line @typescript-eslint/no-unused-vars
@@ -213,6 +277,15 @@ export class Handler extends HandlerInterface {
 	}
 
 	async getTransportStats(): Promise<FakeRTCStatsReport> {
+		// If subscribed, serve the stats pushed by the worker.
+		if (this.#statsInterval && this.#hasStats) {
+			return new FakeRTCStatsReport(
+				Object.fromEntries(
+					Array.from(this.#stats, ([id, stats]) => [id, { ...stats }])
+				)
+			);
+		}
+
 		const data = await this.#channel.request(
 			'handler.getTransportStats',
 			this.#internal
@@ -221,8 +294,68 @@ export class Handler extends HandlerInterface {
 		return new FakeRTCStatsReport(data);
 	}
 
+	/**
+	 * Make the worker periodically push transport stats (just the fields that
+	 * changed) so getTransportStats() does not need to request them.
+	 */
+	async subscribeStats(interval: number): Promise<void> {
+		logger.debug('subscribeStats() [interval:%o]', interval);
+
+		this.#statsInterval = interval;
+		this.#stats.clear();
+		this.#hasStats = false;
+
+		await this.#channel.request('handler.subscribeStats', this.#internal, {
+			interval,
+		});
+	}
+
+	async unsubscribeStats(): Promise<void> {
+		logger.debug('unsubscribeStats()');
+
+		this.#statsInterval = undefined;
+		this.#stats.clear();
+		this.#hasStats = false;
+
+		await this.#channel.request('handler.unsubscribeStats', this.#internal);
+	}
+
+	/**
+	 * Stats of many Producers or Consumers of this transport in a single
+	 * request. Returned Map is indexed by localId. If no localIds are given,
+	 * stats of all of them are returned.
+	 */
+	async getStatsBatch(
+		localIds?: string[]
+	): Promise<Map<string, FakeRTCStatsReport>> {
+		const mapMidLocalId: Map<string, string> = new Map();
+
+		for (const [localId, mid] of this.#mapLocalIdMid) {
+			if (!localIds || localIds.includes(localId)) {
+				mapMidLocalId.set(mid, localId);
+			}
+		}
+
+		const data = await this.#channel.request(
+			'handler.getStatsBatch',
+			this.#internal,
+			{ mids: localIds ? Array.from(mapMidLocalId.keys()) : 'all' }
+		);
+
+		const result: Map<string, FakeRTCStatsReport> = new Map();
+
+		for (const [mid, stats] of Object.entries(data)) {
+			const localId = mapMidLocalId.get(mid);
+
+			if (localId) {
+				result.set(localId, new FakeRTCStatsReport(stats));
+			}
+		}
+
+		return result;
+	}
+
 	async send(
-		// eslint-disable-next-line @typescript-eslint/no-unused-vars
 		{ track, encodings, codecOptions, codec }: HandlerSendOptions
 	): Promise<HandlerSendResult> {
 		this.assertSendDirection();
@@ -237,19 +370,23 @@ export class Handler extends HandlerInterface {
 		const localId = track.id;
 		const kind = track.kind;
 		const { playerId, remote } = (track as FakeMediaStreamTrack).data;
+		let addTrackRequest: BatchRequest;
 
 		if (playerId) {
-			await this.#channel.request('handler.addTrack', this.#internal, {
-				localId,
-				playerId,
-				kind,
-			});
+			addTrackRequest = {
+				method: 'handler.addTrack',
+				data: { localId, playerId, kind },
+			};
 		} else if (remote) {
-			await this.#channel.request('handler.addTrack', this.#internal, {
-				localId,
-				recvTrackId: track.id,
-				kind,
-			});
+			addTrackRequest = {
+				method: 'handler.addTrack',
+				data: {
+					localId,
+					recvTrackId: track.id,
+					kind,
+					passthrough: this.#passthrough,
+				},
+			};
 		} else {
 			throw new TypeError(
 				'invalid track, missing data.playerId or data.remote'
@@ -275,41 +412,58 @@ export class Handler extends HandlerInterface {
 			codec
 		);
 
-		let offer = await this.#channel.request(
-			'handler.createOffer',
-			this.#internal
-		);
-
-		let localSdpObject = sdpTransform.parse(offer.sdp);
-
-		if (!this.#transportReady) {
-			await this.setupTransport({ localDtlsRole: 'server', localSdpObject });
+		// Once set, get the MID and the corresponding m= section.
+		const localRequests: BatchRequest[] = [
+			{ method: 'handler.getSendMid', data: { localId } },
+			{ method: 'handler.getLocalDescription' },
+		];
+		// aiortc sends a single encoding, so just the first one is used.
+		const encoding: RtpEncodingParameters = utils.clone(encodings?.[0] ?? {});
+
+		if (hasEncodingConstraints(encoding)) {
+			localRequests.push({
+				method: 'handler.setEncodingParameters',
+				data: getEncodingParametersData(localId, encoding),
+			});
 		}
+		let mid: string;
+		let offer: RTCSessionDescription;
 
-		logger.debug(
-			'send() | calling handler.setLocalDescription() [offer:%o]',
-			offer
-		);
+		if (this.#transportReady) {
+			logger.debug(
+				'send() | calling handler.createOffer() and handler.setLocalDescription()'
+			);
 
-		await this.#channel.request(
-			'handler.setLocalDescription',
-			this.#internal,
-			offer as RTCSessionDescription
-		);
+			[, , , mid, offer] = await this.batch([
+				addTrackRequest,
+				{ method: 'handler.createOffer' },
+				{ method: 'handler.setLocalDescription', dataFrom: 1 },
+				...localRequests,
+			]);
+		} else {
+			// The transport must be set up with the offer before setting it.
+			[, offer] = await this.batch([
+				addTrackRequest,
+				{ method: 'handler.createOffer' },
+			]);
+
+			await this.setupTransport({
+				localDtlsRole: 'server',
+				localSdpObject: sdpTransform.parse(offer.sdp),
+			});
 
-		// Get the MID and the corresponding m= section.
-		const mid = await this.#channel.request(
-			'handler.getSendMid',
-			this.#internal,
-			{ localId }
-		);
+			logger.debug(
+				'send() | calling handler.setLocalDescription() [offer:%o]',
+				offer
+			);
 
-		offer = await this.#channel.request(
-			'handler.getLocalDescription',
-			this.#internal
-		);
+			[, mid, offer] = await this.batch([
+				{ method: 'handler.setLocalDescription', data: offer },
+				...localRequests,
+			]);
+		}
 
-		localSdpObject = sdpTransform.parse(offer.sdp);
+		const localSdpObject = sdpTransform.parse(offer.sdp);
 
 		const offerMediaObject = localSdpObject.media.find(
 			m => String(m.mid) === String(mid)
@@ -373,8 +527,9 @@ export class Handler extends HandlerInterface {
 			}
 		});
 
-		// Store the MID into the map.
+		// Store the MID and the encoding parameters into the maps.
 		this.#mapLocalIdMid.set(localId, mid);
+		this.#mapLocalIdEncoding.set(localId, encoding);
 
 		return {
 			localId,
@@ -404,41 +559,25 @@ export class Handler extends HandlerInterface {
 		}
 
 		this.#mapLocalIdMid.delete(localId);
-
-		await this.#channel.request('handler.removeTrack', this.#internal, {
-			localId,
-		});
+		this.#mapLocalIdEncoding.delete(localId);
 
 		this.#remoteSdp!.disableMediaSection(mid);
 
-		const offer = await this.#channel.request(
-			'handler.createOffer',
-			this.#internal
-		);
-
-		logger.debug(
-			'stopSending() | calling handler.setLocalDescription() [offer:%o]',
-			offer
-		);
-
-		await this.#channel.request(
-			'handler.setLocalDescription',
-			this.#internal,
-			offer as RTCSessionDescription
-		);
-
+		// The answer does not depend on the offer, so everything is done in a
+		// single round-trip.
 		const answer = { type: 'answer', sdp: this.#remoteSdp!.getSdp() };
 
 		logger.debug(
-			'stopSending() | calling handler.setRemoteDescription() [answer:%o]',
+			'stopSending() | calling handler.setLocalDescription() and handler.setRemoteDescription() [answer:%o]',
 			answer
 		);
 
-		await this.#channel.request(
-			'handler.setRemoteDescription',
-			this.#internal,
-			answer as RTCSessionDescription
-		);
+		await this.batch([
+			{ method: 'handler.removeTrack', data: { localId } },
+			{ method: 'handler.createOffer' },
+			{ method: 'handler.setLocalDescription', dataFrom: 1 },
+			{ method: 'handler.setRemoteDescription', data: answer },
+		]);
 	}
 
 	async pauseSending(localId: string): Promise<void> {
@@ -458,39 +597,22 @@ export class Handler extends HandlerInterface {
 			throw new Error('associated MID not found');
 		}
 
-		await this.#channel.request('handler.setTrackDirection', this.#internal, {
-			localId,
-			direction: 'inactive',
-		});
-
-		const offer = await this.#channel.request(
-			'handler.createOffer',
-			this.#internal
-		);
-
-		logger.debug(
-			'pauseSending() | calling handler.setLocalDescription() [offer:%o]',
-			offer
-		);
-
-		await this.#channel.request(
-			'handler.setLocalDescription',
-			this.#internal,
-			offer as RTCSessionDescription
-		);
-
 		const answer = { type: 'answer', sdp: this.#remoteSdp!.getSdp() };
 
 		logger.debug(
-			'pauseSending() | calling handler.setRemoteDescription() [answer:%o]',
+			'pauseSending() | calling handler.setLocalDescription() and handler.setRemoteDescription() [answer:%o]',
 			answer
 		);
 
-		await this.#channel.request(
-			'handler.setRemoteDescription',
-			this.#internal,
-			answer as RTCSessionDescription
-		);
+		await this.batch([
+			{
+				method: 'handler.setTrackDirection',
+				data: { localId, direction: 'inactive' },
+			},
+			{ method: 'handler.createOffer' },
+			{ method: 'handler.setLocalDescription', dataFrom: 1 },
+			{ method: 'handler.setRemoteDescription', data: answer },
+		]);
 	}
 
 	async resumeSending(localId: string): Promise<void> {
@@ -510,39 +632,22 @@ export class Handler extends HandlerInterface {
 			throw new Error('associated MID not found');
 		}
 
-		await this.#channel.request('handler.setTrackDirection', this.#internal, {
-			localId,
-			direction: 'sendonly',
-		});
-
-		const offer = await this.#channel.request(
-			'handler.createOffer',
-			this.#internal
-		);
-
-		logger.debug(
-			'resumeSending() | calling handler.setLocalDescription() [offer:%o]',
-			offer
-		);
-
-		await this.#channel.request(
-			'handler.setLocalDescription',
-			this.#internal,
-			offer as RTCSessionDescription
-		);
-
 		const answer = { type: 'answer', sdp: this.#remoteSdp!.getSdp() };
 
 		logger.debug(
-			'stopSending() | calling handler.setRemoteDescription() [answer:%o]',
+			'resumeSending() | calling handler.setLocalDescription() and handler.setRemoteDescription() [answer:%o]',
 			answer
 		);
 
-		await this.#channel.request(
-			'handler.setRemoteDescription',
-			this.#internal,
-			answer as RTCSessionDescription
-		);
+		await this.batch([
+			{
+				method: 'handler.setTrackDirection',
+				data: { localId, direction: 'sendonly' },
+			},
+			{ method: 'handler.createOffer' },
+			{ method: 'handler.setLocalDescription', dataFrom: 1 },
+			{ method: 'handler.setRemoteDescription', data: answer },
+		]);
 	}
 
 	async replaceTrack(
@@ -585,6 +690,7 @@ export class Handler extends HandlerInterface {
 				localId,
 				recvTrackId: track.id,
 				kind,
+				passthrough: this.#passthrough,
 			});
 		} else {
 			throw new TypeError('invalid track, missing data.player or data.remote');
@@ -615,17 +721,55 @@ export class Handler extends HandlerInterface {
 	}
 
 	async setMaxSpatialLayer(
-		// eslint-disable-next-line @typescript-eslint/no-unused-vars
 		localId: string,
-		// eslint-disable-next-line @typescript-eslint/no-unused-vars
 		spatialLayer: number
 	): Promise<void> {
-		throw new UnsupportedError('not implemented');
+		this.assertSendDirection();
+
+		logger.debug(
+			'setMaxSpatialLayer() [localId:%s, spatialLayer:%s]',
+			localId,
+			spatialLayer
+		);
+
+		const mid = this.#mapLocalIdMid.get(localId);
+
+		if (!mid) {
+			throw new Error('associated MID not found');
+		}
+
+		// aiortc sends a single encoding (spatial layer 0), which is kept
+		// active for any spatial layer, so there is nothing to do.
 	}
 
-	// eslint-disable-next-line @typescript-eslint/no-unused-vars
 	async setRtpEncodingParameters(localId: string, params: any): Promise<void> {
-		throw new UnsupportedError('not implemented');
+		this.assertSendDirection();
+
+		logger.debug(
+			'setRtpEncodingParameters() [localId:%s, params:%o]',
+			localId,
+			params
+		);
+
+		const mid = this.#mapLocalIdMid.get(localId);
+
+		if (!mid) {
+			throw new Error('associated MID not found');
+		}
+
+		// As browsers do, given parameters are merged into the current ones.
+		const encoding: RtpEncodingParameters = {
+			...this.#mapLocalIdEncoding.get(localId),
+			...params,
+		};
+
+		await this.#channel.request(
+			'handler.setEncodingParameters',
+			this.#internal,
+			getEncodingParametersData(localId, encoding)
+		);
+
+		this.#mapLocalIdEncoding.set(localId, encoding);
 	}
 
 	async getSenderStats(localId: string): Promise<FakeRTCStatsReport> {
@@ -796,16 +940,10 @@ export class Handler extends HandlerInterface {
 			offer
 		);
 
-		await this.#channel.request(
-			'handler.setRemoteDescription',
-			this.#internal,
-			offer as RTCSessionDescription
-		);
-
-		let answer = await this.#channel.request(
-			'handler.createAnswer',
-			this.#internal
-		);
+		let [, answer] = await this.batch([
+			{ method: 'handler.setRemoteDescription', data: offer },
+			{ method: 'handler.createAnswer' },
+		]);
 
 		const localSdpObject = sdpTransform.parse(answer.sdp);
 
@@ -894,36 +1032,22 @@ export class Handler extends HandlerInterface {
 		const offer = { type: 'offer', sdp: this.#remoteSdp!.getSdp() };
 
 		logger.debug(
-			'stopReceiving() | calling handler.setRemoteDescription() [offer:%o]',
+			'stopReceiving() | calling handler.setRemoteDescription() and handler.setLocalDescription() [offer:%o]',
 			offer
 		);
 
-		await this.#channel.request(
-			'handler.setRemoteDescription',
-			this.#internal,
-			offer as RTCSessionDescription
-		);
-
-		const answer = await this.#channel.request(
-			'handler.createAnswer',
-			this.#internal
-		);
-
-		logger.debug(
-			'stopReceiving() | calling handler.setLocalDescription() [answer:%o]',
-			answer
-		);
-
-		await this.#channel.request(
-			'handler.setLocalDescription',
-			this.#internal,
-			answer as RTCSessionDescription
-		);
+		await this.batch([
+			{ method: 'handler.setRemoteDescription', data: offer },
+			{ method: 'handler.createAnswer' },
+			{ method: 'handler.setLocalDescription', dataFrom: 1 },
+		]);
 	}
 
 	async pauseReceiving(localIds: string[]): Promise<void> {
 		this.assertRecvDirection();
 
+		const requests: BatchRequest[] = [];
+
 		for (const localId of localIds) {
 			logger.debug('pauseReceiving() [localId:%s]', localId);
 
@@ -939,48 +1063,33 @@ export class Handler extends HandlerInterface {
 				throw new Error('associated MID not found');
 			}
 
-			await this.#channel.request('handler.setTrackDirection', this.#internal, {
-				localId,
-				direction: 'inactive',
+			requests.push({
+				method: 'handler.setTrackDirection',
+				data: { localId, direction: 'inactive' },
 			});
 		}
 
-		const offer = await this.#channel.request(
-			'handler.createOffer',
-			this.#internal
-		);
+		// Set our own offer as the remote one.
+		const offerIdx = requests.length;
 
 		logger.debug(
-			'pauseReceiving() | calling handler.setRemoteDescription() [offer:%o]',
-			offer
+			'pauseReceiving() | calling handler.setRemoteDescription() and handler.setLocalDescription()'
 		);
 
-		await this.#channel.request(
-			'handler.setRemoteDescription',
-			this.#internal,
-			offer as RTCSessionDescription
-		);
-
-		const answer = await this.#channel.request(
-			'handler.createAnswer',
-			this.#internal
-		);
-
-		logger.debug(
-			'pauseReceiving() | calling handler.setLocalDescription() [answer:%o]',
-			answer
-		);
-
-		await this.#channel.request(
-			'handler.setLocalDescription',
-			this.#internal,
-			answer as RTCSessionDescription
-		);
+		await this.batch([
+			...requests,
+			{ method: 'handler.createOffer' },
+			{ method: 'handler.setRemoteDescription', dataFrom: offerIdx },
+			{ method: 'handler.createAnswer' },
+			{ method: 'handler.setLocalDescription', dataFrom: offerIdx + 2 },
+		]);
 	}
 
 	async resumeReceiving(localIds: string[]): Promise<void> {
 		this.assertRecvDirection();
 
+		const requests: BatchRequest[] = [];
+
 		for (const localId of localIds) {
 			logger.debug('resumeReceiving() [localId:%s]', localId);
 
@@ -996,43 +1105,26 @@ export class Handler extends HandlerInterface {
 				throw new Error('associated MID not found');
 			}
 
-			await this.#channel.request('handler.setTrackDirection', this.#internal, {
-				localId,
-				direction: 'recvonly',
+			requests.push({
+				method: 'handler.setTrackDirection',
+				data: { localId, direction: 'recvonly' },
 			});
 		}
 
-		const offer = await this.#channel.request(
-			'handler.createOffer',
-			this.#internal
-		);
+		// Set our own offer as the remote one.
+		const offerIdx = requests.length;
 
 		logger.debug(
-			'resumeReceiving() | calling handler.setRemoteDescription() [offer:%o]',
-			offer
-		);
-
-		await this.#channel.request(
-			'handler.setRemoteDescription',
-			this.#internal,
-			offer as RTCSessionDescription
+			'resumeReceiving() | calling handler.setRemoteDescription() and handler.setLocalDescription()'
 		);
 
-		const answer = await this.#channel.request(
-			'handler.createAnswer',
-			this.#internal
-		);
-
-		logger.debug(
-			'resumeReceiving() | calling handler.setLocalDescription() [answer:%o]',
-			answer
-		);
-
-		await this.#channel.request(
-			'handler.setLocalDescription',
-			this.#internal,
-			answer as RTCSessionDescription
-		);
+		await this.batch([
+			...requests,
+			{ method: 'handler.createOffer' },
+			{ method: 'handler.setRemoteDescription', dataFrom: offerIdx },
+			{ method: 'handler.createAnswer' },
+			{ method: 'handler.setLocalDescription', dataFrom: offerIdx + 2 },
+		]);
 	}
 
 	async getReceiverStats(localId: string): Promise<FakeRTCStatsReport> {
@@ -1158,6 +1250,17 @@ export class Handler extends HandlerInterface {
 		return { dataChannel };
 	}
 
+	/**
+	 * Run the given requests in order within a single round-trip and get their
+	 * results. It rejects with the error of the first failing one (the next
+	 * ones are not run).
+	 */
+	private async batch(requests: BatchRequest[]): Promise<any[]> {
+		return this.#channel.request('handler.batch', this.#internal, {
+			requests,
+		});
+	}
+
 	private async setupTransport({
 		localDtlsRole,
 		localSdpObject,
@@ -1264,6 +1367,29 @@ export class Handler extends HandlerInterface {
 					break;
 				}
 
+				case 'stats': {
+					const { timestamp, reports, removed } = data;
+
+					for (const [id, delta] of Object.entries(reports)) {
+						this.#stats.set(id, {
+							...this.#stats.get(id),
+							...(delta as object),
+						});
+					}
+
+					for (const id of removed) {
+						this.#stats.delete(id);
+					}
+
+					for (const stats of this.#stats.values()) {
+						stats.timestamp = timestamp;
+					}
+
+					this.#hasStats = true;
+
+					break;
+				}
+
 				default: {
 					logger.error('ignoring unknown event "%s"', event);
 				}
@@ -1271,3 +1397,32 @@ export class Handler extends HandlerInterface {
 		});
 	}
 }
+
+function hasEncodingConstraints(encoding: RtpEncodingParameters): boolean {
+	return (
+		encoding.maxBitrate !== undefined ||
+		encoding.maxFramerate !== undefined ||
+		encoding.scaleResolutionDownBy !== undefined
+	);
+}
+
+/**
+ * Data of the 'handler.setEncodingParameters' request (the encoding
+ * parameters the worker applies to the aiortc encoder).
+ */
+function getEncodingParametersData(
+	localId: string,
+	encoding: RtpEncodingParameters
+): {
+	localId: string;
+	maxBitrate?: number;
+	maxFramerate?: number;
+	scaleResolutionDownBy?: number;
+} {
+	return {
+		localId,
+		maxBitrate: encoding.maxBitrate,
+		maxFramerate: encoding.maxFramerate,
+		scaleResolutionDownBy: encoding.scaleResolutionDownBy,
+	};
+}
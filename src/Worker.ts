@@ -1,7 +1,13 @@
 import process from 'node:process';
 import os from 'node:os';
 import path from 'node:path';
-import { spawn, execSync, ChildProcess } from 'node:child_process';
+import net from 'node:net';
+import {
+	spawn,
+	execSync,
+	ChildProcess,
+	StdioOptions,
+} from 'node:child_process';
 import { v4 as uuidv4 } from 'uuid';
 import { Logger } from 'mediasoup-client/lib/Logger';
 import { EnhancedEventEmitter } from './enhancedEvents';
@@ -13,7 +19,7 @@ import { Handler } from './Handler';
 
 // Whether the Python subprocess should log via PIPE to Node.js or directly to
 // stdout and stderr.
-const PYTHON_LOG_VIA_PIPE = process.env.PYTHON_LOG_TO_STDOUT !== 'true';
+export const PYTHON_LOG_VIA_PIPE = process.env.PYTHON_LOG_TO_STDOUT !== 'true';
 const IS_WINDOWS = os.platform() === 'win32';
 const PYTHON = getPython();
 const PIP_DEPS_DIR = path.join(__dirname, '..', 'worker', 'pip_deps');
@@ -25,10 +31,183 @@ export type WorkerSettings = {
 	 * Logging level for logs generated by the Python subprocess.
 	 */
 	logLevel?: WorkerLogLevel;
+
+	/**
+	 * Number of recent log records the Python subprocess keeps in memory so
+	 * they can be retrieved with worker.getLogs(). 0 means none. Default 1000.
+	 */
+	logRingSize?: number;
+
+	/**
+	 * Whether the Python subprocess just keeps log records in memory instead
+	 * of also writing them to stdout/stderr. Default false.
+	 */
+	logRingOnly?: boolean;
+
+	/**
+	 * Maximum number of requests and notifications processed concurrently by
+	 * the Python subprocess. Those targeting the same handler or player are
+	 * always processed in order. 0 means no limit. Default 64.
+	 */
+	maxInFlightRequests?: number;
+
+	/**
+	 * Serializer used by the Python subprocess for Channel messages. 'orjson'
+	 * requires the orjson Python package and falls back to 'json' if it is not
+	 * installed. Default 'json'.
+	 */
+	codec?: WorkerCodec;
+
+	/**
+	 * Interval (in milliseconds) at which the Python subprocess checks the
+	 * bufferedAmount of every DataChannel and notifies it if changed.
+	 * Default 1000.
+	 */
+	bufferedAmountInterval?: number;
+
+	/**
+	 * Time (in milliseconds) during which the Python subprocess aggregates
+	 * the messages received by a DataChannel into a single notification. 0
+	 * means those received within the same event loop iteration. Default 0.
+	 */
+	dataChannelMessageWindow?: number;
+
+	/**
+	 * Maximum size (in MB) of the encoded media that the Python subprocess
+	 * keeps in memory for looping players with cache (least recently used
+	 * one evicted first). Default 256.
+	 */
+	encodedCacheSize?: number;
+
+	/**
+	 * Number of DTLS certificates the Python subprocess generates ahead of
+	 * time (out of its event loop) so creating a handler does not wait for
+	 * one. 0 means generating them on demand. Default 4.
+	 */
+	certificatePoolSize?: number;
+
+	/**
+	 * Connect to a Python worker already listening (worker.py --listen) at
+	 * 'unix:PATH' or 'tcp:HOST:PORT' instead of spawning a Python subprocess.
+	 * Settings above are then the ones of the listening worker.
+	 */
+	connect?: string;
+
+	/**
+	 * Token required by the listening worker (worker.py --token).
+	 */
+	token?: string;
 };
 
 export type WorkerLogLevel = 'debug' | 'warn' | 'error' | 'none';
 
+export type WorkerCodec = 'json' | 'orjson';
+
+export type WorkerLogRecord = {
+	// Time (milliseconds since epoch) of the record.
+	time: number;
+	level: 'debug' | 'info' | 'warning' | 'error' | 'critical';
+	message: string;
+};
+
+/**
+ * Latencies (in milliseconds) by bucket. counts[i] is the number of values
+ * not greater than buckets[i] (and greater than the previous one), and the
+ * last count is the number of values greater than the last bucket.
+ */
+export type WorkerHistogram = {
+	count: number;
+	sum: number;
+	max: number;
+	counts: number[];
+};
+
+export type WorkerMetrics = {
+	pid: number;
+	// Seconds since the Python session started.
+	uptime: number;
+	// Upper bounds (in milliseconds) of the buckets of every histogram.
+	buckets: number[];
+	// Processing latency of requests indexed by method.
+	requests: { [method: string]: WorkerHistogram };
+	// Processing latency of notifications indexed by event.
+	notifications: { [event: string]: WorkerHistogram };
+	// Number of failures indexed by method or event.
+	errors: { [methodOrEvent: string]: number };
+	// Delay of the Python event loop (sampled every 500 ms).
+	loopLag: WorkerHistogram & { last: number };
+	channel: {
+		messagesIn: number;
+		bytesIn: number;
+		messagesOut: number;
+		bytesOut: number;
+		writes: number;
+		coalesced: number;
+		sendQueueBytes: number;
+	};
+	dispatcher: {
+		maxInFlight: number;
+		inFlight: number;
+		queued: number;
+		keys: number;
+	};
+	// Counters of every handler indexed by handler id.
+	handlers: {
+		[handlerId: string]: {
+			requests: number;
+			notifications: number;
+			transceivers: number;
+			dataChannels: number;
+			dataChannelMessagesSent: number;
+			dataChannelMessagesReceived: number;
+			createLatency: number;
+		};
+	};
+};
+
+export type WorkerProfilingMode = 'cprofile' | 'sampling';
+
+export type WorkerProfilingOptions = {
+	/**
+	 * 'sampling' takes the stack of the Python event loop every interval and is
+	 * cheap enough for production. 'cprofile' records every function call,
+	 * which is exact but slows the Python subprocess down. Default 'sampling'.
+	 */
+	mode?: WorkerProfilingMode;
+
+	/**
+	 * Time (in milliseconds) after which profiling stops by itself. Its profile
+	 * is kept until worker.stopProfiling() is called. If unset it profiles until
+	 * worker.stopProfiling() is called.
+	 */
+	duration?: number;
+
+	/**
+	 * Time (in milliseconds) between stack samples in 'sampling' mode.
+	 * Default 10.
+	 */
+	interval?: number;
+
+	/**
+	 * Number of functions (by cumulative time) in the 'cprofile' report.
+	 * Default 50.
+	 */
+	limit?: number;
+};
+
+export type WorkerProfile = {
+	mode: WorkerProfilingMode;
+	// Time (in milliseconds) profiled.
+	duration: number;
+	// 'pstats' (as printed by pstats.Stats) in 'cprofile' mode and 'collapsed'
+	// (a line per stack, 'outer;inner count', as taken by flamegraph.pl or
+	// speedscope) in 'sampling' mode.
+	format: 'pstats' | 'collapsed';
+	// Number of stack samples taken in 'sampling' mode.
+	samples?: number;
+	data: string;
+};
+
 export type WorkerEvents = {
 	died: [Error];
 	subprocessclose: [];
@@ -38,10 +217,10 @@ export type WorkerEvents = {
 };
 
 export class Worker extends EnhancedEventEmitter<WorkerEvents> {
-	// Python worker child process.
-	readonly #child: ChildProcess;
-	// Worker process PID.
-	readonly #pid: number;
+	// Python worker child process (unset if connected to a listening worker).
+	readonly #child?: ChildProcess;
+	// Worker process PID (known once authenticated if connected).
+	#pid = 0;
 	// Channel instance.
 	readonly #channel: Channel;
 	// Closed flag.
@@ -53,80 +232,97 @@ export class Worker extends EnhancedEventEmitter<WorkerEvents> {
 	// Handlers set.
 	readonly #handlers: Set<Handler> = new Set();
 
-	constructor({ logLevel }: WorkerSettings) {
+	constructor({
+		logLevel,
+		logRingSize,
+		logRingOnly,
+		maxInFlightRequests,
+		codec,
+		bufferedAmountInterval,
+		dataChannelMessageWindow,
+		encodedCacheSize,
+		certificatePoolSize,
+		connect,
+		token,
+	}: WorkerSettings) {
 		super();
 
-		logger.debug('constructor() [logLevel:%o]', logLevel);
+		logger.debug(
+			'constructor() [logLevel:%o, logRingSize:%o, logRingOnly:%o, maxInFlightRequests:%o, codec:%o, bufferedAmountInterval:%o, dataChannelMessageWindow:%o, encodedCacheSize:%o, certificatePoolSize:%o, connect:%o]',
+			logLevel,
+			logRingSize,
+			logRingOnly,
+			maxInFlightRequests,
+			codec,
+			bufferedAmountInterval,
+			dataChannelMessageWindow,
+			encodedCacheSize,
+			certificatePoolSize,
+			connect
+		);
 
-		const spawnBin = PYTHON;
-		const spawnArgs: string[] = [];
+		if (connect) {
+			const socket = connectSocket(connect);
 
-		spawnArgs.push('-u'); // Unbuffered stdio.
+			this.#channel = new Channel({ socket, pid: this.#pid });
 
-		spawnArgs.push(path.join(__dirname, '..', 'worker', 'worker.py'));
+			this.handleConnection(socket, connect, token);
 
-		if (logLevel) {
-			spawnArgs.push(`--logLevel=${logLevel}`);
+			return;
 		}
 
-		logger.debug(
-			'spawning worker process: %s %s',
-			spawnBin,
-			spawnArgs.join(' ')
-		);
+		const spawnArgs = getWorkerArgs({
+			logLevel,
+			logRingSize,
+			logRingOnly,
+			maxInFlightRequests,
+			codec,
+			bufferedAmountInterval,
+			dataChannelMessageWindow,
+			encodedCacheSize,
+			certificatePoolSize,
+		});
 
-		this.#child = spawn(
-			// command
-			spawnBin,
-			// args
-			spawnArgs,
-			// options
-			{
-				// Set PYTHONPATH env since we use custom locations for locally
-				// installed PIP deps.
-				env: {
-					...process.env,
-					PYTHONPATH: IS_WINDOWS
-						? `${PIP_DEPS_DIR};${process.env.PYTHONPATH}`
-						: `${PIP_DEPS_DIR}:${process.env.PYTHONPATH}`,
-				},
-				detached: false,
-				// fd 0 (stdin)   : Just ignore it.
-				// fd 1 (stdout)  : Pipe it for 3rd libraries that log their own stuff.
-				// fd 2 (stderr)  : Same as stdout.
-				// fd 3 (channel) : Channel fd.
-				stdio: [
-					'ignore',
-					PYTHON_LOG_VIA_PIPE ? 'pipe' : 'inherit',
-					PYTHON_LOG_VIA_PIPE ? 'pipe' : 'inherit',
-					'pipe',
-				],
-			}
-		);
+		// fd 0 (stdin)   : Just ignore it.
+		// fd 1 (stdout)  : Pipe it for 3rd libraries that log their own stuff.
+		// fd 2 (stderr)  : Same as stdout.
+		// fd 3 (channel) : Channel fd.
+		const child = spawnWorkerProcess(spawnArgs, [
+			'ignore',
+			PYTHON_LOG_VIA_PIPE ? 'pipe' : 'inherit',
+			PYTHON_LOG_VIA_PIPE ? 'pipe' : 'inherit',
+			'pipe',
+		]);
 
-		this.#pid = this.#child.pid!;
+		this.#child = child;
+		this.#pid = child.pid!;
 
 		this.#channel = new Channel({
-			socket: this.#child.stdio[3],
+			socket: child.stdio[3],
 			pid: this.#pid,
 		});
 
 		let spawnDone = false;
 
 		// Listen for 'running' notification.
-		this.#channel.once(String(this.#pid), (event: string) => {
+		this.#channel.once(String(this.#pid), (event: string, data?: any) => {
 			if (!spawnDone && event === 'running') {
 				spawnDone = true;
 
-				logger.debug('worker process running [pid:%s]', this.#pid);
+				logger.debug(
+					'worker process running [pid:%s, codec:%s, startupTime:%sms]',
+					this.#pid,
+					data?.codec,
+					data?.startupTime
+				);
 
 				this.emit('@success');
 			}
 		});
 
-		this.#child.on('exit', (code, signal) => {
+		child.on('exit', (code, signal) => {
 			// If killed by ourselves, do nothing.
-			if (this.#child.killed) {
+			if (child.killed) {
 				return;
 			}
 
@@ -173,9 +369,9 @@ export class Worker extends EnhancedEventEmitter<WorkerEvents> {
 			}
 		});
 
-		this.#child.on('error', error => {
+		child.on('error', error => {
 			// If killed by ourselves, do nothing.
-			if (this.#child.killed) {
+			if (child.killed) {
 				return;
 			}
 
@@ -202,7 +398,7 @@ export class Worker extends EnhancedEventEmitter<WorkerEvents> {
 			}
 		});
 
-		this.#child.on('close', (code, signal) => {
+		child.on('close', (code, signal) => {
 			logger.debug(
 				'worker subprocess closed [pid:%s, code:%s, signal:%s]',
 				this.#pid,
@@ -217,7 +413,7 @@ export class Worker extends EnhancedEventEmitter<WorkerEvents> {
 
 		if (PYTHON_LOG_VIA_PIPE) {
 			// Be ready for 3rd party worker libraries logging to stdout.
-			this.#child.stdout!.on('data', buffer => {
+			child.stdout!.on('data', buffer => {
 				for (const line of buffer.toString('utf8').split('\n')) {
 					if (line) {
 						logger.debug(`(stdout) ${line}`);
@@ -226,7 +422,7 @@ export class Worker extends EnhancedEventEmitter<WorkerEvents> {
 			});
 
 			// In case of a worker bug, mediasoup will log to stderr.
-			this.#child.stderr!.on('data', buffer => {
+			child.stderr!.on('data', buffer => {
 				for (const line of buffer.toString('utf8').split('\n')) {
 					if (line) {
 						logger.error(`(stderr) ${line}`);
@@ -276,8 +472,9 @@ export class Worker extends EnhancedEventEmitter<WorkerEvents> {
 
 		this.#closed = true;
 
-		// Kill the worker process.
-		this.#child.kill('SIGTERM');
+		// Kill the worker process (if connected, closing the Channel ends our
+		// session in the listening worker).
+		this.#child?.kill('SIGTERM');
 
 		// Close every Handler.
 		for (const handler of this.#handlers) {
@@ -295,6 +492,45 @@ export class Worker extends EnhancedEventEmitter<WorkerEvents> {
 		return this.#channel.request('dump');
 	}
 
+	/**
+	 * Metrics of the Python subprocess, always collected.
+	 */
+	async getMetrics(): Promise<WorkerMetrics> {
+		logger.debug('getMetrics()');
+
+		return this.#channel.request('getMetrics');
+	}
+
+	/**
+	 * Most recent log records of the Python subprocess (oldest first), see
+	 * logRingSize in WorkerSettings.
+	 */
+	async getLogs(): Promise<WorkerLogRecord[]> {
+		logger.debug('getLogs()');
+
+		return this.#channel.request('getLogs');
+	}
+
+	/**
+	 * Start profiling the Python subprocess. Just one profiling may be running
+	 * at a time in it.
+	 */
+	async startProfiling(options: WorkerProfilingOptions = {}): Promise<void> {
+		logger.debug('startProfiling() [options:%o]', options);
+
+		await this.#channel.request('startProfiling', undefined, options);
+	}
+
+	/**
+	 * Stop profiling the Python subprocess (unless it already stopped due to
+	 * its duration) and get its profile.
+	 */
+	async stopProfiling(): Promise<WorkerProfile> {
+		logger.debug('stopProfiling()');
+
+		return this.#channel.request('stopProfiling');
+	}
+
 	/**
 	 * Create a AiortcMediaStream with audio/video tracks.
 	 */
@@ -309,7 +545,15 @@ export class Worker extends EnhancedEventEmitter<WorkerEvents> {
 	/**
 	 * Create a mediasoup-client HandlerFactory.
 	 */
-	createHandlerFactory(): HandlerFactory {
+	createHandlerFactory({
+		statsInterval,
+		passthrough,
+		reuseCertificate,
+	}: {
+		statsInterval?: number;
+		passthrough?: boolean;
+		reuseCertificate?: boolean;
+	} = {}): HandlerFactory {
 		logger.debug('createHandlerFactory()');
 
 		return (): Handler => {
@@ -317,6 +561,9 @@ export class Worker extends EnhancedEventEmitter<WorkerEvents> {
 			const handler = new Handler({
 				internal,
 				channel: this.#channel,
+				statsInterval,
+				passthrough,
+				reuseCertificate,
 			});
 
 			this.#handlers.add(handler);
@@ -325,6 +572,219 @@ export class Worker extends EnhancedEventEmitter<WorkerEvents> {
 			return handler;
 		};
 	}
+
+	private handleConnection(
+		socket: net.Socket,
+		connect: string,
+		token?: string
+	): void {
+		let connectDone = false;
+
+		// The listening worker answers the 'authenticate' request instead of
+		// sending a 'running' notification.
+		socket.once('connect', async () => {
+			let data: { pid: number; codec: string; startupTime: number };
+
+			try {
+				data = await this.#channel.request('authenticate', undefined, {
+					token,
+				});
+			} catch (error) {
+				if (connectDone) {
+					return;
+				}
+
+				connectDone = true;
+
+				logger.error(
+					'worker authentication failed [connect:%s]: %s',
+					connect,
+					(error as Error).message
+				);
+
+				this.close();
+				this.emit('@failure', error as Error);
+
+				return;
+			}
+
+			if (connectDone) {
+				return;
+			}
+
+			connectDone = true;
+			this.#pid = data.pid;
+
+			logger.debug(
+				'worker process running [pid:%s, codec:%s, startupTime:%sms, connect:%s]',
+				this.#pid,
+				data.codec,
+				data.startupTime,
+				connect
+			);
+
+			this.emit('@success');
+		});
+
+		socket.on('close', () => {
+			logger.debug(
+				'worker connection closed [pid:%s, connect:%s]',
+				this.#pid,
+				connect
+			);
+
+			if (!this.#closed) {
+				if (!connectDone) {
+					connectDone = true;
+
+					logger.error('worker connection failed [connect:%s]', connect);
+
+					this.close();
+					this.emit(
+						'@failure',
+						new Error(`[connect:${connect}] connection failed`)
+					);
+				} else {
+					logger.error(
+						'worker connection closed unexpectedly [pid:%s, connect:%s]',
+						this.#pid,
+						connect
+					);
+
+					this.#died = true;
+
+					this.close();
+					this.safeEmit(
+						'died',
+						new Error(`[pid:${this.#pid}, connect:${connect}] connection closed`)
+					);
+				}
+			}
+
+			this.#subprocessClosed = true;
+
+			this.safeEmit('subprocessclose');
+		});
+	}
+}
+
+function connectSocket(connect: string): net.Socket {
+	const idx = connect.indexOf(':');
+	const scheme = connect.slice(0, idx);
+	const address = connect.slice(idx + 1);
+
+	if (idx !== -1 && scheme === 'unix' && address) {
+		return net.connect({ path: address });
+	}
+
+	if (idx !== -1 && scheme === 'tcp') {
+		const portIdx = address.lastIndexOf(':');
+		const host = address.slice(0, portIdx).replace(/^\[|\]$/g, '');
+		const port = Number(address.slice(portIdx + 1));
+
+		if (host && Number.isInteger(port) && port > 0) {
+			return net.connect({ host, port });
+		}
+	}
+
+	throw new TypeError(`invalid connect value: ${connect}`);
+}
+
+/**
+ * Command line arguments of worker.py for the given settings.
+ */
+export function getWorkerArgs({
+	logLevel,
+	logRingSize,
+	logRingOnly,
+	maxInFlightRequests,
+	codec,
+	bufferedAmountInterval,
+	dataChannelMessageWindow,
+	encodedCacheSize,
+	certificatePoolSize,
+}: WorkerSettings): string[] {
+	const args: string[] = [];
+
+	if (logLevel) {
+		args.push(`--logLevel=${logLevel}`);
+	}
+
+	if (logRingSize !== undefined) {
+		args.push(`--logRingSize=${logRingSize}`);
+	}
+
+	if (logRingOnly) {
+		args.push('--logRingOnly');
+	}
+
+	if (maxInFlightRequests !== undefined) {
+		args.push(`--maxInFlightRequests=${maxInFlightRequests}`);
+	}
+
+	if (codec) {
+		args.push(`--codec=${codec}`);
+	}
+
+	if (bufferedAmountInterval !== undefined) {
+		args.push(`--bufferedAmountInterval=${bufferedAmountInterval}`);
+	}
+
+	if (dataChannelMessageWindow !== undefined) {
+		args.push(`--dataChannelMessageWindow=${dataChannelMessageWindow}`);
+	}
+
+	if (encodedCacheSize !== undefined) {
+		args.push(`--encodedCacheSize=${encodedCacheSize}`);
+	}
+
+	if (certificatePoolSize !== undefined) {
+		args.push(`--certificatePoolSize=${certificatePoolSize}`);
+	}
+
+	return args;
+}
+
+/**
+ * Spawn worker.py with the given arguments.
+ */
+export function spawnWorkerProcess(
+	args: string[],
+	stdio: StdioOptions
+): ChildProcess {
+	const spawnBin = PYTHON;
+	const spawnArgs: string[] = [];
+
+	spawnArgs.push('-u'); // Unbuffered stdio.
+
+	spawnArgs.push(path.join(__dirname, '..', 'worker', 'worker.py'));
+	spawnArgs.push(...args);
+
+	logger.debug(
+		'spawning worker process: %s %s',
+		spawnBin,
+		spawnArgs.join(' ')
+	);
+
+	return spawn(
+		// command
+		spawnBin,
+		// args
+		spawnArgs,
+		// options
+		{
+			// Set PYTHONPATH env since we use custom locations for locally
+			// installed PIP deps.
+			env: {
+				...process.env,
+				PYTHONPATH: IS_WINDOWS
+					? `${PIP_DEPS_DIR};${process.env.PYTHONPATH}`
+					: `${PIP_DEPS_DIR}:${process.env.PYTHONPATH}`,
+			},
+			detached: false,
+			stdio,
+		}
+	);
 }
 
 function getPython() {
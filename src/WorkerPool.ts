@@ -0,0 +1,357 @@
+import os from 'node:os';
+import { HandlerFactory } from 'mediasoup-client/lib/handlers/HandlerInterface';
+import { Logger } from './Logger';
+import { EnhancedEventEmitter } from './enhancedEvents';
+import { Worker, WorkerSettings } from './Worker';
+import { Handler } from './Handler';
+import { AiortcMediaStream } from './AiortcMediaStream';
+import * as media from './media';
+
+const logger = new Logger('WorkerPool');
+
+// Attempts to spawn a worker replacing a dead one before giving up.
+const DEFAULT_MAX_RESTART_ATTEMPTS = 5;
+// Delay (ms) before the second attempt, doubled before each next one.
+const DEFAULT_RESTART_DELAY = 1000;
+
+export type WorkerPoolSettings = WorkerSettings & {
+	/**
+	 * Number of Python subprocesses. Default the number of CPUs.
+	 */
+	numWorkers?: number;
+};
+
+export type WorkerPoolEvents = {
+	workerdied: [Worker, Error];
+	workerrestarted: [Worker];
+	workerlost: [Worker, Error];
+};
+
+type WorkerLoad = {
+	// Number of open handlers and streams.
+	load: number;
+	// Number of handler factories and streams ever given to the worker (used
+	// to spread them when load is the same).
+	assigned: number;
+};
+
+export class WorkerPool extends EnhancedEventEmitter<WorkerPoolEvents> {
+	// Settings used to (re)spawn workers.
+	readonly #settings: WorkerSettings;
+	// Workers.
+	readonly #workers: Worker[];
+	// Load of each worker.
+	readonly #loads: Map<Worker, WorkerLoad> = new Map();
+	// Worker of each AiortcMediaStream created by the pool.
+	readonly #streamWorkers: WeakMap<AiortcMediaStream, Worker> = new WeakMap();
+	// Attempts to replace a dead worker.
+	readonly #maxRestartAttempts: number;
+	// Delay (ms) before the second attempt to replace a dead worker.
+	readonly #restartDelay: number;
+	// Closed flag.
+	#closed = false;
+
+	constructor({
+		workers,
+		settings,
+		maxRestartAttempts = DEFAULT_MAX_RESTART_ATTEMPTS,
+		restartDelay = DEFAULT_RESTART_DELAY,
+	}: {
+		workers: Worker[];
+		settings: WorkerSettings;
+		maxRestartAttempts?: number;
+		restartDelay?: number;
+	}) {
+		super();
+
+		logger.debug('constructor() [numWorkers:%o]', workers.length);
+
+		this.#settings = settings;
+		this.#workers = workers;
+		this.#maxRestartAttempts = maxRestartAttempts;
+		this.#restartDelay = restartDelay;
+
+		for (const worker of workers) {
+			this.addWorker(worker);
+		}
+	}
+
+	/**
+	 * Workers in the pool.
+	 */
+	get workers(): Worker[] {
+		return Array.from(this.#workers);
+	}
+
+	/**
+	 * Whether the WorkerPool is closed.
+	 */
+	get closed(): boolean {
+		return this.#closed;
+	}
+
+	/**
+	 * Close the WorkerPool and all its workers.
+	 */
+	close(): void {
+		if (this.#closed) {
+			return;
+		}
+
+		logger.debug('close()');
+
+		this.#closed = true;
+
+		for (const worker of this.#workers) {
+			worker.close();
+		}
+
+		this.#loads.clear();
+	}
+
+	/**
+	 * Dump of every worker plus all their players and handlers.
+	 */
+	async dump(): Promise<any> {
+		logger.debug('dump()');
+
+		const workers = await Promise.all(
+			this.#workers
+				.filter(worker => !worker.closed)
+				.map(worker => worker.dump())
+		);
+
+		return {
+			workers,
+			players: workers.flatMap(dump => dump.players),
+			handlers: workers.flatMap(dump => dump.handlers),
+		};
+	}
+
+	/**
+	 * Create a AiortcMediaStream in the least loaded worker.
+	 */
+	async getUserMedia(
+		constraints: media.AiortcMediaStreamConstraints
+	): Promise<AiortcMediaStream> {
+		logger.debug('getUserMedia() [constraints:%o]', constraints);
+
+		const worker = this.getLeastLoadedWorker();
+		const stream = await worker.getUserMedia(constraints);
+
+		this.#streamWorkers.set(stream, worker);
+		this.#loads.get(worker)!.assigned++;
+		this.updateLoad(worker, 1);
+
+		stream.addEventListener('@close', () => this.updateLoad(worker, -1));
+
+		return stream;
+	}
+
+	/**
+	 * Create a mediasoup-client HandlerFactory. All the handlers created by it
+	 * run in the same worker, which is the one of the given stream (so its
+	 * tracks can be sent) or otherwise the least loaded one.
+	 */
+	createHandlerFactory({
+		stream,
+		statsInterval,
+		passthrough,
+		reuseCertificate,
+	}: {
+		stream?: AiortcMediaStream;
+		statsInterval?: number;
+		passthrough?: boolean;
+		reuseCertificate?: boolean;
+	} = {}): HandlerFactory {
+		logger.debug('createHandlerFactory()');
+
+		let worker: Worker;
+
+		if (stream) {
+			const streamWorker = this.#streamWorkers.get(stream);
+
+			if (!streamWorker) {
+				throw new TypeError('stream not created by this WorkerPool');
+			}
+
+			worker = streamWorker;
+		} else {
+			worker = this.getLeastLoadedWorker();
+		}
+
+		this.#loads.get(worker)!.assigned++;
+
+		let factory = worker.createHandlerFactory({
+			statsInterval,
+			passthrough,
+			reuseCertificate,
+		});
+
+		return (): Handler => {
+			// If the worker died, move to another one (not possible if a stream
+			// was given since its tracks are gone).
+			if (worker.closed) {
+				if (stream) {
+					throw new Error('worker of the given stream is closed');
+				}
+
+				worker = this.getLeastLoadedWorker();
+				factory = worker.createHandlerFactory({
+					statsInterval,
+					passthrough,
+					reuseCertificate,
+				});
+			}
+
+			const handlerWorker = worker;
+			const handler = factory() as Handler;
+
+			this.updateLoad(handlerWorker, 1);
+
+			handler.on('@close', () => this.updateLoad(handlerWorker, -1));
+
+			return handler;
+		};
+	}
+
+	private getLeastLoadedWorker(): Worker {
+		if (this.#closed) {
+			throw new Error('WorkerPool closed');
+		}
+
+		let bestWorker: Worker | undefined;
+		let bestLoad: WorkerLoad | undefined;
+
+		for (const worker of this.#workers) {
+			const load = this.#loads.get(worker);
+
+			if (!load || worker.closed) {
+				continue;
+			}
+
+			if (
+				!bestLoad ||
+				load.load < bestLoad.load ||
+				(load.load === bestLoad.load && load.assigned < bestLoad.assigned)
+			) {
+				bestWorker = worker;
+				bestLoad = load;
+			}
+		}
+
+		if (!bestWorker) {
+			throw new Error('no worker available');
+		}
+
+		return bestWorker;
+	}
+
+	private updateLoad(worker: Worker, delta: number): void {
+		const load = this.#loads.get(worker);
+
+		// Worker may be gone.
+		if (!load) {
+			return;
+		}
+
+		load.load += delta;
+	}
+
+	private addWorker(worker: Worker): void {
+		this.#loads.set(worker, { load: 0, assigned: 0 });
+
+		worker.on('died', error => {
+			logger.error('worker died [pid:%s]: %s', worker.pid, error.message);
+
+			this.#loads.delete(worker);
+			this.safeEmit('workerdied', worker, error);
+
+			if (!this.#closed) {
+				this.restartWorker(worker);
+			}
+		});
+	}
+
+	private async restartWorker(deadWorker: Worker): Promise<void> {
+		let worker: Worker | undefined;
+		let lastError: Error | undefined;
+
+		for (let attempt = 1; attempt <= this.#maxRestartAttempts; ++attempt) {
+			if (attempt > 1) {
+				await new Promise(resolve =>
+					setTimeout(resolve, this.#restartDelay * 2 ** (attempt - 2))
+				);
+			}
+
+			if (this.#closed) {
+				return;
+			}
+
+			try {
+				worker = await spawnWorker(this.#settings);
+
+				break;
+			} catch (error) {
+				lastError = error as Error;
+
+				logger.error(
+					'failed to restart worker [attempt:%s/%s]: %s',
+					attempt,
+					this.#maxRestartAttempts,
+					lastError.message
+				);
+			}
+		}
+
+		if (this.#closed) {
+			worker?.close();
+
+			return;
+		}
+
+		const idx = this.#workers.indexOf(deadWorker);
+
+		if (!worker) {
+			// So pool.workers tells the capacity left.
+			if (idx !== -1) {
+				this.#workers.splice(idx, 1);
+			}
+
+			logger.error('worker lost [pid:%s]', deadWorker.pid);
+
+			this.safeEmit(
+				'workerlost',
+				deadWorker,
+				lastError ?? new Error('worker not restarted')
+			);
+
+			return;
+		}
+
+		if (idx !== -1) {
+			this.#workers[idx] = worker;
+		} else {
+			this.#workers.push(worker);
+		}
+
+		this.addWorker(worker);
+
+		logger.debug('worker restarted [pid:%s]', worker.pid);
+
+		this.safeEmit('workerrestarted', worker);
+	}
+}
+
+export async function spawnWorker(settings: WorkerSettings): Promise<Worker> {
+	const worker = new Worker(settings);
+
+	return new Promise<Worker>((resolve, reject) => {
+		worker.on('@success', () => resolve(worker));
+		worker.on('@failure', reject);
+	});
+}
+
+export function getDefaultNumWorkers(): number {
+	return Math.max(1, os.cpus().length);
+}
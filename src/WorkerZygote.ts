@@ -0,0 +1,266 @@
+import process from 'node:process';
+import os from 'node:os';
+import path from 'node:path';
+import { ChildProcess } from 'node:child_process';
+import { v4 as uuidv4 } from 'uuid';
+import { InvalidStateError } from 'mediasoup-client/lib/errors';
+import { Logger } from './Logger';
+import { EnhancedEventEmitter } from './enhancedEvents';
+import {
+	Worker,
+	WorkerSettings,
+	PYTHON_LOG_VIA_PIPE,
+	getWorkerArgs,
+	spawnWorkerProcess,
+} from './Worker';
+import { spawnWorker } from './WorkerPool';
+
+const LISTENING_REGEX = /^worker: listening on (\S+)$/;
+
+const logger = new Logger('WorkerZygote');
+
+export type WorkerZygoteSettings = Omit<WorkerSettings, 'connect' | 'token'>;
+
+export type WorkerZygoteEvents = {
+	died: [Error];
+	subprocessclose: [];
+	// Private events.
+	'@success': [];
+	'@failure': [Error];
+};
+
+export class WorkerZygote extends EnhancedEventEmitter<WorkerZygoteEvents> {
+	// Python zygote child process.
+	readonly #child: ChildProcess;
+	// Zygote process PID.
+	readonly #pid: number;
+	// Token required by the zygote.
+	readonly #token: string = uuidv4();
+	// Address the zygote listens on (once listening).
+	#address?: string;
+	// Workers forked by the zygote.
+	readonly #workers: Set<Worker> = new Set();
+	// Closed flag.
+	#closed = false;
+	// Zygote subprocess closed flag.
+	#subprocessClosed = false;
+
+	constructor(settings: WorkerZygoteSettings) {
+		super();
+
+		logger.debug('constructor() [settings:%o]', settings);
+
+		// Keep it short since UNIX socket paths are limited to ~100 bytes.
+		const socketPath = path.join(
+			os.tmpdir(),
+			`mediasoup-client-aiortc-${uuidv4().slice(0, 8)}.sock`
+		);
+
+		// fd 0 (stdin)  : Just ignore it.
+		// fd 1 (stdout) : Pipe it to know when the zygote is listening.
+		// fd 2 (stderr) : Pipe it for logging.
+		this.#child = spawnWorkerProcess(
+			[
+				...getWorkerArgs(settings),
+				`--listen=unix:${socketPath}`,
+				'--fork',
+				`--token=${this.#token}`,
+			],
+			['ignore', 'pipe', PYTHON_LOG_VIA_PIPE ? 'pipe' : 'inherit']
+		);
+
+		this.#pid = this.#child.pid!;
+
+		let spawnDone = false;
+		let stdoutBuffer = '';
+
+		this.#child.stdout!.on('data', buffer => {
+			stdoutBuffer += buffer.toString('utf8');
+
+			const lines = stdoutBuffer.split('\n');
+
+			// Keep the incomplete line.
+			stdoutBuffer = lines.pop()!;
+
+			for (const line of lines) {
+				const match = line.match(LISTENING_REGEX);
+
+				if (match && !spawnDone) {
+					spawnDone = true;
+					this.#address = match[1];
+
+					logger.debug(
+						'zygote process listening [pid:%s, address:%s]',
+						this.#pid,
+						this.#address
+					);
+
+					this.emit('@success');
+				} else if (line) {
+					// Logs of the zygote and of the forked workers.
+					if (PYTHON_LOG_VIA_PIPE) {
+						logger.debug(`(stdout) ${line}`);
+					} else {
+						process.stdout.write(`${line}\n`);
+					}
+				}
+			}
+		});
+
+		if (PYTHON_LOG_VIA_PIPE) {
+			this.#child.stderr!.on('data', buffer => {
+				for (const line of buffer.toString('utf8').split('\n')) {
+					if (line) {
+						logger.error(`(stderr) ${line}`);
+					}
+				}
+			});
+		}
+
+		this.#child.on('exit', (code, signal) => {
+			// If killed by ourselves, do nothing.
+			if (this.#child.killed) {
+				return;
+			}
+
+			const error = new Error(
+				`[pid:${this.#pid}, code:${code}, signal:${signal}]`
+			);
+
+			if (!spawnDone) {
+				spawnDone = true;
+
+				logger.error(
+					'zygote process failed [pid:%s, code:%s, signal:%s]',
+					this.#pid,
+					code,
+					signal
+				);
+
+				this.close();
+				this.emit(
+					'@failure',
+					code === 2 ? new TypeError('wrong settings') : error
+				);
+			} else {
+				logger.error(
+					'zygote process died unexpectedly [pid:%s, code:%s, signal:%s]',
+					this.#pid,
+					code,
+					signal
+				);
+
+				this.close();
+				this.safeEmit('died', error);
+			}
+		});
+
+		this.#child.on('error', error => {
+			// If killed by ourselves, do nothing.
+			if (this.#child.killed) {
+				return;
+			}
+
+			logger.error(
+				'zygote process error [pid:%s]: %s',
+				this.#pid,
+				error.message
+			);
+
+			this.close();
+
+			if (!spawnDone) {
+				spawnDone = true;
+
+				this.emit('@failure', error);
+			} else {
+				this.safeEmit('died', error);
+			}
+		});
+
+		this.#child.on('close', () => {
+			logger.debug('zygote subprocess closed [pid:%s]', this.#pid);
+
+			this.#subprocessClosed = true;
+
+			this.safeEmit('subprocessclose');
+		});
+	}
+
+	/**
+	 * Zygote process identifier (PID).
+	 */
+	get pid(): number {
+		return this.#pid;
+	}
+
+	/**
+	 * Whether the WorkerZygote is closed.
+	 */
+	get closed(): boolean {
+		return this.#closed;
+	}
+
+	/**
+	 * Whether the zygote subprocess is closed.
+	 */
+	get subprocessClosed(): boolean {
+		return this.#subprocessClosed;
+	}
+
+	/**
+	 * Open workers forked by the zygote.
+	 */
+	get workers(): Worker[] {
+		return Array.from(this.#workers);
+	}
+
+	/**
+	 * Close the zygote and every worker forked by it.
+	 */
+	close(): void {
+		if (this.#closed) {
+			return;
+		}
+
+		logger.debug('close()');
+
+		this.#closed = true;
+
+		for (const worker of this.#workers) {
+			worker.close();
+		}
+		this.#workers.clear();
+
+		// Kill the zygote process (it also removes the socket file).
+		this.#child.kill('SIGTERM');
+	}
+
+	/**
+	 * Create a Worker served by a process forked by the zygote, so it does not
+	 * pay the Python startup time.
+	 */
+	async createWorker(): Promise<Worker> {
+		logger.debug('createWorker()');
+
+		if (this.#closed) {
+			throw new InvalidStateError('WorkerZygote closed');
+		}
+
+		const worker = await spawnWorker({
+			connect: this.#address,
+			token: this.#token,
+		});
+
+		if (this.#closed) {
+			worker.close();
+
+			throw new InvalidStateError('WorkerZygote closed');
+		}
+
+		this.#workers.add(worker);
+		worker.on('subprocessclose', () => this.#workers.delete(worker));
+
+		return worker;
+	}
+}
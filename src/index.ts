@@ -1,9 +1,33 @@
 import { Logger } from './Logger';
-import { Worker, WorkerSettings, WorkerLogLevel } from './Worker';
+import {
+	Worker,
+	WorkerSettings,
+	WorkerLogLevel,
+	WorkerCodec,
+	WorkerLogRecord,
+	WorkerMetrics,
+	WorkerHistogram,
+	WorkerProfilingMode,
+	WorkerProfilingOptions,
+	WorkerProfile,
+} from './Worker';
+import {
+	WorkerPool,
+	WorkerPoolSettings,
+	WorkerPoolEvents,
+	spawnWorker,
+	getDefaultNumWorkers,
+} from './WorkerPool';
+import {
+	WorkerZygote,
+	WorkerZygoteSettings,
+	WorkerZygoteEvents,
+} from './WorkerZygote';
 import { AiortcMediaStream } from './AiortcMediaStream';
 import {
 	AiortcMediaStreamConstraints,
 	AiortcMediaTrackConstraints,
+	AiortcSyntheticPattern,
 } from './media';
 
 const logger = new Logger();
@@ -13,10 +37,32 @@ const logger = new Logger();
  */
 export async function createWorker({
 	logLevel = 'error',
+	logRingSize,
+	logRingOnly,
+	maxInFlightRequests,
+	codec,
+	bufferedAmountInterval,
+	dataChannelMessageWindow,
+	encodedCacheSize,
+	certificatePoolSize,
+	connect,
+	token,
 }: WorkerSettings = {}): Promise<Worker> {
 	logger.debug('createWorker()');
 
-	const worker = new Worker({ logLevel });
+	const worker = new Worker({
+		logLevel,
+		logRingSize,
+		logRingOnly,
+		maxInFlightRequests,
+		codec,
+		bufferedAmountInterval,
+		dataChannelMessageWindow,
+		encodedCacheSize,
+		certificatePoolSize,
+		connect,
+		token,
+	});
 
 	return new Promise<Worker>((resolve, reject) => {
 		worker.on('@success', () => resolve(worker));
@@ -24,14 +70,130 @@ export async function createWorker({
 	});
 }
 
+/**
+ * Expose WorkerPool factory.
+ */
+export async function createWorkerPool({
+	numWorkers = getDefaultNumWorkers(),
+	logLevel = 'error',
+	logRingSize,
+	logRingOnly,
+	maxInFlightRequests,
+	codec,
+	bufferedAmountInterval,
+	dataChannelMessageWindow,
+	encodedCacheSize,
+	certificatePoolSize,
+	connect,
+	token,
+}: WorkerPoolSettings = {}): Promise<WorkerPool> {
+	logger.debug('createWorkerPool() [numWorkers:%o]', numWorkers);
+
+	const settings = {
+		logLevel,
+		logRingSize,
+		logRingOnly,
+		maxInFlightRequests,
+		codec,
+		bufferedAmountInterval,
+		dataChannelMessageWindow,
+		encodedCacheSize,
+		certificatePoolSize,
+		connect,
+		token,
+	};
+	const results = await Promise.allSettled(
+		Array.from({ length: numWorkers }, () => spawnWorker(settings))
+	);
+	const workers: Worker[] = [];
+
+	for (const result of results) {
+		if (result.status === 'fulfilled') {
+			workers.push(result.value);
+		}
+	}
+
+	const failure = results.find(result => result.status === 'rejected');
+
+	if (failure) {
+		for (const worker of workers) {
+			worker.close();
+		}
+
+		throw (failure as PromiseRejectedResult).reason;
+	}
+
+	return new WorkerPool({ workers, settings });
+}
+
+/**
+ * Expose WorkerZygote factory.
+ */
+export async function createWorkerZygote({
+	logLevel = 'error',
+	logRingSize,
+	logRingOnly,
+	maxInFlightRequests,
+	codec,
+	bufferedAmountInterval,
+	dataChannelMessageWindow,
+	encodedCacheSize,
+	certificatePoolSize,
+}: WorkerZygoteSettings = {}): Promise<WorkerZygote> {
+	logger.debug('createWorkerZygote()');
+
+	const zygote = new WorkerZygote({
+		logLevel,
+		logRingSize,
+		logRingOnly,
+		maxInFlightRequests,
+		codec,
+		bufferedAmountInterval,
+		dataChannelMessageWindow,
+		encodedCacheSize,
+		certificatePoolSize,
+	});
+
+	return new Promise<WorkerZygote>((resolve, reject) => {
+		zygote.on('@success', () => resolve(zygote));
+		zygote.on('@failure', reject);
+	});
+}
+
 /**
  * Expose Worker class and related types.
  */
 export { Worker };
-export type { WorkerSettings, WorkerLogLevel };
+export type {
+	WorkerSettings,
+	WorkerLogLevel,
+	WorkerCodec,
+	WorkerLogRecord,
+	WorkerMetrics,
+	WorkerHistogram,
+	WorkerProfilingMode,
+	WorkerProfilingOptions,
+	WorkerProfile,
+};
+
+/**
+ * Expose WorkerPool class and related types.
+ */
+export { WorkerPool };
+export type { WorkerPoolSettings, WorkerPoolEvents };
+
+/**
+ * Expose WorkerZygote class and related types.
+ */
+export { WorkerZygote };
+export type { WorkerZygoteSettings, WorkerZygoteEvents };
 
 /**
  * Expose AiortcMediaStream class and related types.
  */
 export { AiortcMediaStream };
-export type { AiortcMediaStreamConstraints, AiortcMediaTrackConstraints };
+export type {
+	AiortcMediaStreamConstraints,
+	AiortcMediaTrackConstraints,
+	AiortcSyntheticPattern,
+};
@@ -11,7 +11,7 @@ export type AiortcMediaStreamConstraints = {
 };
 
 export type AiortcMediaTrackConstraints = {
-	source: 'device' | 'file' | 'url';
+	source: 'device' | 'file' | 'url' | 'synthetic';
 	device?: string;
 	file?: string;
 	url?: string;
@@ -20,8 +20,20 @@ export type AiortcMediaTrackConstraints = {
 	timeout?: number;
 	loop?: boolean;
 	decode?: boolean;
+	shared?: boolean;
+	cache?: boolean;
+	// Settings of 'synthetic' source (bitrate also of 'file' and 'url' ones
+	// with cache).
+	pattern?: AiortcSyntheticPattern;
+	width?: number;
+	height?: number;
+	framerate?: number;
+	bitrate?: number;
+	frequency?: number;
 };
 
+export type AiortcSyntheticPattern = 'tone' | 'bars' | 'noise';
+
 type MediaPlayerInternal = {
 	playerId: string;
 	audioTrackId?: string;
@@ -36,6 +48,20 @@ type MediaPlayerOptions = {
 	timeout?: number;
 	loop?: boolean;
 	decode?: boolean;
+	shared?: boolean;
+	cache?: boolean;
+	bitrate?: number;
+};
+
+type SyntheticPlayerOptions = {
+	source: 'synthetic';
+	kind: 'audio' | 'video';
+	pattern?: AiortcSyntheticPattern;
+	width?: number;
+	height?: number;
+	framerate?: number;
+	bitrate?: number;
+	frequency?: number;
 };
 
 export async function getUserMedia(
@@ -47,8 +73,14 @@ export async function getUserMedia(
 	let { audio, video } = constraints;
 	let audioPlayerInternal: MediaPlayerInternal | undefined;
 	let videoPlayerInternal: MediaPlayerInternal | undefined;
-	let audioPlayerOptions: MediaPlayerOptions | undefined;
-	let videoPlayerOptions: MediaPlayerOptions | undefined;
+	let audioPlayerOptions:
+		| MediaPlayerOptions
+		| SyntheticPlayerOptions
+		| undefined;
+	let videoPlayerOptions:
+		| MediaPlayerOptions
+		| SyntheticPlayerOptions
+		| undefined;
 	const tracks: FakeMediaStreamTrack[] = [];
 
 	if (!audio && !video) {
@@ -76,6 +108,7 @@ export async function getUserMedia(
 					timeout: audio.timeout,
 					loop: audio.loop,
 					decode: audio.decode,
+					shared: audio.shared,
 				};
 
 				break;
@@ -94,6 +127,9 @@ export async function getUserMedia(
 					timeout: audio.timeout,
 					loop: audio.loop,
 					decode: audio.decode,
+					shared: audio.shared,
+					cache: audio.cache,
+					bitrate: audio.bitrate,
 				};
 
 				break;
@@ -112,6 +148,21 @@ export async function getUserMedia(
 					timeout: audio.timeout,
 					loop: audio.loop,
 					decode: audio.decode,
+					shared: audio.shared,
+					cache: audio.cache,
+					bitrate: audio.bitrate,
+				};
+
+				break;
+			}
+
+			case 'synthetic': {
+				audioPlayerOptions = {
+					source: 'synthetic',
+					kind: 'audio',
+					pattern: audio.pattern,
+					bitrate: audio.bitrate,
+					frequency: audio.frequency,
 				};
 
 				break;
@@ -146,6 +197,7 @@ export async function getUserMedia(
 					timeout: video.timeout,
 					loop: video.loop,
 					decode: video.decode,
+					shared: video.shared,
 				};
 
 				break;
@@ -164,6 +216,9 @@ export async function getUserMedia(
 					timeout: video.timeout,
 					loop: video.loop,
 					decode: video.decode,
+					shared: video.shared,
+					cache: video.cache,
+					bitrate: video.bitrate,
 				};
 
 				break;
@@ -182,6 +237,23 @@ export async function getUserMedia(
 					timeout: video.timeout,
 					loop: video.loop,
 					decode: video.decode,
+					shared: video.shared,
+					cache: video.cache,
+					bitrate: video.bitrate,
+				};
+
+				break;
+			}
+
+			case 'synthetic': {
+				videoPlayerOptions = {
+					source: 'synthetic',
+					kind: 'video',
+					pattern: video.pattern,
+					width: video.width,
+					height: video.height,
+					framerate: video.framerate,
+					bitrate: video.bitrate,
 				};
 
 				break;
@@ -193,14 +265,12 @@ export async function getUserMedia(
 		}
 	}
 
-	// If both players have source 'file' or 'url' and their file match, just
-	// create a single MediaPlayer.
-	const areSamePlayer =
-		audioPlayerInternal &&
-		videoPlayerInternal &&
-		['file', 'url'].includes(audioPlayerOptions!.source) &&
-		audioPlayerOptions!.source === videoPlayerOptions!.source &&
-		audioPlayerOptions!.file === videoPlayerOptions!.file;
+	// If both players have source 'file' or 'url' and their file (and cache
+	// settings) match, just create a single MediaPlayer.
+	const areSamePlayer = isSameMediaPlayer(
+		audioPlayerOptions,
+		videoPlayerOptions
+	);
 
 	let result: {
 		audioTrackId?: string;
@@ -299,3 +369,25 @@ export async function getUserMedia(
 
 	return stream;
 }
+
+function isSameMediaPlayer(
+	audioPlayerOptions?: MediaPlayerOptions | SyntheticPlayerOptions,
+	videoPlayerOptions?: MediaPlayerOptions | SyntheticPlayerOptions
+): boolean {
+	if (
+		!audioPlayerOptions ||
+		!videoPlayerOptions ||
+		audioPlayerOptions.source === 'synthetic' ||
+		videoPlayerOptions.source === 'synthetic'
+	) {
+		return false;
+	}
+
+	return (
+		['file', 'url'].includes(audioPlayerOptions.source) &&
+		audioPlayerOptions.source === videoPlayerOptions.source &&
+		audioPlayerOptions.file === videoPlayerOptions.file &&
+		audioPlayerOptions.cache === videoPlayerOptions.cache &&
+		audioPlayerOptions.bitrate === videoPlayerOptions.bitrate
+	);
+}
@@ -1,7 +1,16 @@
+import { spawn } from 'node:child_process';
+import { PassThrough } from 'node:stream';
 import { Device, types as mediasoupClientTypes } from 'mediasoup-client';
 import { FakeMediaStreamTrack } from 'fake-mediastreamtrack';
-import { createWorker } from '../';
+import {
+	createWorker,
+	createWorkerPool,
+	createWorkerZygote,
+	WorkerPool,
+} from '../';
 import { Worker } from '../Worker';
+import { Handler } from '../Handler';
+import { Channel } from '../Channel';
 import * as fakeParameters from './fakeParameters';
 
 type TestContext = {
@@ -151,6 +160,38 @@ test(
 			pid: worker.pid,
 			players: [],
 			handlers: [],
+			sharedSources: [],
+			encodedLoops: {
+				maxSize: 256 * 1024 * 1024,
+				size: 0,
+				hits: 0,
+				misses: 0,
+				evictions: 0,
+				loops: [],
+			},
+			recvTracks: { count: 0, queuedFrames: 0, queuedBytes: 0 },
+			certificates: {
+				size: 4,
+				available: expect.any(Number),
+				taken: 0,
+				missed: 0,
+				reused: 0,
+			},
+			dispatcher: {
+				maxInFlight: 64,
+				// The dump request itself.
+				inFlight: 1,
+				queued: 0,
+				keys: 1,
+			},
+			channel: {
+				sendQueueMessages: 0,
+				sendQueueBytes: 0,
+				bufferedBytes: 0,
+				// The 'running' notification.
+				writes: 1,
+				coalesced: 0,
+			},
 		});
 
 		worker.close();
@@ -160,6 +201,132 @@ test(
 	TEST_TIMEOUT
 );
 
+test(
+	'worker.getMetrics() succeeds',
+	async () => {
+		const worker = await createWorker({ logLevel: 'debug' });
+
+		await worker.dump();
+
+		const metrics = await worker.getMetrics();
+
+		expect(metrics.pid).toBe(worker.pid);
+		expect(metrics.requests.dump.count).toBe(1);
+		expect(metrics.requests.dump.counts.length).toBe(
+			metrics.buckets.length + 1
+		);
+		expect(metrics.errors).toEqual({});
+		expect(metrics.channel.messagesIn).toBe(2);
+		expect(metrics.channel.messagesOut).toBeGreaterThanOrEqual(2);
+		expect(metrics.handlers).toEqual({});
+
+		worker.close();
+
+		await new Promise<void>(resolve => worker.on('subprocessclose', resolve));
+	},
+	TEST_TIMEOUT
+);
+
+test(
+	'worker.getLogs() succeeds',
+	async () => {
+		const worker = await createWorker({
+			logLevel: 'debug',
+			logRingSize: 10,
+			logRingOnly: true,
+		});
+
+		for (let i = 0; i < 20; ++i) {
+			await worker.dump();
+		}
+
+		const logs = await worker.getLogs();
+
+		// Records are kept by a separate thread, so the last ones may be missing.
+		expect(logs.length).toBeLessThanOrEqual(10);
+		expect(logs).toContainEqual({
+			time: expect.any(Number),
+			level: 'debug',
+			message: 'session: processRequest() [method:dump]',
+		});
+
+		worker.close();
+
+		await new Promise<void>(resolve => worker.on('subprocessclose', resolve));
+	},
+	TEST_TIMEOUT
+);
+
+test(
+	'worker.startProfiling() and worker.stopProfiling() succeed',
+	async () => {
+		const worker = await createWorker({ logLevel: 'debug' });
+
+		await expect(worker.stopProfiling()).rejects.toThrow('not profiling');
+
+		await worker.startProfiling({ mode: 'sampling', interval: 1 });
+
+		await expect(worker.startProfiling()).rejects.toThrow(
+			'already profiling'
+		);
+
+		for (let i = 0; i < 100; ++i) {
+			await worker.dump();
+		}
+
+		const sampling = await worker.stopProfiling();
+
+		expect(sampling.mode).toBe('sampling');
+		expect(sampling.format).toBe('collapsed');
+		expect(sampling.samples).toBeGreaterThan(0);
+		expect(typeof sampling.data).toBe('string');
+
+		await worker.startProfiling({ mode: 'cprofile', duration: 100 });
+		await worker.dump();
+		await new Promise(resolve => setTimeout(resolve, 200));
+
+		const cprofile = await worker.stopProfiling();
+
+		expect(cprofile.mode).toBe('cprofile');
+		expect(cprofile.format).toBe('pstats');
+		expect(cprofile.duration).toBeLessThan(200);
+		expect(cprofile.data).toMatch(/function calls/);
+
+		worker.close();
+
+		await new Promise<void>(resolve => worker.on('subprocessclose', resolve));
+	},
+	TEST_TIMEOUT
+);
+
+test(
+	'worker handles a burst of 10000 requests without losing any',
+	async () => {
+		const worker = await createWorker();
+		const numRequests = 10000;
+		const startTime = Date.now();
+		const dumps = await Promise.all(
+			Array.from({ length: numRequests }, () => worker.dump())
+		);
+		const elapsedMs = Date.now() - startTime;
+
+		expect(dumps.length).toBe(numRequests);
+
+		for (const dump of dumps) {
+			expect(dump.pid).toBe(worker.pid);
+		}
+
+		// 10000 requests plus 10000 responses in less than 2 seconds means more
+		// than 10k msgs/s through the Channel.
+		expect(elapsedMs).toBeLessThan(2000);
+
+		worker.close();
+
+		await new Promise<void>(resolve => worker.on('subprocessclose', resolve));
+	},
+	TEST_TIMEOUT
+);
+
 test(
 	'worker.getUserMedia() succeeds',
 	async () => {
@@ -189,6 +356,12 @@ test(
 				},
 			],
 			handlers: [],
+			sharedSources: [],
+			encodedLoops: expect.any(Object),
+			recvTracks: expect.any(Object),
+			certificates: expect.any(Object),
+			dispatcher: expect.any(Object),
+			channel: expect.any(Object),
 		});
 
 		audioTrack.stop();
@@ -211,6 +384,12 @@ test(
 				},
 			],
 			handlers: [],
+			sharedSources: [],
+			encodedLoops: expect.any(Object),
+			recvTracks: expect.any(Object),
+			certificates: expect.any(Object),
+			dispatcher: expect.any(Object),
+			channel: expect.any(Object),
 		});
 
 		stream.close();
@@ -219,6 +398,12 @@ test(
 			pid: worker.pid,
 			players: [],
 			handlers: [],
+			sharedSources: [],
+			encodedLoops: expect.any(Object),
+			recvTracks: expect.any(Object),
+			certificates: expect.any(Object),
+			dispatcher: expect.any(Object),
+			channel: expect.any(Object),
 		});
 
 		worker.close();
@@ -228,6 +413,428 @@ test(
 	TEST_TIMEOUT * 2
 );
 
+test(
+	'worker.getUserMedia() with shared: true decodes the same file once',
+	async () => {
+		const worker = await createWorker({ logLevel: 'debug' });
+		const constraints = {
+			video: {
+				source: 'file' as const,
+				file: 'src/test/data/small.mp4',
+				shared: true,
+			},
+		};
+		const stream1 = await worker.getUserMedia(constraints);
+		const stream2 = await worker.getUserMedia(constraints);
+
+		let dump = await worker.dump();
+
+		expect(dump.players.length).toBe(2);
+		expect(dump.sharedSources).toEqual([
+			{ file: 'src/test/data/small.mp4', refCount: 2 },
+		]);
+
+		stream1.close();
+
+		dump = await worker.dump();
+
+		expect(dump.players.length).toBe(1);
+		expect(dump.players[0].videoTrack.readyState).toBe('live');
+		expect(dump.sharedSources).toEqual([
+			{ file: 'src/test/data/small.mp4', refCount: 1 },
+		]);
+
+		stream2.close();
+
+		dump = await worker.dump();
+
+		expect(dump.players).toEqual([]);
+		expect(dump.sharedSources).toEqual([]);
+
+		worker.close();
+
+		await new Promise<void>(resolve => worker.on('subprocessclose', resolve));
+	},
+	TEST_TIMEOUT
+);
+
+test(
+	'worker.getUserMedia() with source: synthetic succeeds',
+	async () => {
+		const worker = await createWorker({ logLevel: 'debug' });
+		const stream = await worker.getUserMedia({
+			audio: { source: 'synthetic', pattern: 'noise' },
+			video: { source: 'synthetic', width: 320, height: 240 },
+		});
+
+		expect(stream.getAudioTracks().length).toBe(1);
+		expect(stream.getVideoTracks().length).toBe(1);
+
+		let dump = await worker.dump();
+
+		expect(dump.players.length).toBe(2);
+
+		await expect(
+			worker.getUserMedia({
+				video: { source: 'synthetic', pattern: 'tone' },
+			})
+		).rejects.toThrow(TypeError);
+
+		stream.close();
+
+		dump = await worker.dump();
+
+		expect(dump.players).toEqual([]);
+
+		worker.close();
+
+		await new Promise<void>(resolve => worker.on('subprocessclose', resolve));
+	},
+	TEST_TIMEOUT
+);
+
+test(
+	'worker.getUserMedia() with cache: true succeeds',
+	async () => {
+		const worker = await createWorker({
+			logLevel: 'debug',
+			encodedCacheSize: 64,
+		});
+		const constraints = {
+			source: 'file' as const,
+			file: 'src/test/data/small.mp4',
+			loop: true,
+			cache: true,
+		};
+		const stream = await worker.getUserMedia({
+			audio: constraints,
+			video: constraints,
+		});
+
+		expect(stream.getAudioTracks().length).toBe(1);
+		expect(stream.getVideoTracks().length).toBe(1);
+
+		let dump = await worker.dump();
+
+		// Same file and cache settings, so a single player.
+		expect(dump.players.length).toBe(1);
+		expect(dump.encodedLoops.maxSize).toBe(64 * 1024 * 1024);
+
+		await expect(
+			worker.getUserMedia({
+				video: { ...constraints, loop: false },
+			})
+		).rejects.toThrow(TypeError);
+
+		stream.close();
+
+		dump = await worker.dump();
+
+		expect(dump.players).toEqual([]);
+
+		worker.close();
+
+		await new Promise<void>(resolve => worker.on('subprocessclose', resolve));
+	},
+	TEST_TIMEOUT
+);
+
+test(
+	'createWorkerPool() succeeds and restarts dead workers',
+	async () => {
+		const pool = await createWorkerPool({ numWorkers: 2, logLevel: 'debug' });
+
+		expect(pool.workers.length).toBe(2);
+
+		const stream = await pool.getUserMedia({
+			audio: { source: 'file', file: 'src/test/data/small.mp4' },
+		});
+
+		let dump = await pool.dump();
+
+		expect(dump.workers.length).toBe(2);
+		expect(dump.players.length).toBe(1);
+		expect(dump.handlers).toEqual([]);
+
+		// Next stream must go to the other (least loaded) worker.
+		const stream2 = await pool.getUserMedia({
+			audio: { source: 'file', file: 'src/test/data/small.mp4' },
+		});
+
+		dump = await pool.dump();
+
+		for (const workerDump of dump.workers) {
+			expect(workerDump.players.length).toBe(1);
+		}
+
+		// Handlers created with the stream run in the worker of the stream.
+		const handlerFactory = pool.createHandlerFactory({ stream });
+
+		expect(typeof handlerFactory).toBe('function');
+
+		const deadWorker = pool.workers[0];
+		const diedPromise = new Promise(resolve =>
+			pool.once('workerdied', resolve)
+		);
+		const restartedPromise = new Promise(resolve =>
+			pool.once('workerrestarted', resolve)
+		);
+
+		process.kill(deadWorker.pid, 'SIGKILL');
+
+		await expect(diedPromise).resolves.toBe(deadWorker);
+
+		const newWorker = await restartedPromise;
+
+		expect(pool.workers.length).toBe(2);
+		expect(pool.workers).toContain(newWorker);
+		expect(pool.workers).not.toContain(deadWorker);
+
+		dump = await pool.dump();
+
+		expect(dump.workers.length).toBe(2);
+
+		stream.close();
+		stream2.close();
+		pool.close();
+
+		await Promise.all(
+			pool.workers.map(
+				worker =>
+					new Promise<void>(resolve =>
+						worker.subprocessClosed
+							? resolve()
+							: worker.on('subprocessclose', resolve)
+					)
+			)
+		);
+	},
+	TEST_TIMEOUT
+);
+
+test(
+	'WorkerPool emits workerlost if a dead worker cannot be replaced',
+	async () => {
+		const worker = await createWorker({ logLevel: 'debug' });
+		// Replacing workers connect to a socket that does not exist.
+		const pool = new WorkerPool({
+			workers: [worker],
+			settings: { logLevel: 'debug', connect: 'unix:/nonexistent/worker.sock' },
+			maxRestartAttempts: 2,
+			restartDelay: 10,
+		});
+		const lostPromise = new Promise<[Worker, Error]>(resolve =>
+			pool.once('workerlost', (lostWorker, error) =>
+				resolve([lostWorker, error])
+			)
+		);
+		let restarted = false;
+
+		pool.on('workerrestarted', () => {
+			restarted = true;
+		});
+
+		process.kill(worker.pid, 'SIGKILL');
+
+		const [lostWorker, error] = await lostPromise;
+
+		expect(lostWorker).toBe(worker);
+		expect(error).toBeInstanceOf(Error);
+		expect(restarted).toBe(false);
+		expect(pool.workers).toEqual([]);
+		expect(() => pool.createHandlerFactory()).toThrow('no worker available');
+
+		pool.close();
+	},
+	TEST_TIMEOUT
+);
+
+test(
+	'createWorker() with connect succeeds against a listening worker',
+	async () => {
+		// Loopback TCP stand-in for a worker running in a remote host.
+		const server = spawn(
+			process.env.PYTHON ?? 'python3',
+			[
+				'-u',
+				'worker/worker.py',
+				'--listen=tcp:127.0.0.1:0',
+				'--token=s3cr3t',
+				'--logLevel=debug',
+			],
+			{
+				env: {
+					...process.env,
+					PYTHONPATH: `worker/pip_deps:${process.env.PYTHONPATH}`,
+				},
+				stdio: ['ignore', 'pipe', 'inherit'],
+			}
+		);
+
+		try {
+			const address = await new Promise<string>((resolve, reject) => {
+				let output = '';
+
+				server.stdout!.on('data', buffer => {
+					output += buffer.toString('utf8');
+
+					const match = output.match(/worker: listening on (\S+)/);
+
+					if (match) {
+						resolve(match[1]);
+					}
+				});
+
+				server.once('exit', () => reject(new Error('worker exited')));
+			});
+
+			await expect(
+				createWorker({ connect: address, token: 'wrong' })
+			).rejects.toThrow(Error);
+
+			await expect(createWorker({ connect: 'foo:1234' })).rejects.toThrow(
+				TypeError
+			);
+
+			const worker1 = await createWorker({ connect: address, token: 's3cr3t' });
+			const worker2 = await createWorker({ connect: address, token: 's3cr3t' });
+
+			expect(worker1.pid).toBe(server.pid);
+			expect(worker2.pid).toBe(server.pid);
+
+			await worker1.getUserMedia({
+				audio: { source: 'file', file: 'src/test/data/small.mp4' },
+			});
+
+			// Each connection is a separate session.
+			expect((await worker1.dump()).players.length).toBe(1);
+			expect((await worker2.dump()).players.length).toBe(0);
+
+			const device = new Device({
+				handlerFactory: worker2.createHandlerFactory(),
+			});
+
+			await device.load({
+				routerRtpCapabilities: fakeParameters.generateRouterRtpCapabilities(),
+			});
+
+			expect(device.loaded).toBe(true);
+
+			const subprocessClosed = new Promise<void>(resolve =>
+				worker1.on('subprocessclose', resolve)
+			);
+
+			worker1.close();
+
+			await subprocessClosed;
+
+			expect(worker1.died).toBe(false);
+			expect((await worker2.dump()).pid).toBe(server.pid);
+
+			worker2.close();
+		} finally {
+			server.kill('SIGTERM');
+		}
+	},
+	TEST_TIMEOUT
+);
+
+test(
+	'createWorkerZygote() succeeds and forks workers',
+	async () => {
+		const zygote = await createWorkerZygote({ logLevel: 'debug' });
+
+		const worker1 = await zygote.createWorker();
+		const worker2 = await zygote.createWorker();
+
+		expect(zygote.workers).toEqual([worker1, worker2]);
+		expect(worker1.pid).not.toBe(zygote.pid);
+		expect(worker2.pid).not.toBe(zygote.pid);
+		expect(worker1.pid).not.toBe(worker2.pid);
+
+		await worker1.getUserMedia({
+			audio: { source: 'file', file: 'src/test/data/small.mp4' },
+		});
+
+		expect((await worker1.dump()).pid).toBe(worker1.pid);
+		expect((await worker1.dump()).players.length).toBe(1);
+		expect((await worker2.dump()).players.length).toBe(0);
+
+		const diedPromise = new Promise(resolve => worker1.once('died', resolve));
+
+		process.kill(worker1.pid, 'SIGKILL');
+
+		await expect(diedPromise).resolves.toBeInstanceOf(Error);
+
+		expect(worker1.died).toBe(true);
+		expect(worker2.closed).toBe(false);
+
+		const subprocessClosed = new Promise<void>(resolve =>
+			zygote.on('subprocessclose', resolve)
+		);
+
+		zygote.close();
+
+		expect(worker2.closed).toBe(true);
+		expect(zygote.workers).toEqual([]);
+
+		await subprocessClosed;
+
+		await expect(zygote.createWorker()).rejects.toThrow(Error);
+	},
+	TEST_TIMEOUT
+);
+
+test(
+	'worker.createHandlerFactory() with reuseCertificate shares the DTLS certificate',
+	async () => {
+		const worker = await createWorker({
+			logLevel: 'debug',
+			certificatePoolSize: 2,
+		});
+		const device = new Device({
+			handlerFactory: worker.createHandlerFactory({ reuseCertificate: true }),
+		});
+
+		await device.load({
+			routerRtpCapabilities: fakeParameters.generateRouterRtpCapabilities(),
+		});
+
+		const { id, iceParameters, iceCandidates, dtlsParameters } =
+			fakeParameters.generateTransportRemoteParameters();
+		const sendTransport = device.createSendTransport({
+			id,
+			iceParameters,
+			iceCandidates,
+			dtlsParameters,
+		});
+		const recvTransport = device.createRecvTransport({
+			id,
+			iceParameters,
+			iceCandidates,
+			dtlsParameters,
+		});
+
+		// Processed by each handler once created.
+		await sendTransport.getStats();
+		await recvTransport.getStats();
+
+		const dump = await worker.dump();
+
+		expect(dump.certificates).toMatchObject({ size: 2, taken: 0, reused: 2 });
+		expect(dump.handlers.length).toBe(2);
+
+		for (const handler of dump.handlers) {
+			expect(typeof handler.createLatency).toBe('number');
+		}
+
+		worker.close();
+
+		await new Promise<void>(resolve => worker.on('subprocessclose', resolve));
+	},
+	TEST_TIMEOUT
+);
+
 test('create a Device with worker.createHandlerFactory() as argument succeeds', () => {
 	const device = new Device({
 		handlerFactory: ctx.worker!.createHandlerFactory(),
@@ -719,6 +1326,28 @@ test(
 	TEST_TIMEOUT
 );
 
+test('Channel carries many DataChannel messages within a binary frame', async () => {
+	// Loopback socket, so the Channel reads what it writes.
+	const channel = new Channel({ socket: new PassThrough(), pid: 0 });
+	const received = new Promise<[string, any]>(resolve =>
+		channel.once('dc1', (event: string, data: any) => resolve([event, data]))
+	);
+
+	channel.notifyBinaryMany({ handlerId: 'h1', dataChannelId: 'dc1' }, [
+		'foo',
+		Buffer.from([1, 2, 3]),
+		'',
+		'bär',
+	]);
+
+	const [event, data] = await received;
+
+	expect(event).toBe('messages');
+	expect(data).toEqual(['foo', Buffer.from([1, 2, 3]), '', 'bär']);
+
+	channel.close();
+});
+
 test(
 	'transport.produce() with a receiving track succeeds',
 	async () => {
@@ -732,6 +1361,10 @@ test(
 
 		expect(audioProducer.kind).toBe('audio');
 		expect(audioProducer.track).toBe(audioTrack);
+
+		const dump = await ctx.worker!.dump();
+
+		expect(dump.recvTracks.count).toBeGreaterThan(0);
 	},
 	TEST_TIMEOUT
 );
@@ -746,6 +1379,28 @@ test(
 	TEST_TIMEOUT
 );
 
+test(
+	'transport.getStats() succeeds with stats pushed by the worker',
+	async () => {
+		const handler = ctx.connectedSendTransport!.handler as Handler;
+
+		await handler.subscribeStats(100);
+		await new Promise(resolve => setTimeout(resolve, 500));
+
+		const stats = await ctx.connectedSendTransport!.getStats();
+
+		expect(stats.size).toBeGreaterThan(0);
+
+		for (const report of stats.values()) {
+			expect(typeof report.id).toBe('string');
+			expect(typeof report.timestamp).toBe('number');
+		}
+
+		await handler.unsubscribeStats();
+	},
+	TEST_TIMEOUT
+);
+
 test(
 	'producer.replaceTrack() succeeds',
 	async () => {
@@ -794,6 +1449,60 @@ test(
 	TEST_TIMEOUT
 );
 
+test(
+	'producer.setRtpEncodingParameters() succeeds',
+	async () => {
+		const stream = await ctx.worker!.getUserMedia({
+			video: { source: 'file', file: 'src/test/data/small.mp4' },
+		});
+		const videoProducer = await ctx.connectedSendTransport!.produce({
+			track: stream.getVideoTracks()[0],
+			encodings: [{ maxFramerate: 15 }],
+		});
+
+		let dump = await ctx.worker!.dump();
+		let sendTransceiver = dump.handlers[0].sendTransceivers.find(
+			(transceiver: any) => transceiver.localId === videoProducer.track!.id
+		);
+
+		expect(sendTransceiver.encoding).toEqual({
+			maxBitrate: null,
+			maxFramerate: 15,
+			scaleResolutionDownBy: null,
+		});
+
+		// Given parameters are merged into the current ones.
+		await expect(
+			videoProducer.setRtpEncodingParameters({
+				maxBitrate: 300000,
+				scaleResolutionDownBy: 2,
+			})
+		).resolves.toBe(undefined);
+
+		dump = await ctx.worker!.dump();
+		sendTransceiver = dump.handlers[0].sendTransceivers.find(
+			(transceiver: any) => transceiver.localId === videoProducer.track!.id
+		);
+
+		expect(sendTransceiver.encoding).toEqual({
+			maxBitrate: 300000,
+			maxFramerate: 15,
+			scaleResolutionDownBy: 2,
+		});
+
+		await expect(
+			videoProducer.setRtpEncodingParameters({ scaleResolutionDownBy: 0.5 })
+		).rejects.toThrow(TypeError);
+
+		await expect(videoProducer.setMaxSpatialLayer(0)).resolves.toBe(
+			undefined
+		);
+
+		videoProducer.close();
+	},
+	TEST_TIMEOUT
+);
+
 test(
 	'producer.getStats() succeeds',
 	async () => {
@@ -814,6 +1523,25 @@ test(
 	TEST_TIMEOUT
 );
 
+test(
+	'handler.getStatsBatch() succeeds',
+	async () => {
+		const handler = ctx.connectedRecvTransport!.handler as Handler;
+		const allStats = await handler.getStatsBatch();
+
+		expect(allStats.has(ctx.audioConsumer!.localId)).toBe(true);
+
+		const stats = await handler.getStatsBatch([
+			ctx.audioConsumer!.localId,
+			'non-existing-local-id',
+		]);
+
+		expect(Array.from(stats.keys())).toEqual([ctx.audioConsumer!.localId]);
+		expect(typeof stats.get(ctx.audioConsumer!.localId)).toBe('object');
+	},
+	TEST_TIMEOUT
+);
+
 test('consumer.pause() succeed', async () => {
 	ctx.audioConsumer!.pause();
 
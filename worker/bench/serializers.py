@@ -0,0 +1,131 @@
+"""
+Micro-benchmark of the channel codecs (see codec.py) on real payloads: the
+response to a handler.getStats request and the response to a createOffer one
+of a connected RTCPeerConnection sending and receiving many tracks.
+
+Usage (from the worker folder):
+
+    python bench/serializers.py [--transceivers N] [--number N]
+
+Results (aiortc 1.15, Python 3.11, x86_64, 10 audio + 10 video
+transceivers, microseconds per message, noisy shared machine):
+
+    codec           stats bytes    enc    dec | sdp bytes    enc    dec
+    json sort_keys         9803  269.2  136.3 |     30386  126.2   52.8
+    json                   9128  144.2   88.3 |     30378   90.8   46.4
+    orjson                 9128    8.9   33.4 |     30378   13.3   16.6
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import timeit
+from typing import Any, Callable, List, Tuple
+from aiortc import (
+    AudioStreamTrack,
+    RTCPeerConnection,
+    VideoStreamTrack
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codec import JsonCodec, OrjsonCodec, orjson  # noqa: E402
+from handler import Handler  # noqa: E402
+
+
+class SortedJsonCodec:
+    """
+    What the channel did before codecs existed.
+    """
+    name = "json sort_keys"
+
+    def dumps(self, message: Any) -> bytes:
+        return json.dumps(message, sort_keys=True).encode("utf8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+async def getPayloads(numTransceivers: int) -> Tuple[Any, Any]:
+    """
+    Responses of a getStats and a createOffer requests of a connected
+    RTCPeerConnection with the given number of audio and video transceivers.
+    """
+    pc1 = RTCPeerConnection()
+    pc2 = RTCPeerConnection()
+
+    for _ in range(numTransceivers):
+        pc1.addTransceiver(AudioStreamTrack(), "sendrecv")
+        pc1.addTransceiver(VideoStreamTrack(), "sendrecv")
+
+    await pc1.setLocalDescription(await pc1.createOffer())
+    await pc2.setRemoteDescription(pc1.localDescription)
+    for transceiver in pc2.getTransceivers():
+        transceiver.direction = "recvonly"
+    await pc2.setLocalDescription(await pc2.createAnswer())
+    await pc1.setRemoteDescription(pc2.localDescription)
+
+    # let RTCP flow so every kind of stats is there
+    await asyncio.sleep(6)
+
+    # stats serialization does not depend on the Handler state
+    handler = Handler.__new__(Handler)
+    stats = handler._serializeStats(await pc1.getStats())
+    offer = await pc1.createOffer()
+
+    await pc1.close()
+    await pc2.close()
+
+    return (
+        {"id": 1234, "accepted": True, "data": stats},
+        {"id": 1235, "accepted": True, "data": {"type": offer.type, "sdp": offer.sdp}}
+    )
+
+
+def measure(function: Callable[[], Any], number: int) -> float:
+    """
+    Best time (microseconds) of calling the given function.
+    """
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="channel codecs benchmark")
+    parser.add_argument("--transceivers", type=int, default=10,
+                        help="number of audio and of video transceivers")
+    parser.add_argument("--number", type=int, default=2000,
+                        help="number of operations per measurement")
+    args = parser.parse_args()
+
+    payloads = asyncio.run(getPayloads(args.transceivers))
+
+    codecs: List[Any] = [SortedJsonCodec(), JsonCodec()]
+    if orjson is not None:
+        codecs.append(OrjsonCodec())
+
+    print(
+        f"{'codec':<15} {'stats bytes':>11} {'enc':>6} {'dec':>6} |"
+        f" {'sdp bytes':>9} {'enc':>6} {'dec':>6}"
+    )
+
+    for codec in codecs:
+        columns = []
+        for payload in payloads:
+            data = codec.dumps(payload)
+            columns.append((
+                len(data),
+                measure(lambda: codec.dumps(payload), args.number),
+                measure(lambda: codec.loads(data), args.number)
+            ))
+
+        (statsSize, statsEnc, statsDec), (sdpSize, sdpEnc, sdpDec) = columns
+        print(
+            f"{codec.name:<15} {statsSize:>11} {statsEnc:>6.1f} {statsDec:>6.1f} |"
+            f" {sdpSize:>9} {sdpEnc:>6.1f} {sdpDec:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+import asyncio
+import fractions
+from collections import deque
+from typing import (
+    TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+)
+import av
+from aiortc import MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
+
+from encoder import (
+    DEFAULT_AUDIO_BITRATE,
+    DEFAULT_VIDEO_BITRATE,
+    EncodedLoop,
+    EncodedLoopReader,
+    EncodedLoopTrack,
+    PacketEncoder,
+    encodedLoopCache
+)
+from logger import Logger
+
+if TYPE_CHECKING:
+    from aiortc.contrib.media import MediaPlayer
+
+# duration (seconds) of a video frame if it cannot be told from timestamps
+DEFAULT_VIDEO_FRAME_DURATION = 1 / 30
+
+
+async def drainTrack(track: MediaStreamTrack) -> None:
+    """
+    Read and discard the frames of the track until it ends, so they are not
+    queued for nobody.
+    """
+    try:
+        while True:
+            await track.recv()
+    except MediaStreamError:
+        pass
+
+
+"""
+CachedLoopTrack class
+
+Track of a CachedLoopPlayer. The first time the file is played it encodes
+its frames with the sending codec, returning the packets so the sender just
+packetizes them, and records them. From then on (and for any other player of
+the same file, settings and codec while cached) it replays the recorded
+packets with their timestamps rewritten, so the file is neither decoded nor
+encoded anymore. If the sending codec cannot be encoded it returns the
+frames, playing the file again (decoding it) each time it ends.
+"""
+
+
+class CachedLoopTrack(EncodedLoopTrack):
+    def __init__(
+        self,
+        player: "CachedLoopPlayer",
+        kind: str,
+        track: MediaStreamTrack,
+        key: Tuple,
+        bitrate: int
+    ) -> None:
+        super().__init__(kind)
+        self._player = player
+        # track of the MediaPlayer being read
+        self._track = track
+        # key of the encoded loops of the file (but the codec)
+        self._key = key
+        self._bitrate = bitrate
+        # "replay", "record" or "raw", set by the first recv()
+        self.mode = None  # type: Optional[str]
+        # recording
+        self._encoder = None  # type: Optional[PacketEncoder]
+        self._recorded = []  # type: List[Tuple[bytes, int, bool]]
+        self._pending: Deque[av.Packet] = deque()
+        self._firstPts = None  # type: Optional[int]
+        self._keyframeRequested = False
+        # raw frames
+        self._passIndex = 0
+        self._timeOffset = 0.0
+        self._endTime = 0.0
+        self._prevTime = None  # type: Optional[float]
+
+    def requestKeyframe(self) -> None:
+        if self.mode == "record":
+            self._keyframeRequested = True
+        else:
+            super().requestKeyframe()
+
+    async def recv(self) -> Any:
+        if self.readyState != "live":
+            raise MediaStreamError
+
+        if self.mode is None:
+            self._prepare()
+
+        if self.mode == "replay":
+            return await self._readPacket()
+        elif self.mode == "record":
+            return await self._recordPacket()
+        else:
+            return await self._relayFrame()
+
+    def stop(self) -> None:
+        super().stop()
+        self._track.stop()
+
+    def _prepare(self) -> None:
+        codec = self._getSendCodec()
+
+        if codec is None:
+            self._setMode("raw")
+            return
+
+        encodedLoop = encodedLoopCache.lookup(
+            self._key + (codec.mimeType.lower(),)
+        )
+
+        if encodedLoop is not None:
+            self._reader = EncodedLoopReader(encodedLoop)
+            self._setMode("replay")
+        else:
+            self._setMode("record")
+
+    def _setMode(self, mode: str) -> None:
+        Logger.debug(
+            "cachedloop: %s mode [kind:%s, key:%s]", mode, self.kind, self._key
+        )
+
+        self.mode = mode
+        self._player._onModeSet(self)
+
+    async def _recordPacket(self) -> Union[av.Packet, av.frame.Frame]:
+        while not self._pending:
+            try:
+                frame = await self._track.recv()
+            except MediaStreamError:
+                if self.readyState != "live":
+                    raise
+
+                await self._finishRecording()
+                return await self._readPacket()
+
+            # MediaPlayer tracks return decoded frames
+            assert isinstance(frame, av.frame.Frame)
+
+            if self._encoder is None and not self._createEncoder(frame):
+                # send the frames as they are from now on
+                self.mode = "raw"
+                return self._rawFrame(frame)
+
+            self._addPackets(await self._encode(frame))
+
+        packet = self._pending.popleft()
+        await self._pace(float(packet.pts * packet.time_base))
+
+        return packet
+
+    def _createEncoder(self, frame: av.frame.Frame) -> bool:
+        codec = self._getSendCodec()
+        assert codec is not None
+
+        try:
+            if isinstance(frame, av.VideoFrame):
+                self._encoder = PacketEncoder(
+                    codec, self._bitrate, width=frame.width, height=frame.height
+                )
+            else:
+                self._encoder = PacketEncoder(codec, self._bitrate)
+        except Exception as error:
+            Logger.warning(
+                "cachedloop: cannot encode %s, sending raw frames: %s: %s",
+                codec.mimeType, error.__class__.__name__, error
+            )
+            return False
+
+        return True
+
+    async def _encode(
+        self, frame: Optional[av.frame.Frame]
+    ) -> List[Tuple[bytes, int, bool]]:
+        """
+        Encode the frame in the default executor so the event loop is not
+        blocked. recv() is not called again until it is done, so packets
+        keep their order.
+        """
+        encoder = self._encoder
+        assert encoder is not None
+
+        keyframe = False
+        if isinstance(frame, av.VideoFrame):
+            keyframe = self._keyframeRequested
+            self._keyframeRequested = False
+
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._encodeFrame, encoder, frame, keyframe
+        )
+
+    @staticmethod
+    def _encodeFrame(
+        encoder: PacketEncoder, frame: Optional[av.frame.Frame], keyframe: bool
+    ) -> List[Tuple[bytes, int, bool]]:
+        if isinstance(frame, av.VideoFrame):
+            # the encoder takes a single resolution
+            if frame.width != encoder.width or frame.height != encoder.height:
+                pts, timeBase = frame.pts, frame.time_base
+                frame = frame.reformat(width=encoder.width, height=encoder.height)
+                frame.pts, frame.time_base = pts, timeBase
+
+            if keyframe:
+                frame.pict_type = av.video.frame.PictureType.I
+
+        return encoder.encode(frame)
+
+    def _addPackets(self, packets: List[Tuple[bytes, int, bool]]) -> None:
+        assert self._encoder is not None
+        timeBase = fractions.Fraction(1, self._encoder.clockRate)
+
+        for data, pts, keyframe in packets:
+            if self._firstPts is None:
+                self._firstPts = pts
+
+            pts -= self._firstPts
+            self._recorded.append((data, pts, keyframe))
+
+            packet = av.Packet(data)
+            packet.pts = pts
+            packet.time_base = timeBase
+            self._pending.append(packet)
+
+    async def _finishRecording(self) -> None:
+        if self._encoder is not None:
+            self._addPackets(await self._encode(None))
+
+        if not self._recorded:
+            self.stop()
+            raise MediaStreamError
+
+        codec = self._getSendCodec()
+        assert self._encoder is not None and codec is not None
+
+        encodedLoop = EncodedLoop(self._recorded, self._encoder.clockRate)
+        encodedLoopCache.put(self._key + (codec.mimeType.lower(),), encodedLoop)
+
+        Logger.debug(
+            "cachedloop: recorded [kind:%s, packets:%s, size:%s]",
+            self.kind, len(encodedLoop.packets), encodedLoop.size
+        )
+
+        # go on with the packets not returned yet (the flushed ones), the
+        # track keeping the loop even if it does not fit in the cache
+        self._reader = EncodedLoopReader(
+            encodedLoop, position=len(self._recorded) - len(self._pending)
+        )
+        self._pending.clear()
+        self._recorded = []
+        self._encoder = None
+        self.mode = "replay"
+
+    async def _relayFrame(self) -> av.frame.Frame:
+        numPasses = 0
+
+        while True:
+            try:
+                frame = await self._track.recv()
+                break
+            except MediaStreamError:
+                if self.readyState != "live":
+                    raise
+
+                # a file without frames would be played forever
+                numPasses += 1
+                if numPasses > 1:
+                    self.stop()
+                    raise
+
+                self._passIndex += 1
+                self._timeOffset = self._endTime
+                self._prevTime = None
+                self._track = self._player._getPassTrack(
+                    self.kind, self._passIndex
+                )
+
+        assert isinstance(frame, av.frame.Frame)
+        return self._rawFrame(frame)
+
+    def _rawFrame(self, frame: av.frame.Frame) -> av.frame.Frame:
+        time = float(frame.time)
+
+        if isinstance(frame, av.AudioFrame):
+            duration = frame.samples / frame.sample_rate
+        elif self._prevTime is not None and time > self._prevTime:
+            duration = time - self._prevTime
+        else:
+            duration = DEFAULT_VIDEO_FRAME_DURATION
+
+        self._prevTime = time
+        self._endTime = self._timeOffset + time + duration
+
+        # timestamps go on from the previous pass
+        frame.pts += round(self._timeOffset / frame.time_base)
+
+        return frame
+
+
+"""
+CachedLoopPlayer class
+
+Exposes the same audio and video attributes as MediaPlayer, being them
+CachedLoopTracks. The file is played (by a new MediaPlayer each time) just
+while some track records it or sends raw frames, the other tracks of each
+MediaPlayer being drained.
+"""
+
+
+class CachedLoopPlayer:
+    def __init__(
+        self,
+        createPlayer: Callable[[], "MediaPlayer"],
+        key: Tuple,
+        bitrate: Optional[int] = None
+    ) -> None:
+        self._createPlayer = createPlayer
+        # MediaPlayer of the current pass
+        self._passIndex = 0
+        self._passPlayer = createPlayer()
+        # whether some track reads the first MediaPlayer
+        self._reading = False
+        # tracks being drained indexed by their task
+        self._drainTasks: Dict[asyncio.Task, MediaStreamTrack] = dict()
+        self._audio = None  # type: Optional[CachedLoopTrack]
+        self._video = None  # type: Optional[CachedLoopTrack]
+
+        if self._passPlayer.audio:
+            self._audio = CachedLoopTrack(
+                self,
+                "audio",
+                self._passPlayer.audio,
+                key + ("audio", bitrate or DEFAULT_AUDIO_BITRATE),
+                bitrate or DEFAULT_AUDIO_BITRATE
+            )
+        if self._passPlayer.video:
+            self._video = CachedLoopTrack(
+                self,
+                "video",
+                self._passPlayer.video,
+                key + ("video", bitrate or DEFAULT_VIDEO_BITRATE),
+                bitrate or DEFAULT_VIDEO_BITRATE
+            )
+
+    @property
+    def audio(self) -> Optional[MediaStreamTrack]:
+        return self._audio
+
+    @property
+    def video(self) -> Optional[MediaStreamTrack]:
+        return self._video
+
+    def close(self) -> None:
+        for task, track in self._drainTasks.items():
+            task.cancel()
+            track.stop()
+
+        self._drainTasks.clear()
+
+    def _tracks(self) -> List[CachedLoopTrack]:
+        return [track for track in (self._audio, self._video) if track]
+
+    def _onModeSet(self, track: CachedLoopTrack) -> None:
+        # the first MediaPlayer is not started if every track replays
+        if track.mode == "replay":
+            if self._reading:
+                self._drain(track._track)
+            return
+
+        if self._reading:
+            return
+
+        self._reading = True
+        for other in self._tracks():
+            if other.mode == "replay":
+                self._drain(other._track)
+
+    def _getPassTrack(self, kind: str, passIndex: int) -> MediaStreamTrack:
+        """
+        Track of the given kind of the MediaPlayer playing the file for the
+        given pass (the first being 0), created by the first track asking.
+        """
+        if passIndex > self._passIndex:
+            self._passIndex = passIndex
+            self._passPlayer = self._createPlayer()
+
+            for track in self._tracks():
+                if track.kind != kind and track.mode != "raw":
+                    self._drain(getattr(self._passPlayer, track.kind))
+
+        return getattr(self._passPlayer, kind)
+
+    def _drain(self, track: Optional[MediaStreamTrack]) -> None:
+        if track is None:
+            return
+
+        task = asyncio.ensure_future(drainTrack(track))
+        task.add_done_callback(lambda task: self._drainTasks.pop(task, None))
+        self._drainTasks[task] = track
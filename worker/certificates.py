@@ -0,0 +1,163 @@
+import asyncio
+import datetime
+from collections import deque
+from typing import Any, Deque, Optional
+from aiortc import RTCCertificate, RTCConfiguration, RTCPeerConnection
+
+from logger import Logger
+
+# the one called by RTCPeerConnection, also while it is being replaced (so
+# executor threads always generate real certificates)
+generateCertificate = RTCCertificate.generateCertificate
+
+# renew the shared certificate if it expires within this time (aiortc ones
+# are valid for 30 days)
+SHARED_CERTIFICATE_MIN_VALIDITY = datetime.timedelta(days=1)
+
+
+def createPeerConnection(
+    configuration: Optional[RTCConfiguration] = None,
+    certificate: Optional[RTCCertificate] = None
+) -> RTCPeerConnection:
+    """
+    Create a RTCPeerConnection using the given certificate instead of
+    generating one, since RTCConfiguration does not allow giving it.
+
+    RTCCertificate.generateCertificate is replaced process wide while the
+    RTCPeerConnection is created. This function must stay synchronous so no
+    other coroutine (i.e. another handler or the RTP capabilities one) can
+    create a RTCPeerConnection in the meanwhile, and nothing else calls it
+    from another thread (the pool uses the module generateCertificate).
+    """
+    if certificate is None:
+        return RTCPeerConnection(configuration)
+
+    descriptor = RTCCertificate.__dict__["generateCertificate"]
+
+    def useCertificate() -> RTCCertificate:
+        return certificate
+
+    RTCCertificate.generateCertificate = useCertificate  # type: ignore
+    try:
+        return RTCPeerConnection(configuration)
+    finally:
+        replaced = RTCCertificate.__dict__["generateCertificate"]
+        setattr(RTCCertificate, "generateCertificate", descriptor)
+
+        assert replaced is useCertificate, \
+            "RTCCertificate.generateCertificate replaced concurrently"
+
+
+"""
+CertificatePool class
+
+DTLS certificates generated ahead of time in the default executor, so
+creating a handler does not generate one in the event loop. A handler can
+either take its own certificate from the pool or reuse a single shared one.
+"""
+
+
+class CertificatePool:
+    def __init__(self, loop: asyncio.AbstractEventLoop, size: int = 4) -> None:
+        self._loop = loop
+        # number of certificates to keep generated
+        self._size = size
+        self._certificates: Deque[RTCCertificate] = deque()
+        # generation of the certificate reused by handlers asking for it
+        self._sharedCertificateTask: Optional[asyncio.Task] = None
+        # task refilling the pool, only running while not full
+        self._refillTask: Optional[asyncio.Task] = None
+        # counters
+        self._numTaken = 0
+        self._numMissed = 0
+        self._numReused = 0
+        self._closed = False
+
+    def start(self) -> None:
+        self._refill()
+
+    async def get(self, reuse: bool = False) -> RTCCertificate:
+        if reuse:
+            self._numReused += 1
+            return await self._getSharedCertificate()
+
+        self._numTaken += 1
+
+        if self._certificates:
+            certificate = self._certificates.popleft()
+        else:
+            # burst larger than the pool
+            self._numMissed += 1
+            certificate = await self._generate()
+
+        self._refill()
+
+        return certificate
+
+    def dump(self) -> Any:
+        return {
+            "size": self._size,
+            "available": len(self._certificates),
+            "taken": self._numTaken,
+            "missed": self._numMissed,
+            "reused": self._numReused
+        }
+
+    def close(self) -> None:
+        self._closed = True
+
+        if self._refillTask is not None:
+            self._refillTask.cancel()
+            self._refillTask = None
+
+        self._certificates.clear()
+
+        if self._sharedCertificateTask is not None:
+            self._sharedCertificateTask.cancel()
+            self._sharedCertificateTask = None
+
+    async def _getSharedCertificate(self) -> RTCCertificate:
+        task = self._sharedCertificateTask
+
+        # renew it if failed or about to expire
+        if task is not None and task.done():
+            if task.cancelled() or task.exception() is not None:
+                task = None
+            else:
+                now = datetime.datetime.now(datetime.timezone.utc)
+                if task.result().expires - now < SHARED_CERTIFICATE_MIN_VALIDITY:
+                    task = None
+
+        # concurrent callers wait for the same generation
+        if task is None:
+            task = self._loop.create_task(self._generate())
+            self._sharedCertificateTask = task
+
+        return await asyncio.shield(task)
+
+    def _refill(self) -> None:
+        if self._closed or self._refillTask is not None:
+            return
+
+        if len(self._certificates) < self._size:
+            self._refillTask = self._loop.create_task(self._runRefill())
+
+    async def _runRefill(self) -> None:
+        try:
+            while len(self._certificates) < self._size:
+                self._certificates.append(await self._generate())
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as error:
+            Logger.warning(
+                "certificates: generation failed: %s: %s",
+                error.__class__.__name__, error
+            )
+
+        finally:
+            self._refillTask = None
+
+    async def _generate(self) -> RTCCertificate:
+        return await self._loop.run_in_executor(None, generateCertificate)
@@ -1,16 +1,40 @@
 import asyncio
-import json
 import socket
 import pynetstring
 from asyncio import StreamReader, StreamWriter
-from typing import Any, Dict, Optional
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
 
+from codec import JsonCodec
 from logger import Logger
 
-
-def object_from_string(message_str) -> Optional[Dict[str, Any]]:
-    message = json.loads(message_str)
-
+# Maximum number of bytes read from the socket at once. A single read may
+# contain many netstring framed messages.
+READ_BUFFER_SIZE = 262144
+
+# Outgoing bytes above which the socket transport stops being written and
+# senders wait, and below which writing is resumed.
+WRITE_HIGH_WATERMARK = 1048576
+WRITE_LOW_WATERMARK = 262144
+
+# Notification events whose not yet written instance is replaced by a newer
+# one for the same target, since just the latest value matters.
+COALESCABLE_EVENTS = {"bufferedamount"}
+
+# First byte of a binary frame carrying a DataChannel message. JSON messages
+# always start with "{" instead.
+BINARY_FRAME_KIND = 0x00
+# Binary frame flag meaning that the payload is a UTF-8 string.
+BINARY_FRAME_FLAG_STRING = 0x01
+# Binary frame flag meaning that the payload is a sequence of messages, each
+# one prefixed by its flags (1 byte) and its length (4 bytes).
+BINARY_FRAME_FLAG_MANY = 0x02
+# Maximum payload of a binary frame with many messages (so the Node side
+# never buffers too much), more messages go in further frames.
+BINARY_FRAME_MANY_MAX_SIZE = 1048576
+
+
+def object_from_message(message: Any) -> Optional[Dict[str, Any]]:
     if "method" in message:
         if "id" in message:
             return message
@@ -28,19 +52,213 @@ def object_from_string(message_str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def object_from_binary_frame(frame: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Binary frame layout:
+    - kind (1 byte, BINARY_FRAME_KIND)
+    - flags (1 byte)
+    - handlerId length (1 byte) + handlerId
+    - dataChannelId length (1 byte) + dataChannelId
+    - payload (raw bytes, or many messages if BINARY_FRAME_FLAG_MANY)
+    """
+    try:
+        flags = frame[1]
+        offset = 2
+        handlerIdLen = frame[offset]
+        handlerId = frame[offset + 1:offset + 1 + handlerIdLen].decode("utf8")
+        offset += 1 + handlerIdLen
+        dataChannelIdLen = frame[offset]
+        dataChannelId = frame[offset + 1:offset + 1 + dataChannelIdLen].decode("utf8")
+        offset += 1 + dataChannelIdLen
+    except IndexError:
+        Logger.error("channel: invalid binary frame, header too short")
+        return None
+    except UnicodeDecodeError:
+        Logger.error("channel: invalid binary frame, header ids not UTF-8")
+        return None
+
+    payload = frame[offset:]
+
+    if flags & BINARY_FRAME_FLAG_MANY:
+        messages = unpack_messages(payload)
+        if messages is None:
+            Logger.error("channel: invalid binary frame, wrong messages")
+            return None
+
+        return {
+            "event": "datachannel.sendMany",
+            "internal": {"handlerId": handlerId, "dataChannelId": dataChannelId},
+            "data": messages
+        }
+
+    elif flags & BINARY_FRAME_FLAG_STRING:
+        try:
+            data = payload.decode("utf8")
+        except UnicodeDecodeError:
+            Logger.error("channel: invalid binary frame, string not UTF-8")
+            return None
+
+        return {
+            "event": "datachannel.send",
+            "internal": {"handlerId": handlerId, "dataChannelId": dataChannelId},
+            "data": data
+        }
+    else:
+        return {
+            "event": "datachannel.sendBinary",
+            "internal": {"handlerId": handlerId, "dataChannelId": dataChannelId},
+            "data": payload
+        }
+
+
+def unpack_messages(payload: bytes) -> Optional[List[Union[str, bytes]]]:
+    """
+    Messages of a payload with many of them, or None if truncated or some
+    string is not UTF-8.
+    """
+    messages: List[Union[str, bytes]] = []
+    offset = 0
+
+    while offset < len(payload):
+        if offset + 5 > len(payload):
+            return None
+
+        flags = payload[offset]
+        length = int.from_bytes(payload[offset + 1:offset + 5], "big")
+        offset += 5
+        if offset + length > len(payload):
+            return None
+
+        message = payload[offset:offset + length]
+        offset += length
+
+        if flags & BINARY_FRAME_FLAG_STRING:
+            try:
+                messages.append(message.decode("utf8"))
+            except UnicodeDecodeError:
+                return None
+        else:
+            messages.append(message)
+
+    return messages
+
+
+def pack_message(message: Union[str, bytes]) -> bytes:
+    if isinstance(message, str):
+        flags = BINARY_FRAME_FLAG_STRING
+        payload = message.encode("utf8")
+    else:
+        flags = 0
+        payload = message
+
+    return b"".join([
+        bytes([flags]), len(payload).to_bytes(4, "big"), payload
+    ])
+
+
+def binary_frame(
+    handlerId: str, dataChannelId: str, message: Union[str, bytes]
+) -> bytes:
+    if isinstance(message, str):
+        return binary_frame_of(
+            handlerId, dataChannelId, BINARY_FRAME_FLAG_STRING, message.encode("utf8")
+        )
+    else:
+        return binary_frame_of(handlerId, dataChannelId, 0, message)
+
+
+def binary_frame_of(
+    handlerId: str, dataChannelId: str, flags: int, payload: bytes
+) -> bytes:
+    handlerIdBytes = handlerId.encode("utf8")
+    dataChannelIdBytes = dataChannelId.encode("utf8")
+
+    return b"".join([
+        bytes([BINARY_FRAME_KIND, flags, len(handlerIdBytes)]),
+        handlerIdBytes,
+        bytes([len(dataChannelIdBytes)]),
+        dataChannelIdBytes,
+        payload
+    ])
+
+
+def binary_frames_many(
+    handlerId: str, dataChannelId: str, messages: List[Union[str, bytes]]
+) -> List[bytes]:
+    """
+    Binary frames carrying the given messages, as few as possible.
+    """
+    frames: List[bytes] = []
+    packed: List[bytes] = []
+    size = 0
+
+    for message in messages:
+        entry = pack_message(message)
+        if packed and size + len(entry) > BINARY_FRAME_MANY_MAX_SIZE:
+            frames.append(binary_frame_of(
+                handlerId, dataChannelId, BINARY_FRAME_FLAG_MANY, b"".join(packed)
+            ))
+            packed = []
+            size = 0
+
+        packed.append(entry)
+        size += len(entry)
+
+    if packed:
+        frames.append(binary_frame_of(
+            handlerId, dataChannelId, BINARY_FRAME_FLAG_MANY, b"".join(packed)
+        ))
+
+    return frames
+
+
 """
 Channel class
 """
 
 
 class Channel:
-    def __init__(self, fd) -> None:
+    def __init__(
+        self,
+        fd=None,
+        codec=None,
+        reader: Optional[StreamReader] = None,
+        writer: Optional[StreamWriter] = None
+    ) -> None:
         self._fd = fd
-        self._reader = Optional[StreamReader]
-        self._writer = Optional[StreamWriter]
+        self._codec = codec or JsonCodec()
+        # given if the connection already exists (listen mode), otherwise
+        # created from fd
+        self._reader = reader
+        self._writer = writer
         self._nsDecoder = pynetstring.Decoder()
+        # decoded messages not yet consumed (the socket is not read again until
+        # they are, so they are those of a single read at most)
+        self._recvQueue: Deque[Dict[str, Any]] = deque()
+        # netstring encoded messages not yet written
+        self._sendQueue: List[bytes] = []
+        self._sendQueueBytes = 0
+        # position in the send queue of coalescable notifications (superseded
+        # ones are left empty)
+        self._sendQueueIndexes: Dict[Tuple[str, str], int] = {}
+        # task writing the send queue into the socket
+        self._flushTask: Optional[asyncio.Task] = None
+        # set while senders do not need to wait
+        self._writable = asyncio.Event()
+        self._writable.set()
+        # counters
+        self._numWrites = 0
+        self._numCoalesced = 0
+        self._numMessagesIn = 0
+        self._numBytesIn = 0
+        self._numMessagesOut = 0
+        self._numBytesOut = 0
         self._connected = False
 
+        if self._reader is not None and self._writer is not None:
+            self._setWriteBufferLimits()
+            self._connected = True
+
     async def _connect(self) -> None:
         if (self._connected):
             return
@@ -50,59 +268,234 @@ class Channel:
         """
         sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM, 0, self._fd)
 
-        self._reader, self._writer = await asyncio.open_connection(sock=sock)
+        self._reader, self._writer = await asyncio.open_connection(
+            sock=sock, limit=READ_BUFFER_SIZE
+        )
+        self._setWriteBufferLimits()
         self._connected = True
 
+    def _setWriteBufferLimits(self) -> None:
+        self._writer.transport.set_write_buffer_limits(
+            high=WRITE_HIGH_WATERMARK, low=WRITE_LOW_WATERMARK
+        )
+
     async def close(self) -> None:
+        if self._flushTask is not None:
+            self._flushTask.cancel()
+            self._flushTask = None
+
         if self._writer is not None:
+            # write whatever is still queued
+            if self._sendQueue and not self._writer.is_closing():
+                self._writer.write(b"".join(self._sendQueue))
+            self._clearSendQueue()
+
             self._writer.close()
 
         # NOTE: For whatever reason I don't remember, we must not close self._reader.
 
-    async def receive(self) -> Optional[Dict[str, Any]]:
+    def __aiter__(self) -> "Channel":
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
         await self._connect()
 
-        try:
-            # retrieve chunks of 50 bytes
-            data = await self._reader.read(50)
+        while not self._recvQueue:
+            data = await self._reader.read(READ_BUFFER_SIZE)
             if len(data) == 0:
                 Logger.debug("channel: socket closed, exiting")
-                raise Exception("socket closed")
+                raise StopAsyncIteration
+
+            self._numBytesIn += len(data)
+
+            # a single read may contain many messages, keep all of them
+            for item in self._nsDecoder.feed(data):
+                self._numMessagesIn += 1
+
+                if item[:1] == b"{":
+                    try:
+                        obj = object_from_message(self._codec.loads(item))
+                    except Exception as error:
+                        Logger.error(
+                            "channel: invalid message, cannot decode it: %s: %s",
+                            error.__class__.__name__, error
+                        )
+                        obj = None
+                elif item and item[0] == BINARY_FRAME_KIND:
+                    obj = object_from_binary_frame(item)
+                else:
+                    Logger.error("channel: invalid message, unknown kind")
+                    obj = None
+
+                if obj is not None:
+                    self._recvQueue.append(obj)
+
+        return self._recvQueue.popleft()
+
+    async def receive(self) -> Dict[str, Any]:
+        try:
+            return await self.__anext__()
+        except StopAsyncIteration:
+            raise Exception("socket closed")
 
-            decoded_list = self._nsDecoder.feed(data)
-            for item in decoded_list:
-                return object_from_string(item.decode("utf8"))
+    async def send(self, message: Dict[str, Any]) -> None:
+        await self._sendBytes(self._codec.dumps(message))
 
-        except asyncio.IncompleteReadError:
-            pass
+    async def _sendBytes(
+        self, data: bytes, coalesceKey: Optional[Tuple[str, str]] = None
+    ) -> None:
+        await self._connect()
 
-        return None
+        # backpressure (coalescable notifications never accumulate so they
+        # do not need to wait)
+        if self._enqueue(data, coalesceKey) and coalesceKey is None:
+            await self.waitWritable()
 
-    async def send(self, descr) -> None:
-        await self._connect()
+    async def waitWritable(self) -> None:
+        """
+        Wait until the send queue is written (if above the high watermark).
+        """
+        if self._sendQueueBytes > WRITE_HIGH_WATERMARK:
+            self._writable.clear()
+            await self._writable.wait()
+
+    def _enqueue(
+        self, data: bytes, coalesceKey: Optional[Tuple[str, str]] = None
+    ) -> bool:
+        """
+        Queue the given message (the channel must be connected). Returns
+        whether the send queue is above the high watermark.
+        """
+        message = pynetstring.encode(data)
+
+        # drop the queued notification superseded by this one, which goes
+        # last so it is not written before messages queued in between
+        if coalesceKey is not None:
+            index = self._sendQueueIndexes.get(coalesceKey)
+            if index is not None:
+                self._sendQueueBytes -= len(self._sendQueue[index])
+                self._sendQueue[index] = b""
+                self._numCoalesced += 1
+            else:
+                self._numMessagesOut += 1
+
+            self._sendQueueIndexes[coalesceKey] = len(self._sendQueue)
+        else:
+            self._numMessagesOut += 1
 
-        data = descr.encode("utf8")
-        data = pynetstring.encode(data)
+        self._sendQueue.append(message)
+        self._sendQueueBytes += len(message)
 
-        self._writer.write(data)
+        # messages queued within the same loop iteration are written at once
+        if self._flushTask is None:
+            self._flushTask = asyncio.get_event_loop().create_task(self._flush())
+
+        return self._sendQueueBytes > WRITE_HIGH_WATERMARK
+
+    async def _flush(self) -> None:
+        try:
+            while self._sendQueue:
+                # if the socket transport is above the high watermark wait for
+                # it to go below the low one (queued notifications may be
+                # coalesced meanwhile)
+                await self._writer.drain()
+
+                data = b"".join(self._sendQueue)
+                self._clearSendQueue()
+                self._writer.write(data)
+                self._numWrites += 1
+                self._numBytesOut += len(data)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as error:
+            Logger.warning(
+                "channel: write failed: %s: %s", error.__class__.__name__, error
+            )
+            self._clearSendQueue()
+
+        finally:
+            self._flushTask = None
+
+    def _clearSendQueue(self) -> None:
+        self._sendQueue.clear()
+        self._sendQueueBytes = 0
+        self._sendQueueIndexes.clear()
+        self._writable.set()
+
+    def dump(self) -> Dict[str, Any]:
+        bufferedBytes = 0
+        if self._connected:
+            bufferedBytes = self._writer.transport.get_write_buffer_size()
+
+        return {
+            "sendQueueMessages": sum(1 for message in self._sendQueue if message),
+            "sendQueueBytes": self._sendQueueBytes,
+            "bufferedBytes": bufferedBytes,
+            "writes": self._numWrites,
+            "coalesced": self._numCoalesced
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "messagesIn": self._numMessagesIn,
+            "bytesIn": self._numBytesIn,
+            "messagesOut": self._numMessagesOut,
+            "bytesOut": self._numBytesOut,
+            "writes": self._numWrites,
+            "coalesced": self._numCoalesced,
+            "sendQueueBytes": self._sendQueueBytes
+        }
 
     async def notify(self, targetId: str, event: str, data=None) -> None:
+        coalesceKey = (targetId, event) if event in COALESCABLE_EVENTS else None
+
         try:
             if data is not None:
-                await self.send(
-                    json.dumps({"targetId": targetId, "event": event, "data": data})
+                await self._sendBytes(
+                    self._codec.dumps(
+                        {"targetId": targetId, "event": event, "data": data}
+                    ),
+                    coalesceKey
                 )
             else:
-                await self.send(
-                    json.dumps({"targetId": targetId, "event": event})
+                await self._sendBytes(
+                    self._codec.dumps({"targetId": targetId, "event": event}),
+                    coalesceKey
                 )
 
         except Exception as error:
-            errorStr = f"{error.__class__.__name__}: {error}"
             Logger.warning(
-                f"channel: notify() failed [targetId:{targetId}, event:{event}]]: {errorStr}"
+                "channel: notify() failed [targetId:%s, event:%s]: %s: %s",
+                targetId, event, error.__class__.__name__, error
             )
 
+    def queueDataChannelMessages(
+        self,
+        handlerId: str,
+        dataChannelId: str,
+        messages: List[Union[str, bytes]]
+    ) -> bool:
+        """
+        Send DataChannel messages to Node as binary frames (no JSON, no
+        base64). They are queued right now (so they keep their order with
+        regard to further notifications). Returns whether the send queue is
+        above the high watermark, in which case the caller should not queue
+        more messages until waitWritable() returns.
+        """
+        if not self._connected or self._writer.is_closing():
+            return False
+
+        if len(messages) == 1:
+            return self._enqueue(binary_frame(handlerId, dataChannelId, messages[0]))
+
+        aboveHighWatermark = False
+        for frame in binary_frames_many(handlerId, dataChannelId, messages):
+            aboveHighWatermark = self._enqueue(frame)
+
+        return aboveHighWatermark
+
 
 """
 Request class
@@ -121,27 +514,27 @@ class Request:
 
     async def succeed(self, data=None) -> None:
         if data is not None:
-            await self._channel.send(json.dumps({
+            await self._channel.send({
                 "id": self._id,
                 "accepted": True,
                 "data": data
-            }, sort_keys=True))
+            })
         else:
-            await self._channel.send(json.dumps({
+            await self._channel.send({
                 "id": self._id,
                 "accepted": True
-            }, sort_keys=True))
+            })
 
     async def failed(self, error) -> None:
         errorType = "Error"
         if isinstance(error, TypeError):
             errorType = "TypeError"
 
-        await self._channel.send(json.dumps({
+        await self._channel.send({
             "id": self._id,
             "error": errorType,
             "reason": f"{error.__class__.__name__}: {error}"
-        }, sort_keys=True))
+        })
 
 
 """
@@ -0,0 +1,50 @@
+import json
+from typing import Any
+
+from logger import Logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+"""
+Codec classes
+
+A codec serializes the Channel messages exchanged with the Node process.
+Both produce JSON, which is what the Node side expects.
+"""
+
+
+class JsonCodec:
+    name = "json"
+
+    def dumps(self, message: Any) -> bytes:
+        return json.dumps(message, separators=(",", ":")).encode("utf8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def dumps(self, message: Any) -> bytes:
+        return orjson.dumps(message)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+def createCodec(name: str = "json") -> Any:
+    if name == "orjson":
+        if orjson is not None:
+            return OrjsonCodec()
+
+        Logger.warning("codec: orjson not installed, falling back to json")
+
+    elif name != "json":
+        Logger.warning("codec: unknown codec '%s', falling back to json", name)
+
+    return JsonCodec()
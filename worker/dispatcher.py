@@ -0,0 +1,128 @@
+import asyncio
+from collections import deque
+from typing import Any, Coroutine, Deque, Dict, Optional, Set
+
+from logger import Logger
+
+# Queued jobs above which the caller should stop reading messages (see
+# waitReady()), and below which it may go on.
+QUEUED_HIGH_WATERMARK = 4096
+QUEUED_LOW_WATERMARK = 1024
+
+
+def dispatchKey(obj: Dict[str, Any]) -> str:
+    """
+    Messages targeting the same handler (or the same player) share a key so
+    they are processed in order. Others (such as "dump") share the empty key.
+    """
+    internal = obj.get("internal") or {}
+
+    return internal.get("handlerId") or internal.get("playerId") or ""
+
+
+"""
+Dispatcher class
+"""
+
+
+class Dispatcher:
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxInFlight: int = 0) -> None:
+        self._loop = loop
+        # maximum number of jobs running at the same time (0 means no limit)
+        self._maxInFlight = maxInFlight
+        self._semaphore: Optional[asyncio.Semaphore] = (
+            asyncio.Semaphore(maxInFlight) if maxInFlight > 0 else None
+        )
+        # pending jobs indexed by key
+        self._queues: Dict[str, Deque[Coroutine[Any, Any, None]]] = {}
+        # tasks draining the queues
+        self._tasks: Set[asyncio.Task] = set()
+        # number of jobs currently running
+        self._inFlight = 0
+        # number of jobs not started yet
+        self._numQueued = 0
+        # set while the number of queued jobs is not above the high watermark
+        self._ready = asyncio.Event()
+        self._ready.set()
+
+    def dispatch(self, key: str, job: Coroutine[Any, Any, None]) -> None:
+        self._numQueued += 1
+        if self._numQueued > QUEUED_HIGH_WATERMARK:
+            self._ready.clear()
+
+        queue = self._queues.get(key)
+        if queue is not None:
+            queue.append(job)
+            return
+
+        self._queues[key] = deque([job])
+        task = self._loop.create_task(self._runQueue(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def waitReady(self) -> None:
+        """
+        Wait until the queued jobs go below the low watermark (if above the
+        high one), so messages are not read faster than they are processed.
+        """
+        await self._ready.wait()
+
+    def dump(self) -> Dict[str, Any]:
+        return {
+            "maxInFlight": self._maxInFlight,
+            "inFlight": self._inFlight,
+            "queued": self._numQueued,
+            "keys": len(self._queues)
+        }
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+        for queue in self._queues.values():
+            for job in queue:
+                job.close()
+
+        self._queues.clear()
+        self._numQueued = 0
+        self._ready.set()
+
+    async def _runQueue(self, key: str) -> None:
+        queue = self._queues[key]
+
+        try:
+            while queue:
+                job = queue.popleft()
+
+                self._numQueued -= 1
+                if self._numQueued <= QUEUED_LOW_WATERMARK:
+                    self._ready.set()
+
+                try:
+                    if self._semaphore is not None:
+                        async with self._semaphore:
+                            await self._runJob(job)
+                    else:
+                        await self._runJob(job)
+                except asyncio.CancelledError:
+                    # no-op if the job already started
+                    job.close()
+                    raise
+
+        finally:
+            if self._queues.get(key) is queue:
+                del self._queues[key]
+
+    async def _runJob(self, job: Coroutine[Any, Any, None]) -> None:
+        self._inFlight += 1
+
+        try:
+            await job
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            Logger.error(
+                "dispatcher: job failed: %s: %s", error.__class__.__name__, error
+            )
+        finally:
+            self._inFlight -= 1
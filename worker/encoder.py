@@ -0,0 +1,428 @@
+import asyncio
+import bisect
+import fractions
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+import av
+from aiortc import MediaStreamTrack, RTCRtpCodecParameters, RTCRtpTransceiver
+
+from logger import Logger
+from passthrough import hookKeyframeRequests
+
+# clock rate of every video codec
+VIDEO_CLOCK_RATE = 90000
+
+# default bitrates (bps) of the encoded media (not used by PCMU/PCMA)
+DEFAULT_VIDEO_BITRATE = 500000
+DEFAULT_AUDIO_BITRATE = 32000
+
+# keyframes per second of the encoded video (so keyframe requests are served
+# without going back to the beginning of the loop)
+DEFAULT_KEYFRAMES_PER_SECOND = 1
+
+# default maximum size (bytes) of the encoded loops kept in memory
+DEFAULT_ENCODED_CACHE_SIZE = 256 * 1024 * 1024
+
+
+"""
+PacketEncoder class
+
+Encodes frames into packets (av.Packet data) of the given RTP codec, which
+aiortc senders just packetize when a track returns them instead of frames.
+Used to encode media once and send it many times.
+"""
+
+
+class PacketEncoder:
+    def __init__(
+        self,
+        codec: RTCRtpCodecParameters,
+        bitrate: int,
+        width: int = 0,
+        height: int = 0,
+        framerate: int = 30,
+        gopSize: int = 0
+    ) -> None:
+        mimeType = codec.mimeType.lower()
+
+        self.kind = mimeType.split("/")[0]
+        self._codec: Any = None
+        self._resampler: Any = None
+
+        if mimeType == "video/vp8":
+            self._codec = av.CodecContext.create("libvpx", "w")
+            self._codec.options = {
+                "deadline": "realtime",
+                "cpu-used": "8",
+                "lag-in-frames": "0",
+                "auto-alt-ref": "0"
+            }
+
+        elif mimeType == "video/h264":
+            self._codec = av.CodecContext.create("libx264", "w")
+            # what every browser decodes (as aiortc does)
+            self._codec.profile = "Baseline"
+            self._codec.options = {
+                "level": "31",
+                "tune": "zerolatency",
+                "preset": "ultrafast"
+            }
+
+        elif mimeType == "audio/opus":
+            self._codec = av.CodecContext.create("libopus", "w")
+            self._codec.sample_rate = 48000
+            self._codec.layout = "stereo"
+            self.samplesPerFrame = 960
+
+        elif mimeType in ("audio/pcmu", "audio/pcma"):
+            name = "pcm_mulaw" if mimeType == "audio/pcmu" else "pcm_alaw"
+            self._codec = av.CodecContext.create(name, "w")
+            self._codec.sample_rate = 8000
+            self._codec.layout = "mono"
+            self.samplesPerFrame = 160
+
+        else:
+            raise TypeError(f"cannot encode {codec.mimeType}")
+
+        if self.kind == "video":
+            self.width = width
+            self.height = height
+            self._codec.width = width
+            self._codec.height = height
+            self._codec.pix_fmt = "yuv420p"
+            self._codec.framerate = fractions.Fraction(framerate, 1)
+            self._codec.time_base = fractions.Fraction(1, VIDEO_CLOCK_RATE)
+            self._codec.gop_size = gopSize or max(
+                1, round(framerate / DEFAULT_KEYFRAMES_PER_SECOND)
+            )
+            self.clockRate = VIDEO_CLOCK_RATE
+        else:
+            self._codec.format = "s16"
+            self._codec.time_base = fractions.Fraction(
+                1, self._codec.sample_rate
+            )
+            self.sampleRate = self._codec.sample_rate
+            self.layout = self._codec.layout.name
+            self.clockRate = self._codec.sample_rate
+            # so any audio frame can be given
+            self._resampler = av.AudioResampler(
+                format="s16",
+                layout=self.layout,
+                rate=self.sampleRate,
+                frame_size=self.samplesPerFrame
+            )
+
+        self._codec.bit_rate = bitrate
+
+    @staticmethod
+    def supports(codec: RTCRtpCodecParameters) -> bool:
+        return codec.mimeType.lower() in (
+            "video/vp8", "video/h264", "audio/opus", "audio/pcmu", "audio/pcma"
+        )
+
+    def encode(
+        self, frame: Optional[av.frame.Frame]
+    ) -> List[Tuple[bytes, int, bool]]:
+        """
+        Data, timestamp (in clock rate units) and whether it is a keyframe of
+        the packets the given frame results in (None flushes the encoder).
+        Video frames get their timestamp rewritten.
+        """
+        if self._resampler is not None:
+            frames = self._resampler.resample(frame)
+            if frame is None:
+                frames.append(None)
+        else:
+            if frame is not None:
+                frame.pts = round(frame.time * VIDEO_CLOCK_RATE)
+                frame.time_base = self._codec.time_base
+            frames = [frame]
+
+        return [
+            (
+                bytes(packet),
+                round(packet.pts * packet.time_base * self.clockRate),
+                packet.is_keyframe
+            )
+            for frame in frames
+            for packet in self._codec.encode(frame)
+        ]
+
+
+"""
+EncodedLoop class
+
+Packets of some media encoded with a codec, along with their timestamps (in
+clock rate units, the first one being 0), the indexes of the keyframes and
+the duration of the whole loop.
+"""
+
+
+class EncodedLoop:
+    def __init__(
+        self,
+        packets: List[Tuple[bytes, int, bool]],
+        clockRate: int,
+        duration: Optional[int] = None
+    ) -> None:
+        if not packets:
+            raise TypeError("no packets to loop")
+
+        firstPts = packets[0][1]
+
+        self.packets = [data for data, _, _ in packets]
+        self.pts = [pts - firstPts for _, pts, _ in packets]
+        # the loop is started from the first packet anyway
+        self.keyframes = [
+            index for index, (_, _, keyframe) in enumerate(packets)
+            if keyframe or index == 0
+        ]
+        self.clockRate = clockRate
+        self.size = sum(len(data) for data in self.packets)
+
+        if duration is not None:
+            self.duration = duration
+        elif len(self.pts) > 1:
+            # the last packet lasts as the previous one
+            self.duration = 2 * self.pts[-1] - self.pts[-2]
+        else:
+            self.duration = clockRate
+
+
+"""
+EncodedLoopReader class
+
+Reads the packets of an EncodedLoop over and over, their timestamps going on
+from one loop to the next one.
+"""
+
+
+class EncodedLoopReader:
+    def __init__(
+        self, encodedLoop: EncodedLoop, startPts: int = 0, position: int = 0
+    ) -> None:
+        self._encodedLoop = encodedLoop
+        self._timeBase = fractions.Fraction(1, encodedLoop.clockRate)
+        numPackets = len(encodedLoop.packets)
+        # timestamp of the beginning of the current loop
+        self._basePts = startPts + position // numPackets * encodedLoop.duration
+        # index of the next packet
+        self._position = position % numPackets
+
+    def read(self) -> av.Packet:
+        encodedLoop = self._encodedLoop
+        packet = av.Packet(encodedLoop.packets[self._position])
+        packet.pts = self._basePts + encodedLoop.pts[self._position]
+        packet.time_base = self._timeBase
+
+        self._position += 1
+        if self._position == len(encodedLoop.packets):
+            self._position = 0
+            self._basePts += encodedLoop.duration
+
+        return packet
+
+    def seekKeyframe(self) -> None:
+        """
+        Go on from the next keyframe (the one at the beginning of the next
+        loop if none is left in this one), timestamps going on as if the
+        skipped packets were never there.
+        """
+        encodedLoop = self._encodedLoop
+        keyframes = encodedLoop.keyframes
+        pts = self._basePts + encodedLoop.pts[self._position]
+        index = bisect.bisect_left(keyframes, self._position)
+
+        if index < len(keyframes):
+            self._position = keyframes[index]
+        else:
+            self._position = keyframes[0]
+
+        self._basePts = pts - encodedLoop.pts[self._position]
+
+
+"""
+EncodedLoopCache class
+
+Encoded loops shared by every track of the process, indexed by what they
+were encoded from and the codec. Each one is encoded once. The least recently
+used ones are evicted when their total size exceeds the given one (tracks
+sending them keep them until closed).
+"""
+
+
+class EncodedLoopCache:
+    def __init__(self, maxSize: int = DEFAULT_ENCODED_CACHE_SIZE) -> None:
+        self.maxSize = maxSize
+        # futures of the loops, least recently used first
+        self._loops: "OrderedDict[Tuple, asyncio.Future]" = OrderedDict()
+        # total size of the encoded loops
+        self._size = 0
+        # counters
+        self._numHits = 0
+        self._numMisses = 0
+        self._numEvictions = 0
+
+    async def get(
+        self, key: Tuple, encode: Callable[[], EncodedLoop]
+    ) -> EncodedLoop:
+        """
+        Get the loop, encoding it in the default executor if not cached.
+        """
+        future = self._loops.get(key)
+
+        if future is None:
+            Logger.debug("encoder: encoding loop [key:%s]", key)
+
+            self._numMisses += 1
+            future = asyncio.get_running_loop().run_in_executor(None, encode)
+            future.add_done_callback(lambda future: self._onEncoded(key, future))
+            self._loops[key] = future
+        else:
+            self._numHits += 1
+            self._loops.move_to_end(key)
+
+        return await asyncio.shield(future)
+
+    def lookup(self, key: Tuple) -> Optional[EncodedLoop]:
+        """
+        Get the loop if already cached.
+        """
+        future = self._loops.get(key)
+
+        if future is None or not future.done() or future.cancelled() \
+                or future.exception() is not None:
+            self._numMisses += 1
+            return None
+
+        self._numHits += 1
+        self._loops.move_to_end(key)
+        return future.result()
+
+    def put(self, key: Tuple, encodedLoop: EncodedLoop) -> None:
+        if key in self._loops:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(encodedLoop)
+        self._loops[key] = future
+        self._onEncoded(key, future)
+
+    def dump(self) -> Any:
+        return {
+            "maxSize": self.maxSize,
+            "size": self._size,
+            "hits": self._numHits,
+            "misses": self._numMisses,
+            "evictions": self._numEvictions,
+            "loops": [
+                {
+                    "key": list(key),
+                    "packets": len(future.result().packets),
+                    "size": future.result().size
+                }
+                for key, future in self._loops.items()
+                if self._isEncoded(future)
+            ]
+        }
+
+    def _onEncoded(self, key: Tuple, future: asyncio.Future) -> None:
+        # evicted meanwhile
+        if self._loops.get(key) is not future:
+            return
+
+        # do not cache failures
+        if not self._isEncoded(future):
+            del self._loops[key]
+            return
+
+        size = future.result().size
+
+        # it would evict everything else for nothing
+        if size > self.maxSize:
+            Logger.debug("encoder: loop too big to cache [key:%s, size:%s]", key, size)
+
+            del self._loops[key]
+            return
+
+        self._size += size
+
+        # least recently used first
+        for evictedKey, evictedFuture in list(self._loops.items()):
+            if self._size <= self.maxSize:
+                break
+            if not self._isEncoded(evictedFuture):
+                continue
+
+            Logger.debug("encoder: evicting loop [key:%s]", evictedKey)
+
+            del self._loops[evictedKey]
+            self._size -= evictedFuture.result().size
+            self._numEvictions += 1
+
+    @staticmethod
+    def _isEncoded(future: asyncio.Future) -> bool:
+        return future.done() and not future.cancelled() \
+            and future.exception() is None
+
+
+encodedLoopCache = EncodedLoopCache()
+
+
+"""
+EncodedLoopTrack class
+
+Base class of the tracks returning packets of an EncodedLoop (or frames when
+the sending codec cannot be encoded) in real time. bind() must be called with
+the transceiver of the track so its sending codec is known.
+"""
+
+
+class EncodedLoopTrack(MediaStreamTrack):
+    def __init__(self, kind: str) -> None:
+        super().__init__()
+        self.kind = kind
+        self._transceiver = None  # type: Optional[RTCRtpTransceiver]
+        # reader of the EncodedLoop being sent
+        self._reader = None  # type: Optional[EncodedLoopReader]
+        # time.monotonic() at which media time 0 was (or would have been) sent
+        self._startedAt = None  # type: Optional[float]
+
+    def bind(self, transceiver: RTCRtpTransceiver) -> None:
+        self._transceiver = transceiver
+        hookKeyframeRequests(transceiver.sender)
+
+    def requestKeyframe(self) -> None:
+        if self._reader is not None:
+            self._reader.seekKeyframe()
+
+    def _getSendCodec(self) -> Optional[RTCRtpCodecParameters]:
+        if self._transceiver is None or not self._transceiver._codecs:
+            return None
+
+        codec = self._transceiver._codecs[0]
+        if not PacketEncoder.supports(codec):
+            return None
+
+        return codec
+
+    async def _readPacket(self) -> av.Packet:
+        assert self._reader is not None
+        packet = self._reader.read()
+        await self._pace(float(packet.pts * packet.time_base))
+        return packet
+
+    async def _pace(self, mediaTime: float) -> None:
+        """
+        Wait until the given media time (seconds) is due.
+        """
+        now = time.monotonic()
+
+        if self._startedAt is None:
+            self._startedAt = now - mediaTime
+            return
+
+        wait = self._startedAt + mediaTime - now
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -1,17 +1,22 @@
 from typing import Any, Dict, Optional
-import base64
 import asyncio
+import time
 from aiortc import (
+    RTCCertificate,
     RTCConfiguration,
-    RTCPeerConnection,
     RTCRtpTransceiver,
     RTCSessionDescription,
     RTCStatsReport
 )
-from aiortc import RTCDataChannel  # noqa: F401
+from aiortc import MediaStreamTrack, RTCDataChannel  # noqa: F401
 
+from certificates import createPeerConnection
 from channel import Request, Notification, Channel
+from encoder import EncodedLoopTrack
 from logger import Logger
+from passthrough import EncodedStreamTrack
+from reporter import BufferedAmountReporter, MessageAggregator
+from sendencoding import getSendEncoding, hookSendEncoding
 
 
 class Handler:
@@ -23,33 +28,69 @@ class Handler:
         getTrack,
         addRemoteTrack,
         getRemoteTrack,
-        configuration: Optional[RTCConfiguration] = None
+        bufferedAmountReporter: BufferedAmountReporter,
+        messageAggregator: MessageAggregator,
+        configuration: Optional[RTCConfiguration] = None,
+        certificate: Optional[RTCCertificate] = None
     ) -> None:
         self._handlerId = handlerId
         self._channel = channel
-        self._pc = RTCPeerConnection(configuration or None)
+        self._loop = loop
+        self._pc = createPeerConnection(configuration or None, certificate)
+        # milliseconds it took to create us (set by the creator)
+        self.createLatency = 0.0
+        # requests and notifications processed (counted by the creator)
+        self.numRequests = 0
+        self.numNotifications = 0
+        # DataChannel messages sent and received
+        self._numMessagesSent = 0
+        self._numMessagesReceived = 0
         # dictionary of sending transceivers indexed by localId
         self._sendTransceivers = dict()  # type: Dict[str, RTCRtpTransceiver]
+        # dictionary of non stopped transceivers indexed by MID
+        self._transceiversByMid = dict()  # type: Dict[str, RTCRtpTransceiver]
         # dictionary of dataChannelds mapped by internal id
         self._dataChannels = dict()  # type: Dict[str, RTCDataChannel]
         # function returning a sending track given a player id and a kind
         self._getTrack = getTrack
-        # function to store a receiving track
+        # function to store a receiving track given our handler id
         self._addRemoteTrack = addRemoteTrack
-        # function returning a receiving track
+        # function returning a proxy of a receiving track
         self._getRemoteTrack = getRemoteTrack
+        # dictionary of proxies of receiving tracks being sent indexed by localId
+        self._forwardedTracks = dict()  # type: Dict[str, MediaStreamTrack]
+        # worker wide DataChannel bufferedAmount notifier
+        self._bufferedAmountReporter = bufferedAmountReporter
+        # worker wide aggregator of received DataChannel messages
+        self._messageAggregator = messageAggregator
+        # periodic stats task, only running while subscribed
+        self._statsTask = None  # type: Optional[asyncio.Task]
+        # last serialized stats notified indexed by report id
+        self._lastStats = dict()  # type: Dict[str, Dict[str, Any]]
 
         @self._pc.on("track")  # type: ignore
         def on_track(track) -> None:
-            Logger.debug(f"handler: ontrack [kind:{track.kind}, id:{track.id}]")
+            Logger.debug(
+                "handler: ontrack [kind:%s, id:%s]", track.kind, track.id
+            )
+
+            receiver = next(
+                (
+                    transceiver.receiver
+                    for transceiver in self._pc.getTransceivers()
+                    if transceiver.receiver.track is track
+                ),
+                None
+            )
 
             # store it
-            self._addRemoteTrack(track)
+            self._addRemoteTrack(self._handlerId, track, receiver)
 
         @self._pc.on("signalingstatechange")  # type: ignore
         async def on_signalingstatechange() -> None:
             Logger.debug(
-                f"handler: signalingstatechange [state:{self._pc.signalingState}]"
+                "handler: signalingstatechange [state:%s]",
+                self._pc.signalingState
             )
             await self._channel.notify(
                 self._handlerId,
@@ -60,7 +101,8 @@ class Handler:
         @self._pc.on("icegatheringstatechange")  # type: ignore
         async def on_icegatheringstatechange() -> None:
             Logger.debug(
-                f"handler: icegatheringstatechange [state:{self._pc.iceGatheringState}]"
+                "handler: icegatheringstatechange [state:%s]",
+                self._pc.iceGatheringState
             )
             await self._channel.notify(
                 self._handlerId,
@@ -71,7 +113,8 @@ class Handler:
         @self._pc.on("iceconnectionstatechange")  # type: ignore
         async def on_iceconnectionstatechange() -> None:
             Logger.debug(
-                f"handler: iceconnectionstatechange [state:{self._pc.iceConnectionState}]"
+                "handler: iceconnectionstatechange [state:%s]",
+                self._pc.iceConnectionState
             )
             await self._channel.notify(
                 self._handlerId,
@@ -79,29 +122,32 @@ class Handler:
                 self._pc.iceConnectionState
             )
 
-        async def checkDataChannelsBufferedAmount() -> None:
-            while True:
-                await asyncio.sleep(1)
-                for dataChannelId, dataChannel in self._dataChannels.items():
-                    await self._channel.notify(dataChannelId, "bufferedamount", dataChannel.bufferedAmount)
-
-        self._dataChannelsBufferedAmountTask = loop.create_task(
-            checkDataChannelsBufferedAmount()
-        )
-
     async def close(self) -> None:
-        # stop the periodic task
-        self._dataChannelsBufferedAmountTask.cancel()
+        # stop notifying stats
+        self._unsubscribeStats()
+
+        # stop reporting bufferedAmount and messages of our DataChannels
+        for dataChannelId in self._dataChannels:
+            self._bufferedAmountReporter.remove(dataChannelId)
+            self._messageAggregator.remove(dataChannelId)
 
         # close peerconnection
         await self._pc.close()
 
+        # release proxies of receiving tracks of other handlers
+        for track in self._forwardedTracks.values():
+            track.stop()
+        self._forwardedTracks.clear()
+
+        self._transceiversByMid.clear()
+
     def dump(self) -> Any:
-        result = {
+        result: Dict[str, Any] = {
             "id": self._handlerId,
             "signalingState": self._pc.signalingState,
             "iceConnectionState": self._pc.iceConnectionState,
             "iceGatheringState": self._pc.iceGatheringState,
+            "createLatency": self.createLatency,
             "transceivers": [],
             "sendTransceivers": []
         }
@@ -127,12 +173,34 @@ class Handler:
                 "localId": localId,
                 "mid": transceiver.mid
             }
+            encoding = getSendEncoding(transceiver.sender)
+            if encoding is not None:
+                sendTransceiverInfo["encoding"] = encoding.dump()
             result["sendTransceivers"].append(sendTransceiverInfo)
 
         return result
 
+    def metrics(self) -> Any:
+        return {
+            "requests": self.numRequests,
+            "notifications": self.numNotifications,
+            "transceivers": len(self._pc.getTransceivers()),
+            "dataChannels": len(self._dataChannels),
+            "dataChannelMessagesSent": self._numMessagesSent,
+            "dataChannelMessagesReceived": self._numMessagesReceived,
+            "createLatency": self.createLatency
+        }
+
     async def processRequest(self, request: Request) -> Any:
-        if request.method == "handler.getLocalDescription":
+        if request.method == "handler.batch":
+            data = request.data
+            requests = data.get("requests")
+            if not isinstance(requests, list):
+                raise TypeError("missing data.requests")
+
+            return await self._processBatch(request, requests)
+
+        elif request.method == "handler.getLocalDescription":
             localDescription = self._pc.localDescription
             if (localDescription is not None):
                 return {
@@ -164,6 +232,9 @@ class Handler:
             description = RTCSessionDescription(**data)
             await self._pc.setLocalDescription(description)
 
+            # MIDs may have been assigned
+            self._updateTransceiversByMid()
+
         elif request.method == "handler.setRemoteDescription":
             data = request.data
             if isinstance(data, RTCSessionDescription):
@@ -172,6 +243,9 @@ class Handler:
             description = RTCSessionDescription(**data)
             await self._pc.setRemoteDescription(description)
 
+            # MIDs may have been assigned or transceivers stopped
+            self._updateTransceiversByMid()
+
         elif request.method == "handler.getSendMid":
             data = request.data
             localId = data.get("localId")
@@ -191,16 +265,22 @@ class Handler:
             kind = data["kind"]
             playerId = data.get("playerId")
             recvTrackId = data.get("recvTrackId")
+            passthrough = data.get("passthrough", False)
 
             # sending a track got from a MediaPlayer
             if playerId:
                 track = self._getTrack(playerId, kind)
                 transceiver = self._pc.addTransceiver(track)
+                if isinstance(track, EncodedLoopTrack):
+                    track.bind(transceiver)
 
             # sending a track which is a remote/receiving track
             elif recvTrackId:
-                track = self._getRemoteTrack(recvTrackId, kind)
+                track = self._getRemoteTrack(recvTrackId, kind, passthrough)
                 transceiver = self._pc.addTransceiver(track)
+                if isinstance(track, EncodedStreamTrack):
+                    track.bind(transceiver)
+                self._forwardedTracks[localId] = track
 
             else:
                 raise TypeError("missing data.playerId or data.recvTrackId")
@@ -217,6 +297,7 @@ class Handler:
             transceiver = self._sendTransceivers[localId]
             transceiver.direction = "inactive"
             transceiver.sender.replaceTrack(None)
+            self._stopForwardedTrack(localId)
 
             # NOTE: do not remove transceiver from the self._sendTransceivers
             # dictionary on purpose.
@@ -230,20 +311,28 @@ class Handler:
             kind = data["kind"]
             playerId = data.get("playerId")
             recvTrackId = data.get("recvTrackId")
+            passthrough = data.get("passthrough", False)
             transceiver = self._sendTransceivers[localId]
 
             # sending a track got from a MediaPlayer
             if playerId:
                 track = self._getTrack(playerId, kind)
+                if isinstance(track, EncodedLoopTrack):
+                    track.bind(transceiver)
 
             # sending a track which is a remote/receiving track
             elif recvTrackId:
-                track = self._getRemoteTrack(recvTrackId, kind)
+                track = self._getRemoteTrack(recvTrackId, kind, passthrough)
+                if isinstance(track, EncodedStreamTrack):
+                    track.bind(transceiver)
 
             else:
                 raise TypeError("missing data.playerId or data.recvTrackId")
 
             transceiver.sender.replaceTrack(track)
+            self._stopForwardedTrack(localId)
+            if recvTrackId:
+                self._forwardedTracks[localId] = track
 
         elif request.method == "handler.setTrackDirection":
             data = request.data
@@ -264,25 +353,28 @@ class Handler:
                 transceiver.direction = direction
             else:
                 transceiver = self._getTransceiverByMid(localId)
+                if transceiver is None:
+                    raise TypeError(f"no transceiver for mid {localId}")
+
                 transceiver.direction = direction
 
+        elif request.method == "handler.setEncodingParameters":
+            data = request.data
+            localId = data.get("localId")
+            if localId is None:
+                raise TypeError("missing data.localId")
+
+            transceiver = self._sendTransceivers[localId]
+            # unset ones are no longer constrained
+            hookSendEncoding(transceiver.sender).update(
+                maxBitrate=data.get("maxBitrate"),
+                maxFramerate=data.get("maxFramerate"),
+                scaleResolutionDownBy=data.get("scaleResolutionDownBy")
+            )
+
         elif request.method == "handler.getTransportStats":
-            result = {}
             stats = await self._pc.getStats()
-            for key in stats:
-                type = stats[key].type
-                if type == "inbound-rtp":
-                    result[key] = self._serializeInboundStats(stats[key])
-                elif type == "outbound-rtp":
-                    result[key] = self._serializeOutboundStats(stats[key])
-                elif type == "remote-inbound-rtp":
-                    result[key] = self._serializeRemoteInboundStats(stats[key])
-                elif type == "remote-outbound-rtp":
-                    result[key] = self._serializeRemoteOutboundStats(stats[key])
-                elif type == "transport":
-                    result[key] = self._serializeTransportStats(stats[key])
-
-            return result
+            return self._serializeStats(stats)
 
         elif request.method == "handler.getSenderStats":
             data = request.data
@@ -291,19 +383,11 @@ class Handler:
                 raise TypeError("missing data.mid")
 
             transceiver = self._getTransceiverByMid(mid)
-            sender = transceiver.sender
-            result = {}
-            stats = await sender.getStats()
-            for key in stats:
-                type = stats[key].type
-                if type == "outbound-rtp":
-                    result[key] = self._serializeOutboundStats(stats[key])
-                elif type == "remote-inbound-rtp":
-                    result[key] = self._serializeRemoteInboundStats(stats[key])
-                elif type == "transport":
-                    result[key] = self._serializeTransportStats(stats[key])
-
-            return result
+            if transceiver is None:
+                raise TypeError(f"no transceiver for mid {mid}")
+
+            stats = await transceiver.sender.getStats()
+            return self._serializeSenderStats(stats)
 
         elif request.method == "handler.getReceiverStats":
             data = request.data
@@ -312,19 +396,60 @@ class Handler:
                 raise TypeError("missing data.mid")
 
             transceiver = self._getTransceiverByMid(mid)
-            receiver = transceiver.receiver
-            result = {}
-            stats = await receiver.getStats()
-            for key in stats:
-                type = stats[key].type
-                if type == "inbound-rtp":
-                    result[key] = self._serializeInboundStats(stats[key])
-                elif type == "remote-outbound-rtp":
-                    result[key] = self._serializeRemoteOutboundStats(stats[key])
-                elif type == "transport":
-                    result[key] = self._serializeTransportStats(stats[key])
-
-            return result
+            if transceiver is None:
+                raise TypeError(f"no transceiver for mid {mid}")
+
+            stats = await transceiver.receiver.getStats()
+            return self._serializeReceiverStats(stats)
+
+        elif request.method == "handler.getStatsBatch":
+            data = request.data
+            mids = data.get("mids")
+            if mids is None:
+                raise TypeError("missing data.mids")
+
+            if mids == "all":
+                transceivers = list(self._transceiversByMid.values())
+            else:
+                # ignore MIDs no longer present (i.e. closed in the meanwhile)
+                transceivers = [
+                    transceiver
+                    for transceiver in map(self._getTransceiverByMid, mids)
+                    if transceiver is not None
+                ]
+
+            # tell sending transceivers once instead of per transceiver
+            sendTransceivers = set(self._sendTransceivers.values())
+
+            # gather all stats concurrently, as RTCPeerConnection.getStats() does
+            results = await asyncio.gather(*[
+                self._getTransceiverStats(
+                    transceiver, transceiver in sendTransceivers
+                )
+                for transceiver in transceivers
+            ])
+
+            return {
+                transceiver.mid: result
+                for transceiver, result in zip(transceivers, results)
+            }
+
+        elif request.method == "handler.subscribeStats":
+            data = request.data
+            interval = data.get("interval")
+            if interval is None:
+                raise TypeError("missing data.interval")
+            if interval <= 0:
+                raise TypeError("data.interval must be greater than 0")
+
+            # a new subscription starts again with full reports
+            self._unsubscribeStats()
+            self._statsTask = self._loop.create_task(
+                self._runStats(interval / 1000)
+            )
+
+        elif request.method == "handler.unsubscribeStats":
+            self._unsubscribeStats()
 
         elif request.method == "handler.createDataChannel":
             internal = request.internal
@@ -348,6 +473,7 @@ class Handler:
 
             # store datachannel in the dictionary
             self._dataChannels[dataChannelId] = dataChannel
+            self._bufferedAmountReporter.add(dataChannelId, dataChannel)
 
             @dataChannel.on("open")  # type: ignore
             async def on_open() -> None:
@@ -355,6 +481,8 @@ class Handler:
 
             @dataChannel.on("closing")  # type: ignore
             async def on_closing() -> None:
+                # received messages go first
+                self._messageAggregator.flush(dataChannelId)
                 await self._channel.notify(dataChannelId, "closing")
 
             @dataChannel.on("close")  # type: ignore
@@ -363,18 +491,16 @@ class Handler:
                 # on the dataChannel. Probably it shouldn't do it. So caution.
                 try:
                     del self._dataChannels[dataChannelId]
+                    self._bufferedAmountReporter.remove(dataChannelId)
+                    self._messageAggregator.flush(dataChannelId)
                     await self._channel.notify(dataChannelId, "close")
                 except KeyError:
                     pass
 
             @dataChannel.on("message")  # type: ignore
-            async def on_message(message) -> None:
-                if isinstance(message, str):
-                    await self._channel.notify(dataChannelId, "message", message)
-                if isinstance(message, bytes):
-                    message_bytes = base64.b64encode(message)
-                    await self._channel.notify(
-                        dataChannelId, "binary", str(message_bytes))
+            def on_message(message) -> None:
+                self._numMessagesReceived += 1
+                self._messageAggregator.add(self._handlerId, dataChannelId, message)
 
             @dataChannel.on("bufferedamountlow")  # type: ignore
             async def on_bufferedamountlow() -> None:
@@ -396,6 +522,41 @@ class Handler:
         else:
             raise TypeError("unknown request method")
 
+    async def _processBatch(self, request: Request, requests: list) -> list:
+        """
+        Run the given sub-requests in order, stopping at the first failing one.
+        A sub-request with "dataFrom" gets the result of that earlier one as
+        data (i.e. the offer just created).
+        """
+        results = []  # type: list
+
+        for idx, entry in enumerate(requests):
+            method = entry.get("method")
+            if method == "handler.batch":
+                raise TypeError(f"batch request {idx} cannot be a batch")
+
+            dataFrom = entry.get("dataFrom")
+            if dataFrom is not None:
+                if not 0 <= dataFrom < idx:
+                    raise TypeError(f"batch request {idx} has wrong dataFrom")
+                data = results[dataFrom]
+            else:
+                data = entry.get("data")
+
+            subRequest = Request(
+                request._id, method, internal=request.internal, data=data
+            )
+
+            try:
+                results.append(await self.processRequest(subRequest))
+            except Exception as error:
+                message = f"batch request {idx} ({method}) failed: {error}"
+                if isinstance(error, TypeError):
+                    raise TypeError(message) from error
+                raise Exception(message) from error
+
+        return results
+
     async def processNotification(self, notification: Notification) -> None:
         if notification.event == "enableTrack":
             Logger.warning("handler: enabling track not implemented")
@@ -412,11 +573,10 @@ class Handler:
             data = notification.data
             dataChannel = self._dataChannels[dataChannelId]
             dataChannel.send(data)
+            self._numMessagesSent += 1
 
             # Good moment to update bufferedAmount in Node.js side
-            await self._channel.notify(
-                dataChannelId, "bufferedamount", dataChannel.bufferedAmount
-            )
+            await self._bufferedAmountReporter.report(dataChannelId)
 
         elif notification.event == "datachannel.sendBinary":
             internal = notification.internal
@@ -424,14 +584,30 @@ class Handler:
             if dataChannelId is None:
                 raise TypeError("missing internal.dataChannelId")
 
+            # raw bytes got from a binary frame
             data = notification.data
             dataChannel = self._dataChannels[dataChannelId]
-            dataChannel.send(base64.b64decode(data))
+            dataChannel.send(data)
+            self._numMessagesSent += 1
 
             # Good moment to update bufferedAmount in Node.js side
-            await self._channel.notify(
-                dataChannelId, "bufferedamount", dataChannel.bufferedAmount
-            )
+            await self._bufferedAmountReporter.report(dataChannelId)
+
+        elif notification.event == "datachannel.sendMany":
+            internal = notification.internal
+            dataChannelId = internal.get("dataChannelId")
+            if dataChannelId is None:
+                raise TypeError("missing internal.dataChannelId")
+
+            # strings and raw bytes got from a binary frame
+            messages = notification.data
+            dataChannel = self._dataChannels[dataChannelId]
+            for message in messages:
+                dataChannel.send(message)
+            self._numMessagesSent += len(messages)
+
+            # just once for all of them
+            await self._bufferedAmountReporter.report(dataChannelId)
 
         elif notification.event == "datachannel.close":
             internal = notification.internal
@@ -450,6 +626,8 @@ class Handler:
             except KeyError:
                 pass
 
+            self._bufferedAmountReporter.remove(dataChannelId)
+            self._messageAggregator.remove(dataChannelId)
             dataChannel.close()
 
         elif notification.event == "datachannel.setBufferedAmountLowThreshold":
@@ -470,9 +648,124 @@ class Handler:
     """
 
     def _getTransceiverByMid(self, mid: str) -> Optional[RTCRtpTransceiver]:
-        return next(
-            filter(lambda x: x.mid == mid, self._pc.getTransceivers()), None
-        )
+        transceiver = self._transceiversByMid.get(mid)
+        if transceiver is not None and transceiver.stopped:
+            del self._transceiversByMid[mid]
+            return None
+
+        return transceiver
+
+    def _updateTransceiversByMid(self) -> None:
+        self._transceiversByMid = {
+            transceiver.mid: transceiver
+            for transceiver in self._pc.getTransceivers()
+            if transceiver.mid is not None and not transceiver.stopped
+        }
+
+    def _stopForwardedTrack(self, localId: str) -> None:
+        track = self._forwardedTracks.pop(localId, None)
+        if track is not None:
+            track.stop()
+
+    def _unsubscribeStats(self) -> None:
+        if self._statsTask is not None:
+            self._statsTask.cancel()
+            self._statsTask = None
+
+        self._lastStats.clear()
+
+    async def _runStats(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+
+            try:
+                stats = self._serializeStats(await self._pc.getStats())
+            except Exception as error:
+                Logger.warning("handler: failed to get stats: %s", error)
+                continue
+
+            # just the fields that changed since the previous sample (the
+            # timestamp is not a reason to notify a report)
+            reports = {}
+            for key, report in stats.items():
+                lastReport = self._lastStats.get(key, {})
+                delta = {
+                    field: value
+                    for field, value in report.items()
+                    if field != "timestamp" and lastReport.get(field) != value
+                }
+                if delta or key not in self._lastStats:
+                    reports[key] = delta
+
+            removed = [key for key in self._lastStats if key not in stats]
+            self._lastStats = stats
+
+            if not reports and not removed:
+                continue
+
+            await self._channel.notify(
+                self._handlerId,
+                "stats",
+                {
+                    "timestamp": time.time(),
+                    "reports": reports,
+                    "removed": removed
+                }
+            )
+
+    async def _getTransceiverStats(
+        self, transceiver: RTCRtpTransceiver, sending: bool
+    ) -> Dict[str, Any]:
+        # same as handler.getSenderStats or handler.getReceiverStats
+        if sending:
+            stats = await transceiver.sender.getStats()
+            return self._serializeSenderStats(stats)
+        else:
+            stats = await transceiver.receiver.getStats()
+            return self._serializeReceiverStats(stats)
+
+    def _serializeStats(self, stats: RTCStatsReport) -> Dict[str, Any]:
+        result = {}
+        for key in stats:
+            type = stats[key].type
+            if type == "inbound-rtp":
+                result[key] = self._serializeInboundStats(stats[key])
+            elif type == "outbound-rtp":
+                result[key] = self._serializeOutboundStats(stats[key])
+            elif type == "remote-inbound-rtp":
+                result[key] = self._serializeRemoteInboundStats(stats[key])
+            elif type == "remote-outbound-rtp":
+                result[key] = self._serializeRemoteOutboundStats(stats[key])
+            elif type == "transport":
+                result[key] = self._serializeTransportStats(stats[key])
+
+        return result
+
+    def _serializeSenderStats(self, stats: RTCStatsReport) -> Dict[str, Any]:
+        result = {}
+        for key in stats:
+            type = stats[key].type
+            if type == "outbound-rtp":
+                result[key] = self._serializeOutboundStats(stats[key])
+            elif type == "remote-inbound-rtp":
+                result[key] = self._serializeRemoteInboundStats(stats[key])
+            elif type == "transport":
+                result[key] = self._serializeTransportStats(stats[key])
+
+        return result
+
+    def _serializeReceiverStats(self, stats: RTCStatsReport) -> Dict[str, Any]:
+        result = {}
+        for key in stats:
+            type = stats[key].type
+            if type == "inbound-rtp":
+                result[key] = self._serializeInboundStats(stats[key])
+            elif type == "remote-outbound-rtp":
+                result[key] = self._serializeRemoteOutboundStats(stats[key])
+            elif type == "transport":
+                result[key] = self._serializeTransportStats(stats[key])
+
+        return result
 
     def _serializeInboundStats(self, stats: RTCStatsReport) -> Dict[str, Any]:
         return {
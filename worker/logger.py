@@ -1,29 +1,191 @@
+import atexit
 import logging
+import os
+import queue
 import sys
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Deque, Dict, List, Optional
+
+# default number of recent log records kept in memory
+DEFAULT_LOG_RING_SIZE = 1000
+
+# level of the 'none' log level (above any record)
+LOG_LEVEL_NONE = logging.CRITICAL + 1
+
+
+"""
+RingHandler class
+
+Keeps the most recent log records (formatted) so they can be retrieved with
+a request even if they are not written anywhere.
+"""
+
+
+class RingHandler(logging.Handler):
+    def __init__(self, size: int) -> None:
+        super().__init__()
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=size)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._entries.append({
+                "time": round(record.created * 1000),
+                "level": record.levelname.lower(),
+                "message": self.format(record)
+            })
+        except Exception:
+            self.handleError(record)
+
+    def dump(self) -> List[Dict[str, Any]]:
+        # emit() runs in the listener thread while holding the lock
+        with self.lock:
+            return list(self._entries)
+
+
+# types of the record arguments that cannot change once logged
+IMMUTABLE_ARG_TYPES = (str, bytes, int, float, complex, bool, type(None))
+
+
+def _isImmutable(arg: Any) -> bool:
+    if isinstance(arg, tuple):
+        return all(_isImmutable(item) for item in arg)
+
+    return isinstance(arg, IMMUTABLE_ARG_TYPES)
+
+
+"""
+LazyQueueHandler class
+
+QueueHandler that does not format the record in the calling thread (the
+listener ones do it) when its arguments are immutable. Otherwise they could
+be changed before being formatted (or while, by the event loop thread), so
+the record is formatted right away.
+"""
+
+
+class LazyQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and _isImmutable(args)):
+            record.msg = record.getMessage()
+            record.args = None
+
+        return record
+
+
+def _isDebugRecord(record: logging.LogRecord) -> bool:
+    return record.levelno < logging.WARNING
+
+
+# records are queued by the loggers and written (or kept in the ring) by the
+# listener thread, so a slow pipe never blocks the event loop
+_queueHandler = LazyQueueHandler(queue.SimpleQueue())
+# debug records go to stdout and the others to stderr
+_stdoutHandler = logging.StreamHandler(sys.stdout)
+_stdoutHandler.addFilter(_isDebugRecord)
+_stderrHandler = logging.StreamHandler(sys.stderr)
+_stderrHandler.setLevel(logging.WARNING)
+_ringHandler = RingHandler(DEFAULT_LOG_RING_SIZE)
+_listener: Optional[QueueListener] = None
 
 _rootLogger = logging.getLogger()
-_rootLogger.addHandler(logging.StreamHandler(sys.stdout))
-_debugLogger = logging.Logger('')
-_debugLogger.addHandler(logging.StreamHandler(sys.stdout))
-_errorLogger = logging.Logger('')
-_errorLogger.addHandler(logging.StreamHandler(sys.stderr))
+_rootLogger.addHandler(_queueHandler)
+_logger = logging.Logger('')
+_logger.addHandler(_queueHandler)
+# nothing is logged until setLogLevel() is called
+_rootLogger.setLevel(LOG_LEVEL_NONE)
+_logger.setLevel(LOG_LEVEL_NONE)
+
+
+def _startListener(*handlers: logging.Handler) -> None:
+    global _listener
+
+    _listener = QueueListener(
+        _queueHandler.queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+
+
+def _restartListenerInChild() -> None:
+    # the listener thread does not survive fork() and its queue may be left
+    # locked, so a forked process gets new ones
+    if _listener is None:
+        return
+
+    handlers = _listener.handlers
+    _queueHandler.queue = queue.SimpleQueue()
+    _startListener(*handlers)
+
+
+os.register_at_fork(after_in_child=_restartListenerInChild)
 
 
 class Logger:
     @staticmethod
-    def setLogLevel(logLevel: str) -> None:
+    def setLogLevel(
+        logLevel: str,
+        ringSize: int = DEFAULT_LOG_RING_SIZE,
+        ringOnly: bool = False
+    ) -> None:
+        """
+        Start logging records of the given level (or above) to stdout/stderr
+        and/or to a ring of the given number of recent records (0 means no
+        ring).
+        """
+        global _ringHandler
+
+        # called once, at startup
+        if _listener is not None:
+            raise Exception("log level already set")
+
+        handlers = []  # type: List[logging.Handler]
+        if not ringOnly:
+            handlers += [_stdoutHandler, _stderrHandler]
+        if ringSize > 0:
+            _ringHandler = RingHandler(ringSize)
+            handlers.append(_ringHandler)
+
+        # records would be queued for nobody otherwise
+        if logLevel == "none" or not handlers:
+            return
+
         _rootLogger.setLevel(logLevel.upper())
-        _debugLogger.setLevel(logLevel.upper())
-        _errorLogger.setLevel(logLevel.upper())
+        _logger.setLevel(logLevel.upper())
+
+        _startListener(*handlers)
+        atexit.register(Logger.close)
+
+    @staticmethod
+    def close() -> None:
+        """
+        Write the records still queued. Must be called before os._exit().
+        """
+        global _listener
+
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+    @staticmethod
+    def dump() -> List[Dict[str, Any]]:
+        """
+        Most recent records kept in the ring (oldest first).
+        """
+        return _ringHandler.dump()
+
+    # arguments are %-style and formatted just if the record is logged (in
+    # the listener thread if immutable), so callers must not build strings
+    # themselves
 
     @staticmethod
-    def debug(*args) -> None:
-        _debugLogger.debug(*args)
+    def debug(msg: str, *args: Any, **kwargs: Any) -> None:
+        _logger.debug(msg, *args, **kwargs)
 
     @staticmethod
-    def warning(*args) -> None:
-        _errorLogger.warning(*args)
+    def warning(msg: str, *args: Any, **kwargs: Any) -> None:
+        _logger.warning(msg, *args, **kwargs)
 
     @staticmethod
-    def error(*args) -> None:
-        _errorLogger.error(*args)
+    def error(msg: str, *args: Any, **kwargs: Any) -> None:
+        _logger.error(msg, *args, **kwargs)
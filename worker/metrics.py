@@ -0,0 +1,139 @@
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Optional
+
+from logger import Logger
+
+# upper bounds (ms) of the latency histogram buckets (a last one collects
+# the greater values)
+LATENCY_BUCKETS = [
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000
+]
+
+# seconds between event loop lag samples
+LOOP_LAG_INTERVAL = 0.5
+
+
+"""
+Histogram class
+
+Count of values by bucket plus their sum and maximum. Buckets are not
+dumped since they are the same for all histograms.
+"""
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self._counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self._count += 1
+        self._sum += value
+        if value > self._max:
+            self._max = value
+
+    def dump(self) -> Dict[str, Any]:
+        return {
+            "count": self._count,
+            "sum": round(self._sum, 3),
+            "max": round(self._max, 3),
+            "counts": self._counts
+        }
+
+
+"""
+Metrics class
+
+Latency of every request and notification processed by a session, errors,
+and lag of the event loop. Cheap enough to always be on.
+"""
+
+
+class Metrics:
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._startedAt = time.monotonic()
+        # latency (ms) histograms indexed by request method
+        self._requests: Dict[str, Histogram] = {}
+        # latency (ms) histograms indexed by notification event
+        self._notifications: Dict[str, Histogram] = {}
+        # number of failures indexed by method or event
+        self._errors: Dict[str, int] = {}
+        # event loop lag (ms) histogram
+        self._loopLag = Histogram()
+        self._lastLoopLag = 0.0
+        # task sampling the event loop lag
+        self._loopLagTask: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._loopLagTask = self._loop.create_task(self._sampleLoopLag())
+
+    def close(self) -> None:
+        if self._loopLagTask is not None:
+            self._loopLagTask.cancel()
+            self._loopLagTask = None
+
+    def observeRequest(self, method: str, latency: float, failed: bool) -> None:
+        histogram = self._requests.get(method)
+        if histogram is None:
+            histogram = self._requests[method] = Histogram()
+
+        histogram.observe(latency)
+
+        if failed:
+            self._errors[method] = self._errors.get(method, 0) + 1
+
+    def observeNotification(
+        self, event: str, latency: float, failed: bool
+    ) -> None:
+        histogram = self._notifications.get(event)
+        if histogram is None:
+            histogram = self._notifications[event] = Histogram()
+
+        histogram.observe(latency)
+
+        if failed:
+            self._errors[event] = self._errors.get(event, 0) + 1
+
+    def dump(self) -> Dict[str, Any]:
+        return {
+            "uptime": round(time.monotonic() - self._startedAt, 3),
+            # upper bounds of the buckets of every histogram
+            "buckets": LATENCY_BUCKETS,
+            "requests": {
+                method: histogram.dump()
+                for method, histogram in self._requests.items()
+            },
+            "notifications": {
+                event: histogram.dump()
+                for event, histogram in self._notifications.items()
+            },
+            "errors": dict(self._errors),
+            "loopLag": {
+                "last": round(self._lastLoopLag, 3),
+                **self._loopLag.dump()
+            }
+        }
+
+    async def _sampleLoopLag(self) -> None:
+        try:
+            while True:
+                expectedAt = time.monotonic() + LOOP_LAG_INTERVAL
+                await asyncio.sleep(LOOP_LAG_INTERVAL)
+                lag = max(0.0, (time.monotonic() - expectedAt) * 1000)
+                self._lastLoopLag = lag
+                self._loopLag.observe(lag)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as error:
+            Logger.warning(
+                "metrics: loop lag sampling failed: %s: %s",
+                error.__class__.__name__, error
+            )
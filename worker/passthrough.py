@@ -0,0 +1,234 @@
+import asyncio
+import fractions
+import queue
+import time
+from typing import Any, Callable, Optional, Set
+import av
+from aiortc import (
+    MediaStreamTrack,
+    RTCRtpReceiver,
+    RTCRtpSender,
+    RTCRtpTransceiver
+)
+from aiortc.mediastreams import MediaStreamError
+
+from logger import Logger
+
+# minimum seconds between keyframe requests sent to the remote sender
+KEYFRAME_REQUEST_INTERVAL = 0.5
+# encoded frames queued in a EncodedStreamTrack before dropping them
+MAX_QUEUED_FRAMES = 120
+
+
+"""
+EncodedFrameTap class
+
+Replaces the queue from which the decoder thread of a RTCRtpReceiver reads
+the encoded frames, so they can also be given (as av.Packet) to
+EncodedStreamTracks. Frames are not decoded if nobody needs them decoded.
+That queue is an aiortc internal (see the aiortc versions in setup.py), so
+if it is not found no tap is installed and received frames are just decoded.
+"""
+
+
+class EncodedFrameTap(queue.Queue):
+    def __init__(
+        self,
+        receiver: RTCRtpReceiver,
+        loop: asyncio.AbstractEventLoop,
+        needsDecoding: Callable[[], bool]
+    ) -> None:
+        super().__init__()
+        self._receiver = receiver
+        self._loop = loop
+        # function telling whether there are consumers of decoded frames
+        self._needsDecoding = needsDecoding
+        # EncodedStreamTracks being given the encoded frames
+        self._subscribers: Set["EncodedStreamTrack"] = set()
+        self._lastKeyframeRequest = 0.0
+        # delayed keyframe request (if requested too early)
+        self._keyframeRequestHandle = None  # type: Optional[asyncio.TimerHandle]
+
+    @staticmethod
+    def install(
+        receiver: RTCRtpReceiver,
+        loop: asyncio.AbstractEventLoop,
+        needsDecoding: Callable[[], bool]
+    ) -> Optional["EncodedFrameTap"]:
+        if not isinstance(
+            getattr(receiver, "_RTCRtpReceiver__decoder_queue", None), queue.Queue
+        ) or not hasattr(receiver, "_send_rtcp_pli"):
+            Logger.warning(
+                "passthrough: RTCRtpReceiver internals not found, received "
+                "frames will be decoded"
+            )
+            return None
+
+        # NOTE: must be done before the receiver starts its decoder thread
+        tap = EncodedFrameTap(receiver, loop, needsDecoding)
+        receiver._RTCRtpReceiver__decoder_queue = tap  # type: ignore
+        return tap
+
+    def subscribe(self, track: "EncodedStreamTrack") -> None:
+        self._subscribers.add(track)
+        # the new subscriber cannot start in the middle of a GOP
+        self.requestKeyframe()
+
+    def unsubscribe(self, track: "EncodedStreamTrack") -> None:
+        self._subscribers.discard(track)
+
+    def requestKeyframe(self) -> None:
+        if self._keyframeRequestHandle is not None:
+            return
+
+        elapsed = time.monotonic() - self._lastKeyframeRequest
+        if elapsed < KEYFRAME_REQUEST_INTERVAL:
+            self._keyframeRequestHandle = self._loop.call_later(
+                KEYFRAME_REQUEST_INTERVAL - elapsed, self._sendKeyframeRequest
+            )
+        else:
+            self._sendKeyframeRequest()
+
+    def _sendKeyframeRequest(self) -> None:
+        self._keyframeRequestHandle = None
+        self._lastKeyframeRequest = time.monotonic()
+        for source in self._receiver.getSynchronizationSources():
+            self._loop.create_task(self._receiver._send_rtcp_pli(source.source))
+
+    # called by the receiver (in the loop thread) for each complete frame
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None) -> None:
+        if item is None:
+            for track in list(self._subscribers):
+                track.push(None)
+        else:
+            codec, encodedFrame = item
+            for track in list(self._subscribers):
+                packet = av.Packet(encodedFrame.data)
+                packet.pts = encodedFrame.timestamp
+                packet.time_base = fractions.Fraction(1, codec.clockRate)
+                track.push((codec, packet))
+
+        if item is None or not self._subscribers or self._needsDecoding():
+            super().put(item, block, timeout)
+
+
+"""
+EncodedStreamTrack class
+
+Track given to a sender forwarding a receiving track without transcoding it.
+It returns the received frames encoded (as av.Packet) so the sender just
+packetizes them, unless the codec of the sender does not match the received
+one, in which case it falls back to decoded frames (so they get re-encoded).
+"""
+
+
+class EncodedStreamTrack(MediaStreamTrack):
+    def __init__(
+        self,
+        kind: str,
+        tap: EncodedFrameTap,
+        getDecodedTrack: Callable[[], MediaStreamTrack]
+    ) -> None:
+        super().__init__()
+        self.kind = kind
+        self._tap = tap
+        # function returning a track with the decoded frames
+        self._getDecodedTrack = getDecodedTrack
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._transceiver = None  # type: Optional[RTCRtpTransceiver]
+        self._decodedTrack = None  # type: Optional[MediaStreamTrack]
+
+        tap.subscribe(self)
+
+    def bind(self, transceiver: RTCRtpTransceiver) -> None:
+        self._transceiver = transceiver
+        hookKeyframeRequests(transceiver.sender)
+
+    def push(self, item: Any) -> None:
+        # the sender is not reading (i.e. not connected yet), so drop what we
+        # have and ask for a keyframe to start over
+        if item is not None and self._queue.qsize() >= MAX_QUEUED_FRAMES:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self.requestKeyframe()
+
+        self._queue.put_nowait(item)
+
+    def requestKeyframe(self) -> None:
+        if self._decodedTrack is None:
+            self._tap.requestKeyframe()
+
+    async def recv(self) -> Any:
+        if self.readyState != "live":
+            raise MediaStreamError
+
+        if self._decodedTrack is not None:
+            return await self._decodedTrack.recv()
+
+        item = await self._queue.get()
+        if item is None:
+            self.stop()
+            raise MediaStreamError
+
+        codec, packet = item
+        if self._matchesSendCodec(codec):
+            return packet
+
+        Logger.warning(
+            "passthrough: sending codec does not match %s, transcoding",
+            codec.mimeType
+        )
+
+        self._tap.unsubscribe(self)
+        self._decodedTrack = self._getDecodedTrack()
+        return await self._decodedTrack.recv()
+
+    def stop(self) -> None:
+        super().stop()
+        self._tap.unsubscribe(self)
+        if self._decodedTrack is not None:
+            self._decodedTrack.stop()
+
+    def _matchesSendCodec(self, codec: Any) -> bool:
+        if self._transceiver is None or not self._transceiver._codecs:
+            return False
+
+        sendCodec = self._transceiver._codecs[0]
+        if sendCodec.mimeType.lower() != codec.mimeType.lower():
+            return False
+        if sendCodec.clockRate != codec.clockRate:
+            return False
+        # H264 packetization cannot be converted
+        if sendCodec.parameters.get("packetization-mode") != \
+                codec.parameters.get("packetization-mode"):
+            return False
+
+        return True
+
+
+def hookKeyframeRequests(sender: RTCRtpSender) -> None:
+    """
+    Make keyframe requests (PLI/FIR) received by the sender also reach its
+    track if it sends encoded frames (EncodedStreamTrack, which asks the
+    remote sender of the track being forwarded, or SyntheticStreamTrack).
+    """
+    if getattr(sender, "_keyframeRequestsHooked", False):
+        return
+
+    if not hasattr(sender, "_send_keyframe"):
+        Logger.warning(
+            "passthrough: RTCRtpSender internals not found, keyframe requests "
+            "will not reach the track"
+        )
+        return
+
+    sendKeyframe = sender._send_keyframe
+
+    def _send_keyframe() -> None:
+        sendKeyframe()
+        requestKeyframe = getattr(sender.track, "requestKeyframe", None)
+        if requestKeyframe is not None:
+            requestKeyframe()
+
+    sender._send_keyframe = _send_keyframe  # type: ignore
+    sender._keyframeRequestsHooked = True  # type: ignore
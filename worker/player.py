@@ -0,0 +1,209 @@
+import json
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+from aiortc import MediaStreamTrack
+
+from cachedloop import CachedLoopPlayer
+from logger import Logger
+from synthetic import SyntheticPlayer, SyntheticSource
+
+if TYPE_CHECKING:
+    from aiortc.contrib.media import MediaPlayer
+
+
+def createMediaPlayer(file: str, **kwargs: Any) -> "MediaPlayer":
+    # the media stack is not imported until the first player is created
+    from aiortc.contrib.media import MediaPlayer
+
+    return MediaPlayer(file, **kwargs)
+
+
+"""
+SharedSource class
+
+A MediaPlayer whose tracks are relayed to every SharedPlayer created with the
+same file, format, options, loop and decode values, so the media is demuxed
+and decoded once.
+"""
+
+
+class SharedSource:
+    def __init__(self, key: Tuple, player: "MediaPlayer") -> None:
+        from aiortc.contrib.media import MediaRelay
+
+        self.key = key
+        self.player = player
+        self.relay = MediaRelay()
+        # number of SharedPlayers using this source
+        self.refCount = 0
+
+    def isLive(self) -> bool:
+        """
+        Whether the MediaPlayer still plays (a file not looping ends).
+        """
+        return all(
+            track.readyState == "live"
+            for track in (self.player.audio, self.player.video)
+            if track is not None
+        )
+
+    def stop(self) -> None:
+        if self.player.audio:
+            self.player.audio.stop()
+        if self.player.video:
+            self.player.video.stop()
+
+
+"""
+SharedPlayer class
+
+Exposes the same audio and video attributes as MediaPlayer, being them
+MediaRelay subscriptions to the tracks of a SharedSource.
+"""
+
+
+class SharedPlayer:
+    def __init__(self, source: SharedSource) -> None:
+        self.source = source
+        self._audio = None  # type: Optional[MediaStreamTrack]
+        self._video = None  # type: Optional[MediaStreamTrack]
+
+        # do not buffer, a slow consumer just misses frames
+        if source.player.audio:
+            self._audio = source.relay.subscribe(
+                source.player.audio, buffered=False
+            )
+        if source.player.video:
+            self._video = source.relay.subscribe(
+                source.player.video, buffered=False
+            )
+
+    @property
+    def audio(self) -> Optional[MediaStreamTrack]:
+        return self._audio
+
+    @property
+    def video(self) -> Optional[MediaStreamTrack]:
+        return self._video
+
+
+"""
+PlayerRegistry class
+
+Creates and closes the players of the worker. Shared players with the same
+source are reference counted so the MediaPlayer is released when the last
+one is closed.
+"""
+
+
+class PlayerRegistry:
+    def __init__(self) -> None:
+        # dictionary of shared sources indexed by key
+        self._sources = dict()  # type: Dict[Tuple, SharedSource]
+
+    def createPlayer(
+        self,
+        file: str,
+        format: Optional[str] = None,
+        options: Optional[Dict[str, str]] = None,
+        timeout: Optional[int] = None,
+        loop: bool = False,
+        decode: bool = True,
+        shared: bool = False,
+        cache: bool = False,
+        bitrate: Optional[int] = None
+    ) -> Any:
+        if cache:
+            if not loop:
+                raise TypeError("cache requires loop")
+
+            # each pass of the file is a new MediaPlayer (not looping) and
+            # its frames are encoded, so shared and decode do not apply
+            return CachedLoopPlayer(
+                lambda: createMediaPlayer(
+                    file, format=format, options=options, timeout=timeout
+                ),
+                (file, format, json.dumps(options, sort_keys=True)),
+                bitrate
+            )
+
+        if not shared:
+            return createMediaPlayer(
+                file,
+                format=format,
+                options=options,
+                timeout=timeout,
+                loop=loop,
+                decode=decode
+            )
+
+        key = (file, format, json.dumps(options, sort_keys=True), loop, decode)
+        source = self._sources.get(key)
+
+        # its players keep it until closed, but new ones would just end
+        if source is not None and not source.isLive():
+            Logger.debug("player: shared source ended [file:%s]", file)
+
+            del self._sources[key]
+            source = None
+
+        if source is None:
+            Logger.debug("player: creating shared source [file:%s]", file)
+
+            source = SharedSource(
+                key,
+                createMediaPlayer(
+                    file,
+                    format=format,
+                    options=options,
+                    timeout=timeout,
+                    loop=loop,
+                    decode=decode
+                )
+            )
+            self._sources[key] = source
+
+        source.refCount += 1
+
+        return SharedPlayer(source)
+
+    def createSyntheticPlayer(self, kind: str, **kwargs: Any) -> SyntheticPlayer:
+        # their encoded media is shared instead
+        return SyntheticPlayer(SyntheticSource(kind, **kwargs))
+
+    def closePlayer(self, player: Any) -> None:
+        if player.audio:
+            player.audio.stop()
+        if player.video:
+            player.video.stop()
+
+        if isinstance(player, CachedLoopPlayer):
+            player.close()
+
+        if not isinstance(player, SharedPlayer):
+            return
+
+        source = player.source
+        source.refCount -= 1
+
+        if source.refCount == 0:
+            Logger.debug("player: closing shared source")
+
+            source.stop()
+            # unless already replaced by a new one
+            if self._sources.get(source.key) is source:
+                del self._sources[source.key]
+
+    def dump(self) -> Any:
+        return [
+            {
+                "file": source.key[0],
+                "refCount": source.refCount
+            }
+            for source in self._sources.values()
+        ]
+
+    def close(self) -> None:
+        for source in self._sources.values():
+            source.stop()
+
+        self._sources.clear()
@@ -0,0 +1,216 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from logger import Logger
+
+PROFILING_MODES = ("cprofile", "sampling")
+
+# default seconds between samples of the sampling profiler
+DEFAULT_SAMPLING_INTERVAL = 0.01
+
+# default number of functions in the cProfile report
+DEFAULT_LIMIT = 50
+
+# both profilers look at the thread running the event loop, so just one of
+# them may be on at a time in the whole process (even with many sessions)
+_activeProfiler = None  # type: Optional[Profiler]
+
+
+def frameName(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+"""
+StackSampler class
+
+Thread taking the stack of another thread every interval and counting the
+times each stack is seen. Much cheaper than cProfile since the profiled
+thread runs untouched between samples.
+"""
+
+
+class StackSampler:
+    def __init__(self, threadId: int, interval: float) -> None:
+        self._threadId = threadId
+        self._interval = interval
+        # number of samples indexed by collapsed stack (outermost frame first)
+        self._stacks: Counter = Counter()
+        self._numSamples = 0
+        self._stopEvent = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="worker-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopEvent.set()
+        self._thread.join()
+
+    def report(self) -> Dict[str, Any]:
+        # collapsed stacks format ("a;b;c count"), as taken by flamegraph.pl
+        # and speedscope, most seen first
+        lines = [
+            f"{stack} {count}" for stack, count in self._stacks.most_common()
+        ]
+
+        return {
+            "format": "collapsed",
+            "samples": self._numSamples,
+            "data": "\n".join(lines)
+        }
+
+    def _run(self) -> None:
+        while not self._stopEvent.wait(self._interval):
+            frame = sys._current_frames().get(self._threadId)
+            if frame is None:
+                continue
+
+            names = []
+            while frame is not None:
+                names.append(frameName(frame))
+                frame = frame.f_back
+
+            names.reverse()
+            self._stacks[";".join(names)] += 1
+            self._numSamples += 1
+
+
+"""
+Profiler class
+
+On demand profiling of the event loop thread, either deterministic (cProfile)
+or by sampling its stack. If a duration is given the profiling stops by
+itself and its report is kept until stop() is called.
+"""
+
+
+class Profiler:
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._mode = None  # type: Optional[str]
+        self._limit = DEFAULT_LIMIT
+        self._startedAt = 0.0
+        self._profile = None  # type: Optional[cProfile.Profile]
+        self._sampler = None  # type: Optional[StackSampler]
+        # handle of the timer ending the profiling if a duration was given
+        self._durationHandle = None  # type: Optional[asyncio.TimerHandle]
+        # report of a profiling ended by its duration
+        self._report = None  # type: Optional[Dict[str, Any]]
+
+    @property
+    def running(self) -> bool:
+        return self._mode is not None
+
+    def start(
+        self,
+        mode: str = "sampling",
+        duration: Optional[float] = None,
+        interval: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> None:
+        global _activeProfiler
+
+        if mode not in PROFILING_MODES:
+            raise TypeError(f"invalid profiling mode '{mode}'")
+        elif _activeProfiler is not None:
+            raise Exception("already profiling")
+
+        Logger.debug(
+            "profiler: start() [mode:%s, duration:%s]", mode, duration
+        )
+
+        # a previous report not retrieved is lost
+        self._report = None
+        self._limit = limit or DEFAULT_LIMIT
+
+        if mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(
+                threading.get_ident(), interval or DEFAULT_SAMPLING_INTERVAL
+            )
+            self._sampler.start()
+
+        _activeProfiler = self
+        self._mode = mode
+        self._startedAt = time.monotonic()
+
+        if duration:
+            self._durationHandle = self._loop.call_later(
+                duration, self._onDuration
+            )
+
+    def stop(self) -> Dict[str, Any]:
+        if self.running:
+            return self._stop()
+
+        report = self._report
+        if report is None:
+            raise Exception("not profiling")
+
+        self._report = None
+        return report
+
+    def close(self) -> None:
+        if self.running:
+            self._stop()
+
+        self._report = None
+
+    def _stop(self) -> Dict[str, Any]:
+        global _activeProfiler
+
+        if self._durationHandle is not None:
+            self._durationHandle.cancel()
+            self._durationHandle = None
+
+        report = {
+            "mode": self._mode,
+            "duration": round((time.monotonic() - self._startedAt) * 1000)
+        }  # type: Dict[str, Any]
+
+        if self._profile is not None:
+            self._profile.disable()
+            report.update(self._pstatsReport(self._profile))
+            self._profile = None
+
+        if self._sampler is not None:
+            self._sampler.stop()
+            report.update(self._sampler.report())
+            self._sampler = None
+
+        _activeProfiler = None
+        self._mode = None
+
+        Logger.debug("profiler: stopped [duration:%sms]", report["duration"])
+
+        return report
+
+    def _pstatsReport(self, profile: cProfile.Profile) -> Dict[str, Any]:
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self._limit)
+
+        return {"format": "pstats", "data": stream.getvalue()}
+
+    def _onDuration(self) -> None:
+        self._durationHandle = None
+
+        try:
+            self._report = self._stop()
+        except Exception as error:
+            Logger.warning(
+                "profiler: stop failed: %s: %s", error.__class__.__name__, error
+            )
@@ -0,0 +1,142 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set
+from aiortc import MediaStreamTrack, RTCRtpReceiver
+
+from logger import Logger
+from passthrough import EncodedFrameTap, EncodedStreamTrack
+
+if TYPE_CHECKING:
+    from aiortc.contrib.media import MediaRelay
+
+
+"""
+RemoteTrackRelay class
+
+Keeps the receiving tracks of all handlers so they can be forwarded through
+other handlers. Each forward gets its own MediaRelay proxy so many senders
+do not compete for the frames of the same track. Forwards can also get the
+encoded frames (passthrough) so they are not decoded and re-encoded.
+"""
+
+
+class RemoteTrackRelay:
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        # created (and the media stack imported) when first needed
+        self._relay: Optional["MediaRelay"] = None
+        # dictionary of receiving tracks indexed by id
+        self._tracks: Dict[str, MediaStreamTrack] = {}
+        # dictionary of handler ids indexed by receiving track id
+        self._handlerIds: Dict[str, str] = {}
+        # dictionary of encoded frame taps indexed by receiving track id
+        self._taps: Dict[str, EncodedFrameTap] = {}
+        # dictionary of live proxies with decoded frames indexed by track id
+        self._decodedProxies: Dict[str, Set[MediaStreamTrack]] = {}
+
+    def add(
+        self,
+        handlerId: str,
+        track: MediaStreamTrack,
+        receiver: Optional[RTCRtpReceiver] = None
+    ) -> None:
+        trackId = track.id
+        self._tracks[trackId] = track
+        self._handlerIds[trackId] = handlerId
+        self._decodedProxies[trackId] = set()
+
+        if receiver is not None:
+            tap = EncodedFrameTap.install(
+                receiver,
+                self._loop,
+                lambda: bool(self._decodedProxies.get(trackId))
+            )
+            # otherwise forwarded tracks are always decoded
+            if tap is not None:
+                self._taps[trackId] = tap
+
+        @track.on("ended")  # type: ignore
+        def on_ended() -> None:
+            Logger.debug("relay: receiving track ended [id:%s]", trackId)
+
+            self.remove(trackId)
+
+    def subscribe(
+        self, trackId: str, kind: str, passthrough: bool = False
+    ) -> MediaStreamTrack:
+        track = self._tracks.get(trackId)
+        if not track:
+            raise Exception("no track found")
+        if track.kind != kind:
+            raise Exception("no matching track.kind")
+
+        tap = self._taps.get(trackId)
+        if passthrough and tap is not None:
+            return EncodedStreamTrack(
+                kind, tap, lambda: self._subscribeDecoded(trackId, track)
+            )
+
+        return self._subscribeDecoded(trackId, track)
+
+    def remove(self, trackId: str) -> None:
+        self._tracks.pop(trackId, None)
+        self._handlerIds.pop(trackId, None)
+        self._taps.pop(trackId, None)
+        self._decodedProxies.pop(trackId, None)
+
+    def removeHandlerTracks(self, handlerId: str) -> None:
+        for trackId in [
+            trackId
+            for trackId, trackHandlerId in self._handlerIds.items()
+            if trackHandlerId == handlerId
+        ]:
+            self.remove(trackId)
+
+    def dump(self) -> Any:
+        # frames received but not read yet (i.e. tracks not being forwarded)
+        queuedFrames = 0
+        queuedBytes = 0
+        for track in self._tracks.values():
+            queue = getattr(track, "_queue", None)
+            if queue is None:
+                continue
+
+            queuedFrames += queue.qsize()
+            # asyncio.Queue does not expose its items
+            for frame in list(queue._queue):
+                if frame is not None:
+                    queuedBytes += sum(plane.buffer_size for plane in frame.planes)
+
+        return {
+            "count": len(self._tracks),
+            "queuedFrames": queuedFrames,
+            "queuedBytes": queuedBytes
+        }
+
+    def close(self) -> None:
+        self._tracks.clear()
+        self._handlerIds.clear()
+        self._taps.clear()
+        self._decodedProxies.clear()
+
+    def _subscribeDecoded(
+        self, trackId: str, track: MediaStreamTrack
+    ) -> MediaStreamTrack:
+        if self._relay is None:
+            from aiortc.contrib import media
+
+            self._relay = media.MediaRelay()
+
+        proxy = self._relay.subscribe(track, buffered=False)
+        proxies = self._decodedProxies.setdefault(trackId, set())
+        proxies.add(proxy)
+
+        @proxy.on("ended")  # type: ignore
+        def on_ended() -> None:
+            proxies.discard(proxy)
+
+        # the decoder may have been skipping frames
+        tap = self._taps.get(trackId)
+        if tap is not None:
+            tap.requestKeyframe()
+
+        return proxy
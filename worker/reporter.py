@@ -0,0 +1,176 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple, Union
+from aiortc import RTCDataChannel
+
+from channel import Channel
+
+
+"""
+BufferedAmountReporter class
+
+Single worker wide task that notifies the Node process about the
+bufferedAmount of every DataChannel, just when its value changes.
+"""
+
+
+class BufferedAmountReporter:
+    def __init__(
+        self,
+        channel: Channel,
+        loop: asyncio.AbstractEventLoop,
+        interval: float = 1.0
+    ) -> None:
+        self._channel = channel
+        self._loop = loop
+        # seconds between checks
+        self._interval = interval
+        # dictionary of DataChannels indexed by internal id
+        self._dataChannels: Dict[str, RTCDataChannel] = {}
+        # last bufferedAmount notified indexed by internal id
+        self._lastValues: Dict[str, int] = {}
+        # periodic task, only running while there are DataChannels
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, dataChannelId: str, dataChannel: RTCDataChannel) -> None:
+        self._dataChannels[dataChannelId] = dataChannel
+        # the initial value is given to Node when the DataChannel is created
+        self._lastValues[dataChannelId] = dataChannel.bufferedAmount
+
+        if self._task is None:
+            self._task = self._loop.create_task(self._run())
+
+    def remove(self, dataChannelId: str) -> None:
+        self._dataChannels.pop(dataChannelId, None)
+        self._lastValues.pop(dataChannelId, None)
+
+        if not self._dataChannels and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def report(self, dataChannelId: str) -> None:
+        dataChannel = self._dataChannels.get(dataChannelId)
+        if dataChannel is None:
+            return
+
+        value = dataChannel.bufferedAmount
+        if value == self._lastValues.get(dataChannelId):
+            return
+
+        self._lastValues[dataChannelId] = value
+        await self._channel.notify(dataChannelId, "bufferedamount", value)
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        self._dataChannels.clear()
+        self._lastValues.clear()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            for dataChannelId in list(self._dataChannels):
+                await self.report(dataChannelId)
+
+
+"""
+MessageAggregator class
+
+Worker wide aggregation of received DataChannel messages, so the ones
+received by a DataChannel within a loop iteration (or within a given
+window) are notified to the Node process at once. While the channel send
+queue is above its high watermark messages are kept aggregated until it is
+written.
+"""
+
+
+class MessageAggregator:
+    def __init__(
+        self,
+        channel: Channel,
+        loop: asyncio.AbstractEventLoop,
+        window: float = 0
+    ) -> None:
+        self._channel = channel
+        self._loop = loop
+        # seconds during which messages are aggregated (0 means until the next
+        # loop iteration)
+        self._window = window
+        # pending handler id and messages indexed by DataChannel internal id
+        self._pending: Dict[str, Tuple[str, List[Union[str, bytes]]]] = {}
+        # scheduled notification of the pending messages
+        self._handle: Optional[asyncio.Handle] = None
+        # task waiting for the channel to be writable again
+        self._waitTask: Optional[asyncio.Task] = None
+
+    def add(
+        self, handlerId: str, dataChannelId: str, message: Union[str, bytes]
+    ) -> None:
+        entry = self._pending.get(dataChannelId)
+        if entry is None:
+            self._pending[dataChannelId] = (handlerId, [message])
+        else:
+            entry[1].append(message)
+
+        if self._handle is None and self._waitTask is None:
+            if self._window > 0:
+                self._handle = self._loop.call_later(self._window, self._notifyAll)
+            else:
+                self._handle = self._loop.call_soon(self._notifyAll)
+
+    def flush(self, dataChannelId: str) -> None:
+        """
+        Notify the pending messages of the given DataChannel right now (i.e.
+        before notifying its closure).
+        """
+        entry = self._pending.pop(dataChannelId, None)
+        if entry is not None:
+            self._queue(entry[0], dataChannelId, entry[1])
+
+    def remove(self, dataChannelId: str) -> None:
+        # messages already received are not lost
+        self.flush(dataChannelId)
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if self._waitTask is not None:
+            self._waitTask.cancel()
+            self._waitTask = None
+
+        self._pending.clear()
+
+    def _notifyAll(self) -> None:
+        self._handle = None
+
+        # notified once the channel is writable again
+        if self._waitTask is not None:
+            return
+
+        pending = self._pending
+        self._pending = {}
+
+        for dataChannelId, (handlerId, messages) in pending.items():
+            self._queue(handlerId, dataChannelId, messages)
+
+    def _queue(
+        self,
+        handlerId: str,
+        dataChannelId: str,
+        messages: List[Union[str, bytes]]
+    ) -> None:
+        if self._channel.queueDataChannelMessages(handlerId, dataChannelId, messages) \
+                and self._waitTask is None:
+            self._waitTask = self._loop.create_task(self._waitWritable())
+
+    async def _waitWritable(self) -> None:
+        try:
+            await self._channel.waitWritable()
+        finally:
+            self._waitTask = None
+
+        if self._pending and self._handle is None:
+            self._notifyAll()
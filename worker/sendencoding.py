@@ -0,0 +1,197 @@
+from typing import Any, List, Optional, Tuple
+import av
+from aiortc import RTCRtpCodecParameters, RTCRtpSender
+from aiortc.codecs import get_encoder
+
+from encoder import VIDEO_CLOCK_RATE
+from logger import Logger
+
+# seconds a frame may come before its due time and still be encoded
+FRAME_TIME_TOLERANCE = 0.001
+
+
+"""
+SendEncoding class
+
+Encoding parameters of a sender, as RTCRtpEncodingParameters ones: maximum
+bitrate (bps), maximum framerate and resolution scale down factor. None means
+not constrained.
+"""
+
+
+class SendEncoding:
+    def __init__(self) -> None:
+        self.maxBitrate = None  # type: Optional[int]
+        self.maxFramerate = None  # type: Optional[float]
+        self.scaleResolutionDownBy = None  # type: Optional[float]
+
+    def update(
+        self,
+        maxBitrate: Optional[int] = None,
+        maxFramerate: Optional[float] = None,
+        scaleResolutionDownBy: Optional[float] = None
+    ) -> None:
+        if maxBitrate is not None and maxBitrate <= 0:
+            raise TypeError("maxBitrate must be positive")
+        if maxFramerate is not None and maxFramerate <= 0:
+            raise TypeError("maxFramerate must be positive")
+        if scaleResolutionDownBy is not None and scaleResolutionDownBy < 1:
+            raise TypeError("scaleResolutionDownBy must be 1 or greater")
+
+        self.maxBitrate = maxBitrate
+        self.maxFramerate = maxFramerate
+        self.scaleResolutionDownBy = scaleResolutionDownBy
+
+    def dump(self) -> Any:
+        return {
+            "maxBitrate": self.maxBitrate,
+            "maxFramerate": self.maxFramerate,
+            "scaleResolutionDownBy": self.scaleResolutionDownBy
+        }
+
+
+"""
+ConstrainedEncoder class
+
+Wraps the aiortc encoder of a sender so video frames are dropped (down to
+the maximum framerate) and scaled down before being encoded, which is what
+saves CPU, and the bitrate estimated by the remote side is capped to the
+maximum one. Pre-encoded packets are just packetized.
+"""
+
+
+class ConstrainedEncoder:
+    def __init__(self, encoder: Any, encoding: SendEncoding) -> None:
+        self._encoder = encoder
+        self._encoding = encoding
+        # bitrate given by REMB, the encoder one until then
+        self._estimatedBitrate = getattr(encoder, "target_bitrate", None)
+        # media time (seconds) from which the next frame is encoded
+        self._nextFrameTime = None  # type: Optional[float]
+        # keyframe requested while dropping frames
+        self._keyframePending = False
+
+    @property
+    def target_bitrate(self) -> Optional[int]:
+        return self._estimatedBitrate
+
+    @target_bitrate.setter
+    def target_bitrate(self, bitrate: int) -> None:
+        self._estimatedBitrate = bitrate
+
+    def encode(
+        self, frame: av.frame.Frame, force_keyframe: bool = False
+    ) -> Tuple[List[bytes], int]:
+        if isinstance(frame, av.VideoFrame):
+            if self._shouldDrop(frame):
+                self._keyframePending = self._keyframePending or force_keyframe
+                return [], round(frame.time * VIDEO_CLOCK_RATE)
+
+            force_keyframe = force_keyframe or self._keyframePending
+            self._keyframePending = False
+            frame = self._scale(frame)
+
+        self._applyBitrate()
+
+        return self._encoder.encode(frame, force_keyframe)
+
+    def pack(self, packet: av.Packet) -> Tuple[List[bytes], int]:
+        return self._encoder.pack(packet)
+
+    def _shouldDrop(self, frame: av.VideoFrame) -> bool:
+        maxFramerate = self._encoding.maxFramerate
+        if not maxFramerate or frame.time is None:
+            self._nextFrameTime = None
+            return False
+
+        time = float(frame.time)
+        if self._nextFrameTime is not None \
+                and time + FRAME_TIME_TOLERANCE < self._nextFrameTime:
+            return True
+
+        # a source pausing does not make the next frames burst
+        interval = 1 / maxFramerate
+        if self._nextFrameTime is None or time >= self._nextFrameTime + interval:
+            self._nextFrameTime = time + interval
+        else:
+            self._nextFrameTime += interval
+
+        return False
+
+    def _scale(self, frame: av.VideoFrame) -> av.VideoFrame:
+        scale = self._encoding.scaleResolutionDownBy
+        if not scale or scale == 1:
+            return frame
+
+        # yuv420p needs even dimensions
+        width = max(2, int(frame.width / scale) & ~1)
+        height = max(2, int(frame.height / scale) & ~1)
+        if width == frame.width and height == frame.height:
+            return frame
+
+        pts, timeBase = frame.pts, frame.time_base
+        frame = frame.reformat(width=width, height=height, format="yuv420p")
+        frame.pts, frame.time_base = pts, timeBase
+
+        return frame
+
+    def _applyBitrate(self) -> None:
+        # audio encoders do not have it
+        if self._estimatedBitrate is None \
+                or not hasattr(self._encoder, "target_bitrate"):
+            return
+
+        bitrate = self._estimatedBitrate
+        if self._encoding.maxBitrate:
+            bitrate = min(bitrate, self._encoding.maxBitrate)
+
+        # aiortc clamps it to the range of the codec
+        if self._encoder.target_bitrate != bitrate:
+            self._encoder.target_bitrate = bitrate
+
+
+def getSendEncoding(sender: RTCRtpSender) -> Optional[SendEncoding]:
+    return getattr(sender, "_sendEncoding", None)
+
+
+def hookSendEncoding(sender: RTCRtpSender) -> SendEncoding:
+    """
+    Make the sender encode through a ConstrainedEncoder and return its
+    SendEncoding (the same one if called again). If the RTCRtpSender
+    internals are not found the sender is left unconstrained.
+    """
+    encoding = getSendEncoding(sender)
+    if encoding is not None:
+        return encoding
+
+    encoding = SendEncoding()
+    sender._sendEncoding = encoding  # type: ignore
+
+    if not hasattr(sender, "_next_encoded_frame") \
+            or not hasattr(sender, "_RTCRtpSender__encoder"):
+        Logger.warning(
+            "sendencoding: RTCRtpSender internals not found, encoding "
+            "parameters will not be applied"
+        )
+        return encoding
+
+    # the encoder is created by the sender once it sends (and again if
+    # restarted)
+    nextEncodedFrame = sender._next_encoded_frame
+
+    async def _next_encoded_frame(codec: RTCRtpCodecParameters) -> Any:
+        encoder = sender._RTCRtpSender__encoder  # type: ignore
+        if not isinstance(encoder, ConstrainedEncoder):
+            Logger.debug(
+                "sendencoding: constraining encoder [codec:%s]", codec.mimeType
+            )
+
+            sender._RTCRtpSender__encoder = ConstrainedEncoder(  # type: ignore
+                encoder or get_encoder(codec), encoding
+            )
+
+        return await nextEncodedFrame(codec)
+
+    sender._next_encoded_frame = _next_encoded_frame  # type: ignore
+
+    return encoding
@@ -0,0 +1,517 @@
+import asyncio
+import hmac
+import time
+from os import getpid
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiortc import (
+    MediaStreamTrack,
+    RTCConfiguration,
+    RTCIceServer,
+    RTCRtpReceiver
+)
+from certificates import CertificatePool
+from channel import Request, Notification, Channel
+from dispatcher import Dispatcher, dispatchKey
+from encoder import encodedLoopCache
+from handler import Handler
+from logger import Logger
+from metrics import Metrics
+from player import PlayerRegistry
+from profiler import Profiler
+from relay import RemoteTrackRelay
+from reporter import BufferedAmountReporter, MessageAggregator
+
+# seconds given to a connecting Node.js process to authenticate
+AUTHENTICATE_TIMEOUT = 10
+
+# createPlayer data given to synthetic players
+SYNTHETIC_SETTINGS = (
+    "pattern", "width", "height", "framerate", "bitrate", "frequency"
+)
+
+
+"""
+Session class
+
+State of a Channel with a Node.js Worker: its players, handlers and pending
+messages. The worker serves a single session over the inherited fd or many
+of them when listening on a socket.
+"""
+
+
+class Session:
+    def __init__(
+        self,
+        channel: Channel,
+        loop: asyncio.AbstractEventLoop,
+        codecName: str,
+        maxInFlightRequests: int,
+        bufferedAmountInterval: int,
+        dataChannelMessageWindow: int,
+        getRtpCapabilities: Callable[[], Awaitable[str]],
+        certificatePool: CertificatePool,
+        startedAt: float
+    ) -> None:
+        self._channel = channel
+        self._loop = loop
+        self._codecName = codecName
+        # function returning the native RTP capabilities (shared by sessions)
+        self._getRtpCapabilities = getRtpCapabilities
+        # pre-generated DTLS certificates (shared by sessions)
+        self._certificatePool = certificatePool
+        # time.monotonic() when the process (or the forked process or the
+        # connection) started
+        self._startedAt = startedAt
+        # dictionary of players (MediaPlayer or SharedPlayer) indexed by id
+        self._players: Dict[str, Any] = {}
+        # dictionary of handlers indexed by id
+        self._handlers: Dict[str, Handler] = {}
+
+        # create metrics (latency of every request and notification)
+        self._metrics = Metrics(loop)
+        self._metrics.start()
+
+        # create profiler (off until asked for)
+        self._profiler = Profiler(loop)
+
+        # create dispatcher (messages for different handlers run concurrently)
+        self._dispatcher = Dispatcher(loop, maxInFlightRequests)
+
+        # create player registry (players sharing a source decode it just once)
+        self._playerRegistry = PlayerRegistry()
+
+        # create receiving tracks relay (each forward of a track gets a proxy)
+        self._remoteTrackRelay = RemoteTrackRelay(loop)
+
+        # create DataChannels bufferedAmount reporter shared by all handlers
+        self._bufferedAmountReporter = BufferedAmountReporter(
+            channel, loop, bufferedAmountInterval / 1000
+        )
+
+        # create received DataChannel messages aggregator shared by all handlers
+        self._messageAggregator = MessageAggregator(
+            channel, loop, dataChannelMessageWindow / 1000
+        )
+
+    async def run(self) -> None:
+        Logger.debug("session: run()")
+
+        # tell the Node process that we are running
+        await self._channel.notify(str(getpid()), "running", self._runningData())
+
+        await self._receive()
+
+        Logger.debug("session: run() done")
+
+    async def runAuthenticated(self, token: Optional[str]) -> None:
+        """
+        Same as run() but for a Node process that connected to us, which must
+        first send an 'authenticate' request (with the token if given). Its
+        response replaces the 'running' notification.
+        """
+        Logger.debug("session: runAuthenticated()")
+
+        if await self._authenticate(token):
+            await self._receive()
+
+        Logger.debug("session: runAuthenticated() done")
+
+    async def close(self) -> None:
+        Logger.debug("session: close()")
+
+        # stop processing pending messages
+        await self._dispatcher.close()
+
+        # close channel
+        await self._channel.close()
+
+        # close all players
+        for player in self._players.values():
+            self._playerRegistry.closePlayer(player)
+        self._players.clear()
+        self._playerRegistry.close()
+
+        # close all handlers
+        for handler in self._handlers.values():
+            await handler.close()
+        self._handlers.clear()
+        self._remoteTrackRelay.close()
+
+        self._bufferedAmountReporter.close()
+        self._messageAggregator.close()
+        self._metrics.close()
+        self._profiler.close()
+
+        Logger.debug("session: close() done")
+
+    async def _authenticate(self, token: Optional[str]) -> bool:
+        try:
+            obj = await asyncio.wait_for(
+                self._channel.receive(), AUTHENTICATE_TIMEOUT
+            )
+        except Exception as error:
+            Logger.warning(
+                "session: authentication not received: %s",
+                error.__class__.__name__
+            )
+            return False
+
+        if "method" not in obj:
+            Logger.warning("session: authentication not received")
+            return False
+
+        request = Request(**obj)
+        request.setChannel(self._channel)
+
+        if request.method != "authenticate":
+            await request.failed(Exception("not authenticated"))
+            return False
+
+        data = request.data or {}
+        givenToken = str(data.get("token") or "")
+
+        if token and not hmac.compare_digest(
+            givenToken.encode("utf8"), token.encode("utf8")
+        ):
+            Logger.warning("session: authentication failed, wrong token")
+            await request.failed(Exception("wrong token"))
+            return False
+
+        await request.succeed({"pid": getpid(), **self._runningData()})
+        return True
+
+    def _runningData(self) -> Dict[str, Any]:
+        startupTime = round((time.monotonic() - self._startedAt) * 1000)
+
+        Logger.debug("session: running [startupTime:%sms]", startupTime)
+
+        return {"codec": self._codecName, "startupTime": startupTime}
+
+    async def _receive(self) -> None:
+        try:
+            async for obj in self._channel:
+                try:
+                    self._dispatch(obj)
+                except Exception as error:
+                    await self._rejectMessage(obj, error)
+
+                # stop reading while too many messages are pending
+                await self._dispatcher.waitReady()
+
+        except Exception as error:
+            Logger.error(
+                "session: receiving failed: %s: %s",
+                error.__class__.__name__, error
+            )
+
+    def _dispatch(self, obj: Dict[str, Any]) -> None:
+        if "method" in obj:
+            request = Request(**obj)
+            request.setChannel(self._channel)
+            self._dispatcher.dispatch(
+                dispatchKey(obj), self._handleRequest(request)
+            )
+
+        elif "event" in obj:
+            notification = Notification(**obj)
+            self._dispatcher.dispatch(
+                dispatchKey(obj), self._handleNotification(notification)
+            )
+
+    async def _rejectMessage(self, obj: Dict[str, Any], error: Exception) -> None:
+        """
+        Log a message that could not be dispatched and, if it is a request,
+        make it fail so the Node process does not wait for it.
+        """
+        Logger.error(
+            "session: invalid message [method:%s, event:%s]: %s: %s",
+            obj.get("method"), obj.get("event"), error.__class__.__name__, error
+        )
+
+        if "method" not in obj or "id" not in obj:
+            return
+
+        request = Request(obj["id"], str(obj["method"]))
+        request.setChannel(self._channel)
+
+        try:
+            await request.failed(error)
+        except Exception as sendError:
+            Logger.warning(
+                "session: cannot reject request: %s: %s",
+                sendError.__class__.__name__, sendError
+            )
+
+    def _getTrack(self, playerId: str, kind: str) -> MediaStreamTrack:
+        player = self._players[playerId]
+        track = player.audio if kind == "audio" else player.video
+        if not track:
+            raise Exception("no track found")
+
+        return track
+
+    def _addRemoteTrack(
+        self, handlerId: str, track: MediaStreamTrack, receiver: RTCRtpReceiver
+    ) -> None:
+        self._remoteTrackRelay.add(handlerId, track, receiver)
+
+    def _getRemoteTrack(
+        self, trackId: str, kind: str, passthrough: bool = False
+    ) -> MediaStreamTrack:
+        return self._remoteTrackRelay.subscribe(trackId, kind, passthrough)
+
+    async def _processRequest(self, request: Request) -> Any:
+        Logger.debug(
+            "session: processRequest() [method:%s]", request.method
+        )
+
+        if request.method == "dump":
+            result = {
+                "pid": getpid(),
+                "players": [],
+                "handlers": [],
+                "sharedSources": self._playerRegistry.dump(),
+                "encodedLoops": encodedLoopCache.dump(),
+                "recvTracks": self._remoteTrackRelay.dump(),
+                "certificates": self._certificatePool.dump(),
+                "dispatcher": self._dispatcher.dump(),
+                "channel": self._channel.dump()
+            }
+
+            for playerId, player in self._players.items():
+                playerDump = {
+                    "id": playerId
+                }  # type: Dict[str, Any]
+                if player.audio:
+                    playerDump["audioTrack"] = {
+                        "id": player.audio.id,
+                        "kind": player.audio.kind,
+                        "readyState": player.audio.readyState
+                    }
+                if player.video:
+                    playerDump["videoTrack"] = {
+                        "id": player.video.id,
+                        "kind": player.video.kind,
+                        "readyState": player.video.readyState
+                    }
+                result["players"].append(playerDump)  # type: ignore
+
+            for handler in self._handlers.values():
+                result["handlers"].append(handler.dump())  # type: ignore
+
+            return result
+
+        elif request.method == "getMetrics":
+            return {
+                "pid": getpid(),
+                **self._metrics.dump(),
+                "channel": self._channel.metrics(),
+                "dispatcher": self._dispatcher.dump(),
+                "handlers": {
+                    handlerId: handler.metrics()
+                    for handlerId, handler in self._handlers.items()
+                }
+            }
+
+        elif request.method == "getLogs":
+            return Logger.dump()
+
+        elif request.method == "startProfiling":
+            data = request.data or {}
+            duration = data.get("duration")
+            interval = data.get("interval")
+            self._profiler.start(
+                mode=data.get("mode", "sampling"),
+                duration=duration / 1000 if duration else None,
+                interval=interval / 1000 if interval else None,
+                limit=data.get("limit")
+            )
+
+        elif request.method == "stopProfiling":
+            return self._profiler.stop()
+
+        elif request.method == "createPlayer":
+            internal = request.internal
+            playerId = internal["playerId"]
+            data = request.data
+            if data.get("source") == "synthetic":
+                player = self._playerRegistry.createSyntheticPlayer(
+                    data["kind"],
+                    **{
+                        key: data[key]
+                        for key in SYNTHETIC_SETTINGS
+                        if data.get(key) is not None
+                    }
+                )
+            else:
+                player = self._playerRegistry.createPlayer(
+                    data["file"],
+                    format=data["format"] if "format" in data else None,
+                    options=data["options"] if "options" in data else None,
+                    timeout=data["timeout"] if "timeout" in data else None,
+                    loop=data["loop"] if "loop" in data else False,
+                    decode=data["decode"] if "decode" in data else True,
+                    shared=data["shared"] if "shared" in data else False,
+                    cache=data["cache"] if "cache" in data else False,
+                    bitrate=data["bitrate"] if "bitrate" in data else None
+                )
+
+            # store the player in the map
+            self._players[playerId] = player
+
+            result = {}
+            if player.audio:
+                result["audioTrackId"] = player.audio.id
+            if player.video:
+                result["videoTrackId"] = player.video.id
+            return result
+
+        elif request.method == "getRtpCapabilities":
+            return await self._getRtpCapabilities()
+
+        elif request.method == "createHandler":
+            startedAt = time.monotonic()
+            internal = request.internal
+            handlerId = internal["handlerId"]
+            data = request.data
+
+            # use RTCConfiguration if given
+            jsonRtcConfiguration = data.get("rtcConfiguration")
+            rtcConfiguration = None
+
+            if jsonRtcConfiguration and "iceServers" in jsonRtcConfiguration:
+                iceServers = []
+                for entry in jsonRtcConfiguration["iceServers"]:
+                    iceServer = RTCIceServer(
+                        urls=entry.get("urls"),
+                        username=entry.get("username"),
+                        credential=entry.get("credential"),
+                        credentialType=entry.get("credentialType")
+                    )
+                    iceServers.append(iceServer)
+                rtcConfiguration = RTCConfiguration(iceServers)
+
+            certificate = await self._certificatePool.get(
+                reuse=data.get("reuseCertificate", False)
+            )
+
+            handler = Handler(
+                handlerId,
+                self._channel,
+                self._loop,
+                self._getTrack,
+                self._addRemoteTrack,
+                self._getRemoteTrack,
+                self._bufferedAmountReporter,
+                self._messageAggregator,
+                rtcConfiguration,
+                certificate
+            )
+            handler.createLatency = round((time.monotonic() - startedAt) * 1000, 3)
+
+            Logger.debug(
+                "session: handler created [id:%s, latency:%sms]",
+                handlerId, handler.createLatency
+            )
+
+            self._handlers[handlerId] = handler
+            return {"latency": handler.createLatency}
+
+        else:
+            internal = request.internal
+            handler = self._handlers.get(internal["handlerId"])
+            if handler is None:
+                raise Exception("hander not found")
+
+            handler.numRequests += 1
+            return await handler.processRequest(request)
+
+    async def _processNotification(self, notification: Notification) -> None:
+        Logger.debug(
+            "session: processNotification() [event:%s]", notification.event
+        )
+
+        if notification.event == "player.close":
+            internal = notification.internal
+            playerId = internal["playerId"]
+            player = self._players.get(playerId)
+            if player is None:
+                return
+
+            self._playerRegistry.closePlayer(player)
+
+            del self._players[playerId]
+
+        elif notification.event == "player.stopTrack":
+            internal = notification.internal
+            playerId = internal["playerId"]
+            data = notification.data
+            kind = data["kind"]
+            player = self._players.get(playerId)
+            if player is None:
+                return
+
+            if kind == "audio" and player.audio:
+                player.audio.stop()
+            elif kind == "video" and player.video:
+                player.video.stop()
+
+        elif notification.event == "handler.close":
+            internal = notification.internal
+            handlerId = internal["handlerId"]
+            handler = self._handlers.get(handlerId)
+            if handler is None:
+                return
+
+            await handler.close()
+            del self._handlers[handlerId]
+            self._remoteTrackRelay.removeHandlerTracks(handlerId)
+
+        else:
+            internal = notification.internal
+            handler = self._handlers.get(internal["handlerId"])
+            if handler is None:
+                return
+
+            handler.numNotifications += 1
+            await handler.processNotification(notification)
+
+    async def _handleRequest(self, request: Request) -> None:
+        startedAt = time.perf_counter()
+        failed = False
+
+        try:
+            result = await self._processRequest(request)
+            await request.succeed(result)
+        except Exception as error:
+            failed = True
+            Logger.error(
+                "session: request '%s' failed: %s: %s",
+                request.method, error.__class__.__name__, error,
+                # traceback of unexpected errors
+                exc_info=None if isinstance(error, TypeError) else error
+            )
+            await request.failed(error)
+        finally:
+            self._metrics.observeRequest(
+                request.method, (time.perf_counter() - startedAt) * 1000, failed
+            )
+
+    async def _handleNotification(self, notification: Notification) -> None:
+        startedAt = time.perf_counter()
+        failed = False
+
+        try:
+            await self._processNotification(notification)
+        except Exception as error:
+            failed = True
+            Logger.error(
+                "session: notification '%s' failed: %s: %s",
+                notification.event, error.__class__.__name__, error,
+                # traceback of unexpected errors
+                exc_info=None if isinstance(error, TypeError) else error
+            )
+        finally:
+            self._metrics.observeNotification(
+                notification.event, (time.perf_counter() - startedAt) * 1000, failed
+            )
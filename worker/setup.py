@@ -10,7 +10,12 @@ setuptools.setup(
     license="ISC",
     packages=setuptools.find_packages(),
     install_requires=[
-        "aiortc>=1.9.0",
+        # some aiortc internals are used (see passthrough.py and
+        # sendencoding.py), check them before raising the upper bound
+        "aiortc>=1.9.0,<1.16",
         "pynetstring"
     ],
+    extras_require={
+        "orjson": ["orjson"]
+    },
 )
@@ -0,0 +1,340 @@
+import asyncio
+import fractions
+import math
+import random
+from array import array
+from typing import Any, List, Optional, Tuple
+import av
+from aiortc import MediaStreamTrack, RTCRtpCodecParameters
+from aiortc.mediastreams import MediaStreamError
+
+from encoder import (
+    DEFAULT_AUDIO_BITRATE,
+    DEFAULT_VIDEO_BITRATE,
+    EncodedLoop,
+    EncodedLoopReader,
+    EncodedLoopTrack,
+    PacketEncoder,
+    encodedLoopCache
+)
+from logger import Logger
+
+SYNTHETIC_PATTERNS = {"audio": ("tone", "noise"), "video": ("bars", "noise")}
+
+# seconds of media generated (and encoded) once and then looped
+SYNTHETIC_LOOP_DURATION = 2
+
+# duration (seconds) of audio frames
+AUDIO_FRAME_DURATION = 0.02
+
+# raw audio frames (given to aiortc if the sending codec cannot be encoded)
+RAW_AUDIO_SAMPLE_RATE = 48000
+RAW_AUDIO_LAYOUT = "mono"
+
+# amplitude of the generated audio (of 1)
+AUDIO_AMPLITUDE = 0.25
+
+# 75% color bars (Y, U, V): white, yellow, cyan, green, magenta, red, blue
+BARS_COLORS = [
+    (180, 128, 128),
+    (162, 44, 142),
+    (131, 156, 44),
+    (112, 72, 58),
+    (84, 184, 198),
+    (65, 100, 212),
+    (35, 212, 114)
+]
+
+
+"""
+FrameGenerator class
+
+Generates the frames of a synthetic loop. Bars move a whole frame width and
+tones complete whole cycles along the loop, so it has no seams.
+"""
+
+
+class FrameGenerator:
+    def __init__(
+        self,
+        kind: str,
+        pattern: str,
+        numFrames: int,
+        width: int = 0,
+        height: int = 0,
+        framerate: int = 0,
+        frequency: int = 0,
+        sampleRate: int = RAW_AUDIO_SAMPLE_RATE,
+        layout: str = RAW_AUDIO_LAYOUT
+    ) -> None:
+        self._kind = kind
+        self._pattern = pattern
+        self._numFrames = numFrames
+        self._width = width
+        self._height = height
+        self._random = random.Random(0)
+
+        if kind == "video":
+            self.timeBase = fractions.Fraction(1, framerate)
+            # a row of the bars in each plane
+            self._rows: List[bytes] = []
+            for plane, planeWidth in enumerate((width, width // 2, width // 2)):
+                self._rows.append(bytes(
+                    BARS_COLORS[x * len(BARS_COLORS) // planeWidth][plane]
+                    for x in range(planeWidth)
+                ))
+        else:
+            self.timeBase = fractions.Fraction(1, sampleRate)
+            self._sampleRate = sampleRate
+            self._layout = layout
+            self._samplesPerFrame = round(sampleRate * AUDIO_FRAME_DURATION)
+            self._samples = self._audioSamples(frequency)
+
+    def frame(self, index: int) -> av.frame.Frame:
+        index %= self._numFrames
+        frame: av.frame.Frame
+
+        if self._kind == "video":
+            frame = self._videoFrame(index)
+            frame.pts = index
+        else:
+            frame = self._audioFrame(index)
+            frame.pts = index * self._samplesPerFrame
+
+        frame.time_base = self.timeBase
+        return frame
+
+    def _videoFrame(self, index: int) -> av.VideoFrame:
+        frame = av.VideoFrame(self._width, self._height, "yuv420p")
+
+        for planeIndex, (plane, row) in enumerate(zip(frame.planes, self._rows)):
+            padding = bytes(plane.line_size - len(row))
+
+            if self._pattern == "bars":
+                # bars move a whole frame width along the loop
+                offset = index * len(row) // self._numFrames
+                plane.update((row[offset:] + row[:offset] + padding) * plane.height)
+
+            # noise just in the luma plane
+            elif planeIndex == 0:
+                plane.update(self._random.randbytes(plane.buffer_size))
+
+            else:
+                plane.update(bytes([128]) * plane.buffer_size)
+
+        return frame
+
+    def _audioFrame(self, index: int) -> av.AudioFrame:
+        frame = av.AudioFrame(
+            format="s16", layout=self._layout, samples=self._samplesPerFrame
+        )
+        plane = frame.planes[0]
+        size = self._samplesPerFrame * len(frame.layout.channels) * 2
+        data = self._samples[index * size:(index + 1) * size]
+        plane.update(data + bytes(plane.buffer_size - len(data)))
+        frame.sample_rate = self._sampleRate
+
+        return frame
+
+    def _audioSamples(self, frequency: int) -> bytes:
+        numChannels = 2 if self._layout == "stereo" else 1
+        numSamples = self._samplesPerFrame * self._numFrames
+        amplitude = int(AUDIO_AMPLITUDE * 32767)
+        samples = array("h")
+
+        for n in range(numSamples):
+            if self._pattern == "tone":
+                # a whole number of cycles fit in the loop
+                value = int(
+                    amplitude * math.sin(2 * math.pi * frequency * n / self._sampleRate)
+                )
+            else:
+                value = self._random.randint(-amplitude, amplitude)
+
+            samples.extend([value] * numChannels)
+
+        return samples.tobytes()
+
+
+"""
+SyntheticSource class
+
+Settings of synthetic audio or video, which is generated and encoded once
+per sending codec no matter how many tracks send it.
+"""
+
+
+class SyntheticSource:
+    def __init__(
+        self,
+        kind: str,
+        pattern: Optional[str] = None,
+        width: int = 640,
+        height: int = 480,
+        framerate: int = 30,
+        bitrate: Optional[int] = None,
+        frequency: int = 440
+    ) -> None:
+        if kind not in SYNTHETIC_PATTERNS:
+            raise TypeError(f"invalid kind '{kind}'")
+
+        pattern = pattern or SYNTHETIC_PATTERNS[kind][0]
+        if pattern not in SYNTHETIC_PATTERNS[kind]:
+            raise TypeError(f"invalid {kind} pattern '{pattern}'")
+
+        if kind == "video":
+            if width <= 0 or height <= 0 or width % 2 or height % 2:
+                raise TypeError("width and height must be positive even numbers")
+            if framerate <= 0:
+                raise TypeError("framerate must be positive")
+
+            bitrate = bitrate or DEFAULT_VIDEO_BITRATE
+            self.frameDuration = 1 / framerate
+            # what makes the encoded loop different
+            self.settings: Tuple[Any, ...] = (kind, pattern, width, height, framerate, bitrate)
+        else:
+            if frequency <= 0:
+                raise TypeError("frequency must be positive")
+
+            bitrate = bitrate or DEFAULT_AUDIO_BITRATE
+            self.frameDuration = AUDIO_FRAME_DURATION
+            # what makes the encoded loop different
+            self.settings = (kind, pattern, frequency, bitrate)
+
+        self.kind = kind
+        self.pattern = pattern
+        self._width = width
+        self._height = height
+        self._framerate = framerate
+        self._bitrate = bitrate
+        self._frequency = frequency
+        self._numFrames = round(SYNTHETIC_LOOP_DURATION / self.frameDuration)
+
+    async def getEncodedLoop(self, codec: RTCRtpCodecParameters) -> EncodedLoop:
+        return await encodedLoopCache.get(
+            self.settings + (codec.mimeType.lower(),),
+            lambda: self._encode(codec)
+        )
+
+    def createFrameGenerator(self, **kwargs: Any) -> FrameGenerator:
+        return FrameGenerator(
+            self.kind,
+            self.pattern,
+            self._numFrames,
+            width=self._width,
+            height=self._height,
+            framerate=self._framerate,
+            frequency=self._frequency,
+            **kwargs
+        )
+
+    def _encode(self, codec: RTCRtpCodecParameters) -> EncodedLoop:
+        encoder = PacketEncoder(
+            codec,
+            self._bitrate,
+            width=self._width,
+            height=self._height,
+            framerate=self._framerate
+        )
+
+        if self.kind == "video":
+            generator = self.createFrameGenerator()
+        else:
+            generator = self.createFrameGenerator(
+                sampleRate=encoder.sampleRate, layout=encoder.layout
+            )
+
+        packets: List[Tuple[bytes, int, bool]] = []
+        for index in range(self._numFrames):
+            packets += encoder.encode(generator.frame(index))
+        packets += encoder.encode(None)
+
+        # audio encoders may give an extra packet when flushed
+        del packets[self._numFrames:]
+
+        return EncodedLoop(
+            packets,
+            encoder.clockRate,
+            round(self._numFrames * self.frameDuration * encoder.clockRate)
+        )
+
+
+"""
+SyntheticStreamTrack class
+
+Track of a SyntheticSource. It returns the packets of the loop encoded with
+the sending codec, so the sender just packetizes them, or raw frames if that
+codec cannot be encoded (so aiortc encodes them).
+"""
+
+
+class SyntheticStreamTrack(EncodedLoopTrack):
+    def __init__(self, source: SyntheticSource) -> None:
+        super().__init__(source.kind)
+        self._source = source
+        self._prepared = False
+        self._generator = None  # type: Optional[FrameGenerator]
+        # number of raw frames returned
+        self._numFrames = 0
+
+    async def recv(self) -> Any:
+        if self.readyState != "live":
+            raise MediaStreamError
+
+        if not self._prepared:
+            await self._prepare()
+            self._prepared = True
+
+        if self._reader is not None:
+            return await self._readPacket()
+
+        generator = self._generator
+        frame = generator.frame(self._numFrames)
+        mediaTime = self._numFrames * self._source.frameDuration
+        frame.pts = round(mediaTime / generator.timeBase)
+        # pace frames as a real source would do
+        await self._pace(mediaTime)
+
+        self._numFrames += 1
+        return frame
+
+    async def _prepare(self) -> None:
+        codec = self._getSendCodec()
+
+        if codec is not None:
+            try:
+                encodedLoop = await self._source.getEncodedLoop(codec)
+                self._reader = EncodedLoopReader(encodedLoop)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                Logger.warning(
+                    "synthetic: cannot encode %s, sending raw frames: %s: %s",
+                    codec.mimeType, error.__class__.__name__, error
+                )
+
+        self._generator = self._source.createFrameGenerator()
+
+
+"""
+SyntheticPlayer class
+
+Exposes the same audio and video attributes as MediaPlayer, just one of them
+being a SyntheticStreamTrack.
+"""
+
+
+class SyntheticPlayer:
+    def __init__(self, source: SyntheticSource) -> None:
+        track = SyntheticStreamTrack(source)
+        self._audio = track if source.kind == "audio" else None
+        self._video = track if source.kind == "video" else None
+
+    @property
+    def audio(self) -> Optional[MediaStreamTrack]:
+        return self._audio
+
+    @property
+    def video(self) -> Optional[MediaStreamTrack]:
+        return self._video
@@ -0,0 +1,85 @@
+import fractions
+import threading
+import types
+import unittest
+from unittest import mock
+from typing import Any, List
+import av
+from aiortc import MediaStreamTrack, RTCRtpCodecParameters
+from aiortc.mediastreams import MediaStreamError
+
+from cachedloop import CachedLoopTrack
+from encoder import PacketEncoder, encodedLoopCache
+
+VP8 = RTCRtpCodecParameters(mimeType="video/VP8", clockRate=90000, payloadType=96)
+
+NUM_FRAMES = 5
+
+
+class FakeTrack(MediaStreamTrack):
+    kind = "video"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._numFrames = 0
+
+    async def recv(self) -> av.VideoFrame:
+        if self._numFrames == NUM_FRAMES:
+            raise MediaStreamError
+
+        # a frame per millisecond so the test is not paced for long
+        frame = av.VideoFrame(64, 48, "yuv420p")
+        frame.pts = self._numFrames
+        frame.time_base = fractions.Fraction(1, 1000)
+        self._numFrames += 1
+        return frame
+
+
+class FakePlayer:
+    def _onModeSet(self, track: CachedLoopTrack) -> None:
+        pass
+
+
+class CachedLoopTrackTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        player: Any = FakePlayer()
+        self.key = (self.id(),)
+        self.track = CachedLoopTrack(player, "video", FakeTrack(), self.key, 100000)
+        transceiver: Any = types.SimpleNamespace(_codecs=[VP8])
+        self.track._transceiver = transceiver
+
+    async def asyncTearDown(self) -> None:
+        self.track.stop()
+
+    async def testRecordsOutOfTheEventLoop(self) -> None:
+        threads: List[threading.Thread] = []
+        encode = PacketEncoder.encode
+
+        def recordThread(encoder: PacketEncoder, frame: Any) -> Any:
+            threads.append(threading.current_thread())
+            return encode(encoder, frame)
+
+        with mock.patch.object(PacketEncoder, "encode", recordThread):
+            packets = [await self.track.recv() for _ in range(NUM_FRAMES)]
+
+        self.assertEqual(self.track.mode, "record")
+        self.assertEqual([packet.pts for packet in packets], [0, 90, 180, 270, 360])
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    async def testReplaysOnceRecorded(self) -> None:
+        packets = [await self.track.recv() for _ in range(NUM_FRAMES + 2)]
+
+        self.assertEqual(self.track.mode, "replay")
+        self.assertEqual(
+            [packet.pts for packet in packets[NUM_FRAMES:]], [450, 540]
+        )
+        self.assertEqual(bytes(packets[NUM_FRAMES]), bytes(packets[0]))
+
+        encodedLoop = encodedLoopCache.lookup(self.key + ("video/vp8",))
+        self.assertIsNotNone(encodedLoop)
+        self.assertEqual(len(encodedLoop.packets), NUM_FRAMES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+from aiortc import RTCCertificate
+
+from certificates import CertificatePool, createPeerConnection
+
+
+class CertificatePoolTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.pool = CertificatePool(asyncio.get_running_loop(), size=2)
+
+    async def asyncTearDown(self) -> None:
+        self.pool.close()
+
+    async def waitRefilled(self) -> None:
+        while self.pool._refillTask is not None:
+            await asyncio.sleep(0.01)
+
+    async def testFillsOnStart(self) -> None:
+        self.pool.start()
+        await self.waitRefilled()
+
+        self.assertEqual(self.pool.dump()["available"], 2)
+
+    async def testRefillsWhatIsTaken(self) -> None:
+        self.pool.start()
+        await self.waitRefilled()
+        available = list(self.pool._certificates)
+
+        certificate = await self.pool.get()
+        self.assertIs(certificate, available[0])
+        self.assertEqual(self.pool.dump()["available"], 1)
+
+        await self.waitRefilled()
+        self.assertEqual(self.pool.dump()["available"], 2)
+        self.assertNotIn(certificate, self.pool._certificates)
+
+    async def testGeneratesWhenEmpty(self) -> None:
+        # on demand only
+        pool = CertificatePool(asyncio.get_running_loop(), size=0)
+        certificates = [await pool.get() for _ in range(3)]
+        pool.close()
+
+        self.assertEqual(len({id(certificate) for certificate in certificates}), 3)
+        self.assertEqual(pool.dump()["taken"], 3)
+        self.assertEqual(pool.dump()["missed"], 3)
+
+    async def testReusesSharedCertificate(self) -> None:
+        first, second = await asyncio.gather(
+            self.pool.get(reuse=True), self.pool.get(reuse=True)
+        )
+
+        self.assertIs(first, second)
+        self.assertEqual(self.pool.dump()["reused"], 2)
+        self.assertEqual(self.pool.dump()["taken"], 0)
+
+    async def testStopsRefillingWhenClosed(self) -> None:
+        self.pool.start()
+        self.pool.close()
+
+        self.assertIsNone(self.pool._refillTask)
+        self.assertEqual(self.pool.dump()["available"], 0)
+
+
+class CreatePeerConnectionTest(unittest.IsolatedAsyncioTestCase):
+    async def testUsesGivenCertificate(self) -> None:
+        certificate = RTCCertificate.generateCertificate()
+
+        pc = createPeerConnection(certificate=certificate)
+        pc.addTransceiver("audio")
+        offer = await pc.createOffer()
+        await pc.close()
+
+        fingerprint = certificate.getFingerprints()[0].value
+        self.assertIn(fingerprint, offer.sdp)
+
+    async def testRestoresCertificateGeneration(self) -> None:
+        generateCertificate = RTCCertificate.__dict__["generateCertificate"]
+
+        pc = createPeerConnection(certificate=RTCCertificate.generateCertificate())
+        await pc.close()
+
+        self.assertIs(
+            RTCCertificate.__dict__["generateCertificate"], generateCertificate
+        )
+        self.assertIsNot(
+            RTCCertificate.generateCertificate(),
+            RTCCertificate.generateCertificate()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
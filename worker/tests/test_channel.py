@@ -0,0 +1,88 @@
+import asyncio
+import unittest
+from typing import Any
+from unittest import mock
+import pynetstring
+
+from channel import (
+    BINARY_FRAME_FLAG_MANY,
+    BINARY_FRAME_FLAG_STRING,
+    Channel,
+    binary_frame,
+    binary_frame_of,
+    object_from_binary_frame,
+    pack_message
+)
+
+
+class BinaryFrameTest(unittest.TestCase):
+    def testDecodesMessages(self) -> None:
+        self.assertEqual(
+            object_from_binary_frame(binary_frame("handler-1", "dc-1", "a")),
+            {
+                "event": "datachannel.send",
+                "internal": {"handlerId": "handler-1", "dataChannelId": "dc-1"},
+                "data": "a"
+            }
+        )
+
+        frame = binary_frame_of(
+            "handler-1",
+            "dc-1",
+            BINARY_FRAME_FLAG_MANY,
+            pack_message("a") + pack_message(b"b")
+        )
+        obj: Any = object_from_binary_frame(frame)
+        self.assertEqual(obj["event"], "datachannel.sendMany")
+        self.assertEqual(obj["data"], ["a", b"b"])
+
+    def testDropsStringsNotUtf8(self) -> None:
+        frame = binary_frame_of("handler-1", "dc-1", BINARY_FRAME_FLAG_STRING, b"\xff")
+        self.assertIsNone(object_from_binary_frame(frame))
+
+        frame = binary_frame_of(
+            "handler-1",
+            "dc-1",
+            BINARY_FRAME_FLAG_MANY,
+            pack_message("a") + bytes([BINARY_FRAME_FLAG_STRING, 0, 0, 0, 1, 0xff])
+        )
+        self.assertIsNone(object_from_binary_frame(frame))
+
+    def testDropsIdsNotUtf8(self) -> None:
+        frame = bytearray(binary_frame("handler-1", "dc-1", "a"))
+        frame[3] = 0xff
+
+        self.assertIsNone(object_from_binary_frame(bytes(frame)))
+
+    def testDropsTruncatedFrames(self) -> None:
+        self.assertIsNone(object_from_binary_frame(bytes([0, 0, 9, 0x61])))
+
+        frame = binary_frame_of(
+            "handler-1", "dc-1", BINARY_FRAME_FLAG_MANY, pack_message("abc")[:-1]
+        )
+        self.assertIsNone(object_from_binary_frame(frame))
+
+
+class ChannelTest(unittest.IsolatedAsyncioTestCase):
+    async def testSkipsInvalidFrames(self) -> None:
+        reader = asyncio.StreamReader()
+        channel = Channel(reader=reader, writer=mock.Mock())
+
+        reader.feed_data(b"".join([
+            pynetstring.encode(
+                binary_frame_of("handler-1", "dc-1", BINARY_FRAME_FLAG_STRING, b"\xff")
+            ),
+            pynetstring.encode(b"{invalid"),
+            pynetstring.encode(binary_frame("handler-1", "dc-1", "a"))
+        ]))
+        reader.feed_eof()
+
+        obj = await channel.__anext__()
+        self.assertEqual(obj["data"], "a")
+
+        with self.assertRaises(StopAsyncIteration):
+            await channel.__anext__()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import fractions
+import unittest
+from typing import List, Tuple
+import av
+from aiortc import RTCRtpCodecParameters
+
+from encoder import EncodedLoop, EncodedLoopCache, EncodedLoopReader, PacketEncoder
+
+VP8 = RTCRtpCodecParameters(mimeType="video/VP8", clockRate=90000, payloadType=96)
+
+
+def createLoop(size: int, numPackets: int = 1) -> EncodedLoop:
+    return EncodedLoop(
+        [(bytes(size // numPackets), index * 3000, index == 0)
+            for index in range(numPackets)],
+        90000
+    )
+
+
+class PacketEncoderTest(unittest.TestCase):
+    def testEncodesAKeyframePerSecond(self) -> None:
+        encoder = PacketEncoder(VP8, 100000, width=64, height=48, framerate=10)
+
+        packets: List[Tuple[bytes, int, bool]] = []
+        for index in range(25):
+            frame = av.VideoFrame(64, 48, "yuv420p")
+            frame.pts = index
+            frame.time_base = fractions.Fraction(1, 10)
+            packets += encoder.encode(frame)
+        packets += encoder.encode(None)
+
+        self.assertEqual(
+            [index for index, (_, _, keyframe) in enumerate(packets) if keyframe],
+            [0, 10, 20]
+        )
+        self.assertEqual(packets[1][1], 9000)
+
+
+class EncodedLoopReaderTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # 6 packets lasting 3000 each, keyframes at 0 and 3
+        self.encodedLoop = EncodedLoop(
+            [(bytes([index]), index * 3000, index % 3 == 0) for index in range(6)],
+            90000
+        )
+
+    def read(self, reader: EncodedLoopReader, count: int) -> List[Tuple[int, int]]:
+        packets = [reader.read() for _ in range(count)]
+        return [(bytes(packet)[0], packet.pts) for packet in packets]
+
+    def testGoesOnWithTheNextLoop(self) -> None:
+        reader = EncodedLoopReader(self.encodedLoop, startPts=1000, position=4)
+
+        self.assertEqual(
+            self.read(reader, 3), [(4, 13000), (5, 16000), (0, 19000)]
+        )
+
+    def testSeeksTheNextKeyframe(self) -> None:
+        reader = EncodedLoopReader(self.encodedLoop)
+        self.read(reader, 1)
+
+        reader.seekKeyframe()
+
+        self.assertEqual(self.read(reader, 2), [(3, 3000), (4, 6000)])
+
+    def testStaysOnAKeyframe(self) -> None:
+        reader = EncodedLoopReader(self.encodedLoop)
+        self.read(reader, 3)
+
+        reader.seekKeyframe()
+
+        self.assertEqual(self.read(reader, 1), [(3, 9000)])
+
+    def testSeeksTheNextLoop(self) -> None:
+        reader = EncodedLoopReader(self.encodedLoop)
+        self.read(reader, 4)
+
+        reader.seekKeyframe()
+
+        self.assertEqual(
+            self.read(reader, 7),
+            [(0, 12000), (1, 15000), (2, 18000), (3, 21000), (4, 24000),
+                (5, 27000), (0, 30000)]
+        )
+
+
+class EncodedLoopCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def testEncodesOnce(self) -> None:
+        cache = EncodedLoopCache(maxSize=1000)
+        encodedLoop = createLoop(100)
+        calls: List[None] = []
+
+        def encode() -> EncodedLoop:
+            calls.append(None)
+            return encodedLoop
+
+        self.assertIs(await cache.get(("a",), encode), encodedLoop)
+        self.assertIs(await cache.get(("a",), encode), encodedLoop)
+        self.assertIs(cache.lookup(("a",)), encodedLoop)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.dump()["hits"], 2)
+        self.assertEqual(cache.dump()["misses"], 1)
+
+    async def testEvictsLeastRecentlyUsed(self) -> None:
+        cache = EncodedLoopCache(maxSize=250)
+        cache.put(("a",), createLoop(100))
+        cache.put(("b",), createLoop(100))
+        cache.lookup(("a",))
+
+        cache.put(("c",), createLoop(100))
+
+        self.assertIsNotNone(cache.lookup(("a",)))
+        self.assertIsNone(cache.lookup(("b",)))
+        self.assertIsNotNone(cache.lookup(("c",)))
+        self.assertEqual(cache.dump()["size"], 200)
+        self.assertEqual(cache.dump()["evictions"], 1)
+
+    async def testDoesNotCacheTooBigLoops(self) -> None:
+        cache = EncodedLoopCache(maxSize=250)
+        cache.put(("a",), createLoop(100))
+
+        encodedLoop = createLoop(300)
+        self.assertIs(await cache.get(("b",), lambda: encodedLoop), encodedLoop)
+
+        self.assertIsNotNone(cache.lookup(("a",)))
+        self.assertIsNone(cache.lookup(("b",)))
+        self.assertEqual(cache.dump()["size"], 100)
+        self.assertEqual(cache.dump()["evictions"], 0)
+
+    async def testDoesNotCacheFailures(self) -> None:
+        cache = EncodedLoopCache()
+
+        def encode() -> EncodedLoop:
+            raise TypeError("cannot encode")
+
+        with self.assertRaises(TypeError):
+            await cache.get(("a",), encode)
+
+        self.assertIsNone(cache.lookup(("a",)))
+        self.assertEqual(cache.dump()["loops"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
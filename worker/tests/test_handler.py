@@ -0,0 +1,200 @@
+import asyncio
+import datetime
+import unittest
+from typing import Any, List, Tuple
+from unittest import mock
+from aiortc import AudioStreamTrack, RTCStatsReport
+from aiortc.stats import RTCInboundRtpStreamStats, RTCOutboundRtpStreamStats
+
+from channel import Request
+from handler import Handler
+from reporter import BufferedAmountReporter, MessageAggregator
+
+
+class FakeChannel:
+    def __init__(self) -> None:
+        self.notifications: List[Tuple[str, str, Any]] = []
+
+    async def notify(self, targetId: str, event: str, data: Any = None) -> None:
+        self.notifications.append((targetId, event, data))
+
+
+def createHandler(channel: Any) -> Handler:
+    loop = asyncio.get_running_loop()
+
+    return Handler(
+        "handler-1",
+        channel,
+        loop,
+        getTrack=None,
+        addRemoteTrack=None,
+        getRemoteTrack=None,
+        bufferedAmountReporter=BufferedAmountReporter(channel, loop),
+        messageAggregator=MessageAggregator(channel, loop)
+    )
+
+
+def statsReport(stats: Any) -> RTCStatsReport:
+    report = RTCStatsReport()
+    report.add(stats)
+    return report
+
+
+def outboundStats(id: str, packetsSent: int = 10) -> RTCOutboundRtpStreamStats:
+    return RTCOutboundRtpStreamStats(
+        timestamp=datetime.datetime.now(),
+        type="outbound-rtp",
+        id=id,
+        ssrc=1111,
+        kind="audio",
+        transportId="transport",
+        packetsSent=packetsSent,
+        bytesSent=100 * packetsSent,
+        trackId="track"
+    )
+
+
+def inboundStats(id: str) -> RTCInboundRtpStreamStats:
+    return RTCInboundRtpStreamStats(
+        timestamp=datetime.datetime.now(),
+        type="inbound-rtp",
+        id=id,
+        ssrc=2222,
+        kind="audio",
+        transportId="transport",
+        packetsReceived=20,
+        packetsLost=1,
+        jitter=0
+    )
+
+
+class GetStatsBatchTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.handler = createHandler(FakeChannel())
+        pc = self.handler._pc
+
+        self.sendTransceiver = pc.addTransceiver(AudioStreamTrack(), "sendonly")
+        self.handler._sendTransceivers["local-1"] = self.sendTransceiver
+        self.recvTransceiver = pc.addTransceiver("audio", "recvonly")
+
+        await pc.setLocalDescription(await pc.createOffer())
+        self.handler._updateTransceiversByMid()
+
+        self.senderGetStats = self.patch(
+            self.sendTransceiver.sender, statsReport(outboundStats("outbound"))
+        )
+        self.receiverGetStats = self.patch(
+            self.recvTransceiver.receiver, statsReport(inboundStats("inbound"))
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.handler.close()
+
+    def patch(self, senderOrReceiver: Any, stats: RTCStatsReport) -> mock.AsyncMock:
+        patcher = mock.patch.object(
+            senderOrReceiver, "getStats", new=mock.AsyncMock(return_value=stats)
+        )
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    async def getStatsBatch(self, mids: Any) -> Any:
+        return await self.handler.processRequest(
+            Request("1", "handler.getStatsBatch", data={"mids": mids})
+        )
+
+    async def testAllGetsSenderAndReceiverStats(self) -> None:
+        result = await self.getStatsBatch("all")
+
+        sendMid = self.sendTransceiver.mid
+        recvMid = self.recvTransceiver.mid
+
+        self.assertEqual(set(result), {sendMid, recvMid})
+        self.assertEqual(result[sendMid]["outbound"]["type"], "outbound-rtp")
+        self.assertEqual(result[sendMid]["outbound"]["packetsSent"], 10)
+        self.assertEqual(result[recvMid]["inbound"]["type"], "inbound-rtp")
+        self.assertEqual(result[recvMid]["inbound"]["packetsReceived"], 20)
+
+    async def testIgnoresUnknownMids(self) -> None:
+        result = await self.getStatsBatch([self.recvTransceiver.mid, "unknown"])
+
+        self.assertEqual(list(result), [self.recvTransceiver.mid])
+        self.senderGetStats.assert_not_called()
+
+    async def testMissingTransceiverFails(self) -> None:
+        with self.assertRaisesRegex(TypeError, "no transceiver for mid unknown"):
+            await self.handler.processRequest(
+                Request("1", "handler.getSenderStats", data={"mid": "unknown"})
+            )
+
+
+class SubscribeStatsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.channel = FakeChannel()
+        self.handler = createHandler(self.channel)
+
+    async def asyncTearDown(self) -> None:
+        await self.handler.close()
+
+    async def getNotifications(self, samples: List[RTCStatsReport]) -> List[Any]:
+        """
+        Stats notifications given the successive getStats() results.
+        """
+        numSamples = len(samples)
+        # the last sample is repeated until unsubscribed
+        samples = samples + [samples[-1]] * 100
+
+        with mock.patch.object(
+            self.handler._pc, "getStats", new=mock.AsyncMock(side_effect=samples)
+        ) as getStats:
+            await self.handler.processRequest(
+                Request("1", "handler.subscribeStats", data={"interval": 1})
+            )
+            # until a repeated sample has been processed
+            while getStats.await_count < numSamples + 2:
+                await asyncio.sleep(0.001)
+            await self.handler.processRequest(
+                Request("2", "handler.unsubscribeStats")
+            )
+
+        return [
+            data for targetId, event, data in self.channel.notifications
+            if event == "stats"
+        ]
+
+    async def testNotifiesChangedFieldsOnly(self) -> None:
+        notifications = await self.getNotifications([
+            statsReport(outboundStats("outbound", packetsSent=10)),
+            # nothing but the timestamp changed
+            statsReport(outboundStats("outbound", packetsSent=10)),
+            statsReport(outboundStats("outbound", packetsSent=15))
+        ])
+
+        self.assertEqual(len(notifications), 2)
+
+        first, second = notifications
+        self.assertEqual(first["reports"]["outbound"]["packetsSent"], 10)
+        self.assertEqual(first["reports"]["outbound"]["ssrc"], 1111)
+        self.assertEqual(first["removed"], [])
+        self.assertEqual(
+            second["reports"], {"outbound": {"packetsSent": 15, "bytesSent": 1500}}
+        )
+
+    async def testNotifiesAddedAndRemovedReports(self) -> None:
+        inboundAndOutbound = statsReport(outboundStats("outbound"))
+        inboundAndOutbound.add(inboundStats("inbound"))
+
+        notifications = await self.getNotifications([
+            statsReport(outboundStats("outbound")),
+            inboundAndOutbound,
+            statsReport(inboundStats("inbound"))
+        ])
+
+        self.assertEqual(len(notifications), 3)
+        self.assertEqual(list(notifications[1]["reports"]), ["inbound"])
+        self.assertEqual(notifications[1]["removed"], [])
+        self.assertEqual(notifications[2]["reports"], {})
+        self.assertEqual(notifications[2]["removed"], ["outbound"])
+
+
+if __name__ == "__main__":
+    unittest.main()
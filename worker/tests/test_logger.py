@@ -0,0 +1,53 @@
+import logging
+import queue
+import unittest
+from typing import Any
+
+from logger import LazyQueueHandler
+
+
+def createRecord(msg: str, *args: Any) -> logging.LogRecord:
+    return logging.LogRecord("", logging.WARNING, __file__, 0, msg, args, None)
+
+
+class LazyQueueHandlerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.handler = LazyQueueHandler(queue.SimpleQueue())
+
+    def testKeepsImmutableArgumentsUnformatted(self) -> None:
+        record = self.handler.prepare(
+            createRecord("%s %s %s", "audio", 1.5, ("file", None, 500000))
+        )
+
+        self.assertEqual(record.msg, "%s %s %s")
+        self.assertEqual(record.args, ("audio", 1.5, ("file", None, 500000)))
+
+    def testFormatsMutableArgumentsRightAway(self) -> None:
+        data = {"count": 1}
+        items = [1]
+        record = self.handler.prepare(createRecord("%s %s", data, items))
+
+        data["count"] = 2
+        items.append(2)
+
+        self.assertEqual(record.getMessage(), "{'count': 1} [1]")
+
+    def testFormatsMappingArgumentRightAway(self) -> None:
+        data = {"count": 1}
+        record = self.handler.prepare(createRecord("%(count)s", data))
+
+        data["count"] = 2
+
+        self.assertEqual(record.getMessage(), "1")
+
+    def testFormatsTuplesWithMutableItems(self) -> None:
+        items = [1]
+        record = self.handler.prepare(createRecord("%s", ("key", items)))
+
+        items.append(2)
+
+        self.assertEqual(record.getMessage(), "('key', [1])")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import fractions
+import types
+import unittest
+from typing import Any, List
+from aiortc import RTCPeerConnection, RTCRtpCodecParameters
+from aiortc.jitterbuffer import JitterFrame
+
+from passthrough import (
+    MAX_QUEUED_FRAMES,
+    EncodedFrameTap,
+    EncodedStreamTrack,
+    hookKeyframeRequests
+)
+
+VP8 = RTCRtpCodecParameters(mimeType="video/VP8", clockRate=90000, payloadType=96)
+
+
+class EncodedFrameTapTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.pc = RTCPeerConnection()
+        self.receiver = self.pc.addTransceiver("video", "recvonly").receiver
+        self.needsDecoding = False
+        self.tap = EncodedFrameTap.install(
+            self.receiver, asyncio.get_running_loop(), lambda: self.needsDecoding
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.pc.close()
+
+    def subscribe(self) -> EncodedStreamTrack:
+        return EncodedStreamTrack("video", self.tap, self.fail)
+
+    async def testReplacesDecoderQueue(self) -> None:
+        self.assertIsNotNone(self.tap)
+        self.assertIs(
+            getattr(self.receiver, "_RTCRtpReceiver__decoder_queue"), self.tap
+        )
+
+    async def testFallsBackWithoutDecoderQueue(self) -> None:
+        receiver: Any = object()
+
+        tap = EncodedFrameTap.install(
+            receiver, asyncio.get_running_loop(), lambda: True
+        )
+
+        self.assertIsNone(tap)
+
+    async def testGivesPacketsToSubscribers(self) -> None:
+        track = self.subscribe()
+
+        self.tap.put((VP8, JitterFrame(b"frame", 3000)))
+
+        packet = track._queue.get_nowait()[1]
+        self.assertEqual(bytes(packet), b"frame")
+        self.assertEqual(packet.pts, 3000)
+        self.assertEqual(packet.time_base, fractions.Fraction(1, 90000))
+
+    async def testDecodesOnlyIfNeeded(self) -> None:
+        self.subscribe()
+
+        self.tap.put((VP8, JitterFrame(b"frame", 0)))
+        self.assertTrue(self.tap.empty())
+
+        self.needsDecoding = True
+        self.tap.put((VP8, JitterFrame(b"frame", 3000)))
+        self.assertEqual(self.tap.qsize(), 1)
+
+    async def testDecodesWithoutSubscribers(self) -> None:
+        self.tap.put((VP8, JitterFrame(b"frame", 0)))
+        self.assertEqual(self.tap.qsize(), 1)
+
+    async def testEndReachesDecoderAndSubscribers(self) -> None:
+        track = self.subscribe()
+
+        self.tap.put(None)
+
+        self.assertIsNone(self.tap.get_nowait())
+        self.assertIsNone(track._queue.get_nowait())
+
+    async def testTrackDropsFramesNotRead(self) -> None:
+        track = self.subscribe()
+
+        for index in range(MAX_QUEUED_FRAMES + 1):
+            self.tap.put((VP8, JitterFrame(b"frame", index)))
+
+        # the queue started over with the last frame
+        self.assertEqual(track._queue.qsize(), 1)
+        self.assertEqual(track._queue.get_nowait()[1].pts, MAX_QUEUED_FRAMES)
+
+
+class HookKeyframeRequestsTest(unittest.TestCase):
+    def testKeyframeRequestsReachTheTrack(self) -> None:
+        requests: List[str] = []
+        sender: Any = types.SimpleNamespace(
+            _send_keyframe=lambda: requests.append("sender"),
+            track=types.SimpleNamespace(
+                requestKeyframe=lambda: requests.append("track")
+            )
+        )
+
+        hookKeyframeRequests(sender)
+        hookKeyframeRequests(sender)
+        sender._send_keyframe()
+
+        self.assertEqual(requests, ["sender", "track"])
+
+    def testSkipsSenderWithoutInternals(self) -> None:
+        sender: Any = types.SimpleNamespace(track=None)
+
+        hookKeyframeRequests(sender)
+
+        self.assertFalse(hasattr(sender, "_send_keyframe"))
+        self.assertFalse(hasattr(sender, "_keyframeRequestsHooked"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import types
+import unittest
+from typing import Any, List
+from unittest import mock
+from aiortc import MediaStreamTrack
+
+from player import PlayerRegistry
+
+
+class FakeTrack(MediaStreamTrack):
+    def __init__(self, kind: str) -> None:
+        super().__init__()
+        self.kind = kind
+
+    async def recv(self) -> Any:
+        raise NotImplementedError
+
+
+class PlayerRegistryTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.registry = PlayerRegistry()
+        # MediaPlayers created, instead of opening files
+        self.mediaPlayers: List[Any] = []
+        patcher = mock.patch("player.createMediaPlayer", self.createMediaPlayer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self) -> None:
+        self.registry.close()
+
+    def createMediaPlayer(self, file: str, **kwargs: Any) -> Any:
+        mediaPlayer = types.SimpleNamespace(
+            audio=FakeTrack("audio"), video=FakeTrack("video")
+        )
+        self.mediaPlayers.append(mediaPlayer)
+        return mediaPlayer
+
+    async def testSharesSource(self) -> None:
+        first = self.registry.createPlayer("file.mp4", shared=True)
+        second = self.registry.createPlayer("file.mp4", shared=True)
+
+        self.assertIs(first.source, second.source)
+        self.assertEqual(len(self.mediaPlayers), 1)
+        self.assertEqual(self.registry.dump(), [{"file": "file.mp4", "refCount": 2}])
+
+    async def testReplacesEndedSource(self) -> None:
+        first = self.registry.createPlayer("file.mp4", shared=True)
+        # the file ended
+        self.mediaPlayers[0].video.stop()
+
+        second = self.registry.createPlayer("file.mp4", shared=True)
+
+        self.assertIsNot(first.source, second.source)
+        self.assertEqual(len(self.mediaPlayers), 2)
+
+        # closing the ended one keeps the new one
+        self.registry.closePlayer(first)
+        self.assertEqual(self.registry.dump(), [{"file": "file.mp4", "refCount": 1}])
+        self.assertEqual(self.mediaPlayers[1].audio.readyState, "live")
+
+    async def testClosesSourceWithLastPlayer(self) -> None:
+        first = self.registry.createPlayer("file.mp4", shared=True)
+        second = self.registry.createPlayer("file.mp4", shared=True)
+
+        self.registry.closePlayer(first)
+        self.assertEqual(self.mediaPlayers[0].audio.readyState, "live")
+
+        self.registry.closePlayer(second)
+        self.assertEqual(self.mediaPlayers[0].audio.readyState, "ended")
+        self.assertEqual(self.registry.dump(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+from typing import Any, List, Tuple, Union
+
+from reporter import MessageAggregator
+
+
+class FakeChannel:
+    def __init__(self) -> None:
+        self.queued: List[Tuple[str, str, List[Union[str, bytes]]]] = []
+        # whether queueDataChannelMessages() reports the high watermark
+        self.full = False
+        self.writable = asyncio.Event()
+
+    def queueDataChannelMessages(
+        self,
+        handlerId: str,
+        dataChannelId: str,
+        messages: List[Union[str, bytes]]
+    ) -> bool:
+        self.queued.append((handlerId, dataChannelId, list(messages)))
+        return self.full
+
+    async def waitWritable(self) -> None:
+        await self.writable.wait()
+
+
+class MessageAggregatorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.channel = FakeChannel()
+        channel: Any = self.channel
+        self.aggregator = MessageAggregator(channel, asyncio.get_running_loop())
+
+    async def asyncTearDown(self) -> None:
+        self.aggregator.close()
+
+    async def testQueuesMessagesOfALoopIterationAtOnce(self) -> None:
+        self.aggregator.add("handler-1", "dc-1", "a")
+        self.aggregator.add("handler-1", "dc-1", b"b")
+        self.aggregator.add("handler-1", "dc-2", "c")
+
+        await asyncio.sleep(0)
+
+        self.assertEqual(self.channel.queued, [
+            ("handler-1", "dc-1", ["a", b"b"]),
+            ("handler-1", "dc-2", ["c"])
+        ])
+
+    async def testRemoveQueuesPendingMessages(self) -> None:
+        self.aggregator.add("handler-1", "dc-1", "a")
+        self.aggregator.remove("dc-1")
+
+        self.assertEqual(self.channel.queued, [("handler-1", "dc-1", ["a"])])
+
+        await asyncio.sleep(0)
+        self.assertEqual(len(self.channel.queued), 1)
+
+    async def testKeepsMessagesWhileChannelIsFull(self) -> None:
+        self.channel.full = True
+        self.aggregator.add("handler-1", "dc-1", "a")
+        await asyncio.sleep(0)
+
+        self.channel.full = False
+        self.aggregator.add("handler-1", "dc-1", "b")
+        self.aggregator.add("handler-1", "dc-1", "c")
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(self.channel.queued, [("handler-1", "dc-1", ["a"])])
+
+        self.channel.writable.set()
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(self.channel.queued, [
+            ("handler-1", "dc-1", ["a"]),
+            ("handler-1", "dc-1", ["b", "c"])
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
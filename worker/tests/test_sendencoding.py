@@ -0,0 +1,148 @@
+import fractions
+import types
+import unittest
+from typing import Any, List, Optional, Tuple
+import av
+from aiortc import RTCPeerConnection
+
+from sendencoding import ConstrainedEncoder, SendEncoding, hookSendEncoding
+
+
+class FakeEncoder:
+    def __init__(self) -> None:
+        self.target_bitrate = 1000000
+        # frames given and whether a keyframe was forced
+        self.encoded: List[Tuple[Any, bool]] = []
+
+    def encode(self, frame: Any, force_keyframe: bool = False) -> Tuple[List[bytes], int]:
+        self.encoded.append((frame, force_keyframe))
+        return [b"payload"], 0
+
+
+def createVideoFrame(index: int, framerate: int = 30) -> av.VideoFrame:
+    frame = av.VideoFrame(640, 480, "yuv420p")
+    frame.pts = index
+    frame.time_base = fractions.Fraction(1, framerate)
+    return frame
+
+
+class SendEncodingTest(unittest.TestCase):
+    def testRejectsInvalidParameters(self) -> None:
+        encoding = SendEncoding()
+
+        with self.assertRaises(TypeError):
+            encoding.update(maxBitrate=0)
+        with self.assertRaises(TypeError):
+            encoding.update(maxFramerate=-1)
+        with self.assertRaises(TypeError):
+            encoding.update(scaleResolutionDownBy=0.5)
+
+    def testUnsetParametersAreNotConstrained(self) -> None:
+        encoding = SendEncoding()
+        encoding.update(maxBitrate=100000, maxFramerate=15)
+
+        encoding.update(scaleResolutionDownBy=2)
+
+        self.assertEqual(encoding.dump(), {
+            "maxBitrate": None,
+            "maxFramerate": None,
+            "scaleResolutionDownBy": 2
+        })
+
+
+class ConstrainedEncoderTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.inner = FakeEncoder()
+        self.encoding = SendEncoding()
+        self.encoder = ConstrainedEncoder(self.inner, self.encoding)
+
+    def encodedPts(self) -> List[Optional[int]]:
+        return [frame.pts for frame, _ in self.inner.encoded]
+
+    def testDropsFramesAboveMaxFramerate(self) -> None:
+        self.encoding.update(maxFramerate=10)
+
+        for index in range(9):
+            payloads, _ = self.encoder.encode(createVideoFrame(index))
+            self.assertEqual(bool(payloads), index % 3 == 0)
+
+        self.assertEqual(self.encodedPts(), [0, 3, 6])
+
+    def testDoesNotBurstAfterAPause(self) -> None:
+        self.encoding.update(maxFramerate=10)
+
+        for index in (0, 30, 31, 32, 33):
+            self.encoder.encode(createVideoFrame(index))
+
+        self.assertEqual(self.encodedPts(), [0, 30, 33])
+
+    def testKeepsKeyframeRequestedWhileDropping(self) -> None:
+        self.encoding.update(maxFramerate=10)
+
+        self.encoder.encode(createVideoFrame(0))
+        self.encoder.encode(createVideoFrame(1), force_keyframe=True)
+        self.encoder.encode(createVideoFrame(2))
+        self.encoder.encode(createVideoFrame(3))
+        self.encoder.encode(createVideoFrame(6))
+
+        self.assertEqual(
+            [force for _, force in self.inner.encoded], [False, True, False]
+        )
+
+    def testScalesDownToEvenDimensions(self) -> None:
+        self.encoding.update(scaleResolutionDownBy=3)
+
+        self.encoder.encode(createVideoFrame(5))
+
+        frame = self.inner.encoded[0][0]
+        self.assertEqual((frame.width, frame.height), (212, 160))
+        self.assertEqual(frame.pts, 5)
+        self.assertEqual(frame.time_base, fractions.Fraction(1, 30))
+
+    def testDoesNotTouchAudioFrames(self) -> None:
+        self.encoding.update(maxFramerate=1, scaleResolutionDownBy=2)
+        frames = [av.AudioFrame(format="s16", layout="mono", samples=960)
+                  for _ in range(3)]
+
+        for frame in frames:
+            self.encoder.encode(frame)
+
+        self.assertEqual([frame for frame, _ in self.inner.encoded], frames)
+
+    def testCapsEstimatedBitrate(self) -> None:
+        self.encoding.update(maxBitrate=300000)
+
+        self.encoder.target_bitrate = 500000
+        self.encoder.encode(createVideoFrame(0))
+        self.assertEqual(self.inner.target_bitrate, 300000)
+
+        self.encoding.update()
+        self.encoder.encode(createVideoFrame(1))
+        self.assertEqual(self.inner.target_bitrate, 500000)
+        self.assertEqual(self.encoder.target_bitrate, 500000)
+
+
+class HookSendEncodingTest(unittest.IsolatedAsyncioTestCase):
+    async def testHooksSenderOnce(self) -> None:
+        pc = RTCPeerConnection()
+        sender = pc.addTransceiver("video").sender
+        nextEncodedFrame = sender._next_encoded_frame
+
+        encoding = hookSendEncoding(sender)
+        await pc.close()
+
+        self.assertIsNot(sender._next_encoded_frame, nextEncodedFrame)
+        self.assertIs(hookSendEncoding(sender), encoding)
+
+    async def testFallsBackWithoutSenderInternals(self) -> None:
+        sender: Any = types.SimpleNamespace()
+
+        encoding = hookSendEncoding(sender)
+
+        self.assertIsInstance(encoding, SendEncoding)
+        self.assertFalse(hasattr(sender, "_next_encoded_frame"))
+        self.assertIs(hookSendEncoding(sender), encoding)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import fractions
+import unittest
+from typing import Any
+from aiortc import RTCRtpCodecParameters
+
+from synthetic import SYNTHETIC_LOOP_DURATION, SyntheticSource
+
+VP8 = RTCRtpCodecParameters(mimeType="video/VP8", clockRate=90000, payloadType=96)
+OPUS = RTCRtpCodecParameters(
+    mimeType="audio/opus", clockRate=48000, channels=2, payloadType=111
+)
+
+
+class SyntheticSourceTest(unittest.TestCase):
+    def testRejectsInvalidSettings(self) -> None:
+        with self.assertRaises(TypeError):
+            SyntheticSource("text")
+        with self.assertRaises(TypeError):
+            SyntheticSource("video", pattern="tone")
+        with self.assertRaises(TypeError):
+            SyntheticSource("video", width=641)
+        with self.assertRaises(TypeError):
+            SyntheticSource("video", framerate=0)
+        with self.assertRaises(TypeError):
+            SyntheticSource("audio", frequency=0)
+
+    def testSettingsTellLoopsApart(self) -> None:
+        self.assertEqual(
+            SyntheticSource("video", width=320, height=240).settings,
+            SyntheticSource("video", width=320, height=240).settings
+        )
+        self.assertNotEqual(
+            SyntheticSource("video", width=320, height=240).settings,
+            SyntheticSource("video", width=320, height=240, bitrate=100000).settings
+        )
+
+    def testVideoFrames(self) -> None:
+        source = SyntheticSource("video", width=64, height=48, framerate=10)
+        generator = source.createFrameGenerator()
+
+        frame: Any = generator.frame(3)
+        self.assertEqual((frame.width, frame.height), (64, 48))
+        self.assertEqual(frame.pts, 3)
+        self.assertEqual(frame.time_base, fractions.Fraction(1, 10))
+
+        # bars move along the loop and come back to the start
+        numFrames = SYNTHETIC_LOOP_DURATION * 10
+        first = bytes(generator._videoFrame(0).planes[0])
+        self.assertNotEqual(bytes(generator._videoFrame(1).planes[0]), first)
+        wrapped: Any = generator.frame(numFrames)
+        self.assertEqual(wrapped.pts, 0)
+        self.assertEqual(bytes(wrapped.planes[0]), first)
+
+    def testAudioFrames(self) -> None:
+        source = SyntheticSource("audio", frequency=1000)
+        generator = source.createFrameGenerator()
+
+        frame: Any = generator.frame(2)
+        self.assertEqual(frame.samples, 960)
+        self.assertEqual(frame.sample_rate, 48000)
+        self.assertEqual(frame.pts, 2 * 960)
+        self.assertTrue(any(bytes(frame.planes[0])))
+
+    def testEncodesVideoLoop(self) -> None:
+        source = SyntheticSource("video", width=64, height=48, framerate=10)
+
+        encodedLoop = source._encode(VP8)
+
+        self.assertEqual(len(encodedLoop.packets), SYNTHETIC_LOOP_DURATION * 10)
+        self.assertEqual(encodedLoop.duration, SYNTHETIC_LOOP_DURATION * 90000)
+        self.assertEqual(encodedLoop.pts[:3], [0, 9000, 18000])
+
+    def testEncodesAudioLoop(self) -> None:
+        source = SyntheticSource("audio")
+
+        encodedLoop = source._encode(OPUS)
+
+        self.assertEqual(len(encodedLoop.packets), SYNTHETIC_LOOP_DURATION * 50)
+        self.assertEqual(encodedLoop.duration, SYNTHETIC_LOOP_DURATION * 48000)
+        self.assertEqual(encodedLoop.pts[:3], [0, 960, 1920])
+
+
+if __name__ == "__main__":
+    unittest.main()
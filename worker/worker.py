@@ -1,301 +1,407 @@
+import time
+
+# taken before importing the media stack (most of the startup time) so the
+# startup time can be reported
+STARTED_AT = time.monotonic()
+
 import argparse
-import traceback
 import asyncio
-from os import getpid
-from typing import Any, Dict
-from aiortc import RTCConfiguration, RTCIceServer, RTCPeerConnection
-from aiortc.contrib.media import MediaPlayer, MediaStreamTrack
-from channel import Request, Notification, Channel
-from handler import Handler
+import os
+import signal
+import socket
+import stat
+import sys
+from typing import Optional, Set
+from aiortc import RTCPeerConnection
+from certificates import CertificatePool
+from channel import READ_BUFFER_SIZE, Channel
+from codec import createCodec
+from encoder import encodedLoopCache
 from logger import Logger
+from session import Session
 
 # File descriptor to communicate with the Node.js process
 CHANNEL_FD = 3
 
 
+def listenAddress(value: str) -> str:
+    scheme, _, address = value.partition(":")
+    if scheme == "unix" and address:
+        return value
+    if scheme == "tcp":
+        host, _, port = address.rpartition(":")
+        if host and port.isdigit():
+            return value
+
+    raise argparse.ArgumentTypeError("must be unix:PATH or tcp:HOST:PORT")
+
+
+def createListenSocket(listen: str) -> socket.socket:
+    scheme, _, address = listen.partition(":")
+
+    if scheme == "unix":
+        # remove the socket file left by a previous run
+        try:
+            if stat.S_ISSOCK(os.stat(address).st_mode):
+                os.unlink(address)
+        except FileNotFoundError:
+            pass
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(address)
+        # just for our user
+        os.chmod(address, 0o600)
+    else:
+        host, _, port = address.rpartition(":")
+        infos = socket.getaddrinfo(
+            host.strip("[]"), int(port), type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE
+        )
+        family, sockType, proto, _, sockaddr = infos[0]
+        sock = socket.socket(family, sockType, proto)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(sockaddr)
+
+    sock.listen(128)
+    return sock
+
+
+def listenAddressOf(sock: socket.socket) -> str:
+    if sock.family == socket.AF_UNIX:
+        return f"unix:{sock.getsockname()}"
+
+    # port may have been 0
+    host, port = sock.getsockname()[:2]
+    return f"tcp:{host}:{port}"
+
+
+async def generateRtpCapabilities() -> str:
+    pc = RTCPeerConnection()
+    pc.addTransceiver("audio", "sendonly")
+    pc.addTransceiver("video", "sendonly")
+    offer = await pc.createOffer()
+    await pc.close()
+    return offer.sdp
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="aiortc mediasoup-client handler")
     parser.add_argument(
-        "--logLevel", "-l", choices=["debug", "warn", "error", "none"])
+        "--logLevel", "-l", choices=["debug", "warn", "error", "none"],
+        default="warn")
+    parser.add_argument(
+        "--logRingSize", type=int, default=1000,
+        help="number of recent log records kept in memory (0 means none)")
+    parser.add_argument(
+        "--logRingOnly", action="store_true",
+        help="just keep log records in memory instead of writing them to stdout/stderr")
+    parser.add_argument(
+        "--maxInFlightRequests", type=int, default=64,
+        help="maximum number of requests/notifications processed concurrently (0 means no limit)")
+    parser.add_argument(
+        "--codec", choices=["json", "orjson"], default="json",
+        help="Channel messages serializer (falls back to json if not available)")
+    parser.add_argument(
+        "--bufferedAmountInterval", type=int, default=1000,
+        help="interval (ms) to check DataChannels bufferedAmount for changes")
+    parser.add_argument(
+        "--dataChannelMessageWindow", type=int, default=0,
+        help="time (ms) during which received DataChannel messages are notified at once (0 means a loop iteration)")
+    parser.add_argument(
+        "--encodedCacheSize", type=int, default=256,
+        help="maximum size (MB) of the encoded media cached by looping players")
+    parser.add_argument(
+        "--certificatePoolSize", type=int, default=4,
+        help="number of DTLS certificates generated ahead of time (0 means on demand)")
+    parser.add_argument(
+        "--listen", type=listenAddress,
+        help="serve Node.js processes connecting to unix:PATH or tcp:HOST:PORT instead of the inherited fd")
+    parser.add_argument(
+        "--token",
+        help="token that connecting Node.js processes must send (listen mode, required for tcp)")
+    parser.add_argument(
+        "--fork", action="store_true",
+        help="serve each connection in a forked process (listen mode)")
     args = parser.parse_args()
 
+    if args.fork and not args.listen:
+        parser.error("--fork requires --listen")
+
+    # anyone reaching the port could drive us otherwise (the unix socket is
+    # just for our user)
+    if args.listen and args.listen.startswith("tcp:") and not args.token:
+        parser.error("--token is required for tcp listen")
+
     """
     Argument handling
     """
-    if args.logLevel and args.logLevel != "none":
-        Logger.setLogLevel(args.logLevel)
+    Logger.setLogLevel(args.logLevel, args.logRingSize, args.logRingOnly)
 
     Logger.debug("worker: starting mediasoup-client aiortc worker")
 
     """
     Initialization
     """
-    # dictionary of players indexed by id
-    players: Dict[str, MediaPlayer] = ({})
-    # dictionary of handlers indexed by id
-    handlers: Dict[str, Handler] = ({})
-    # dictionary of receiving tracks indexed by id
-    recvTracks = dict()  # type: Dict[str, MediaStreamTrack]
-
-    # get/create event loop
-    loop = asyncio.get_event_loop()
-
-    # create channel
-    channel = Channel(CHANNEL_FD)
-
-    def getTrack(playerId: str, kind: str) -> MediaStreamTrack:
-        player = players[playerId]
-        track = player.audio if kind == "audio" else player.video
-        if not track:
-            raise Exception("no track found")
-
-        return track
-
-    def addRemoteTrack(track: MediaStreamTrack) -> None:
-        recvTracks[track.id] = track
-
-    def getRemoteTrack(trackId: str, kind: str) -> MediaStreamTrack:
-        track = recvTracks.get(trackId)
-        if not track:
-            raise Exception("no track found")
-        if track.kind != kind:
-            raise Exception("no matching track.kind")
-
-        return track
-
-    async def processRequest(request: Request) -> Any:
-        Logger.debug(f"worker: processRequest() [method:{request.method}]")
-
-        if request.method == "dump":
-            result = {
-                "pid": getpid(),
-                "players": [],
-                "handlers": []
-            }
-
-            for playerId, player in players.items():
-                playerDump = {
-                    "id": playerId
-                }  # type: Dict[str, Any]
-                if player.audio:
-                    playerDump["audioTrack"] = {
-                        "id": player.audio.id,
-                        "kind": player.audio.kind,
-                        "readyState": player.audio.readyState
-                    }
-                if player.video:
-                    playerDump["videoTrack"] = {
-                        "id": player.video.id,
-                        "kind": player.video.kind,
-                        "readyState": player.video.readyState
-                    }
-                result["players"].append(playerDump)  # type: ignore
-
-            for handler in handlers.values():
-                result["handlers"].append(handler.dump())  # type: ignore
-
-            return result
-
-        elif request.method == "createPlayer":
-            internal = request.internal
-            playerId = internal["playerId"]
-            data = request.data
-            player = MediaPlayer(
-                data["file"],
-                format=data["format"] if "format" in data else None,
-                options=data["options"] if "options" in data else None,
-                timeout=data["timeout"] if "timeout" in data else None,
-                loop=data["loop"] if "loop" in data else False,
-                decode=data["decode"] if "decode" in data else True
-            )
+    codec = createCodec(args.codec)
+    encodedLoopCache.maxSize = args.encodedCacheSize * 1024 * 1024
+
+    # native RTP capabilities just depend on the aiortc build, so they are
+    # generated once (in background as soon as the loop runs)
+    rtpCapabilitiesTask = None  # type: Optional[asyncio.Future]
+
+    def prepareRtpCapabilities(
+        loop: asyncio.AbstractEventLoop, sdp: Optional[str] = None
+    ) -> None:
+        global rtpCapabilitiesTask
+        if sdp is not None:
+            rtpCapabilitiesTask = loop.create_future()
+            rtpCapabilitiesTask.set_result(sdp)
+        else:
+            rtpCapabilitiesTask = loop.create_task(generateRtpCapabilities())
+
+    async def getRtpCapabilities() -> str:
+        try:
+            return await asyncio.shield(rtpCapabilitiesTask)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # do not cache the failure
+            prepareRtpCapabilities(asyncio.get_event_loop())
+            raise
+
+    # DTLS certificates are generated ahead of time (in each forked process
+    # so they are not shared with other ones)
+    certificatePool = None  # type: Optional[CertificatePool]
+
+    def prepareCertificatePool(loop: asyncio.AbstractEventLoop) -> None:
+        global certificatePool
+        certificatePool = CertificatePool(loop, args.certificatePoolSize)
+        certificatePool.start()
+
+    def createSession(
+        loop: asyncio.AbstractEventLoop, channel: Channel, startedAt: float
+    ) -> Session:
+        return Session(
+            channel,
+            loop,
+            codec.name,
+            args.maxInFlightRequests,
+            args.bufferedAmountInterval,
+            args.dataChannelMessageWindow,
+            getRtpCapabilities,
+            certificatePool,
+            startedAt
+        )
+
+    def announceListening(sock: socket.socket) -> None:
+        # tell whoever started us where we are listening (stdout since logs
+        # may be disabled)
+        print(f"worker: listening on {listenAddressOf(sock)}", flush=True)
+
+    def removeListenSocket(sock: socket.socket) -> None:
+        if sock.family == socket.AF_UNIX:
+            try:
+                os.unlink(sock.getsockname())
+            except OSError:
+                pass
 
-            # store the player in the map
-            players[playerId] = player
-
-            result = {}
-            if player.audio:
-                result["audioTrackId"] = player.audio.id
-            if player.video:
-                result["videoTrackId"] = player.video.id
-            return result
-
-        elif request.method == "getRtpCapabilities":
-            pc = RTCPeerConnection()
-            pc.addTransceiver("audio", "sendonly")
-            pc.addTransceiver("video", "sendonly")
-            offer = await pc.createOffer()
-            await pc.close()
-            return offer.sdp
-
-        elif request.method == "createHandler":
-            internal = request.internal
-            handlerId = internal["handlerId"]
-            data = request.data
-
-            # use RTCConfiguration if given
-            jsonRtcConfiguration = data.get("rtcConfiguration")
-            rtcConfiguration = None
-
-            if jsonRtcConfiguration and "iceServers" in jsonRtcConfiguration:
-                iceServers = []
-                for entry in jsonRtcConfiguration["iceServers"]:
-                    iceServer = RTCIceServer(
-                        urls=entry.get("urls"),
-                        username=entry.get("username"),
-                        credential=entry.get("credential"),
-                        credentialType=entry.get("credentialType")
-                    )
-                    iceServers.append(iceServer)
-                rtcConfiguration = RTCConfiguration(iceServers)
-
-            handler = Handler(
-                handlerId,
-                channel,
+    async def listen(loop: asyncio.AbstractEventLoop) -> None:
+        # sessions of connected Node.js processes
+        sessions: Set[Session] = set()
+
+        async def handleConnection(
+            reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+        ) -> None:
+            Logger.debug("worker: Node.js process connected")
+
+            session = createSession(
                 loop,
-                getTrack,
-                addRemoteTrack,
-                getRemoteTrack,
-                rtcConfiguration
+                Channel(codec=codec, reader=reader, writer=writer),
+                time.monotonic()
             )
+            sessions.add(session)
 
-            handlers[handlerId] = handler
-            return
+            try:
+                await session.runAuthenticated(args.token)
+            finally:
+                sessions.discard(session)
+                await session.close()
 
-        else:
-            internal = request.internal
-            handler = handlers.get(internal["handlerId"])
-            if handler is None:
-                raise Exception("hander not found")
-
-            return await handler.processRequest(request)
-
-    async def processNotification(notification: Notification) -> None:
-        Logger.debug(f"worker: processNotification() [event:{notification.event}]")
-
-        if notification.event == "player.close":
-            internal = notification.internal
-            playerId = internal["playerId"]
-            player = players.get(playerId)
-            if player is None:
-                return
-
-            if player.audio:
-                player.audio.stop()
-            if player.video:
-                player.video.stop()
-
-            del players[playerId]
-
-        elif notification.event == "player.stopTrack":
-            internal = notification.internal
-            playerId = internal["playerId"]
-            data = notification.data
-            kind = data["kind"]
-            player = players.get(playerId)
-            if player is None:
-                return
-
-            if kind == "audio" and player.audio:
-                player.audio.stop()
-            elif kind == "video" and player.video:
-                player.video.stop()
-
-        elif notification.event == "handler.close":
-            internal = notification.internal
-            handlerId = internal["handlerId"]
-            handler = handlers.get(handlerId)
-            if handler is None:
-                return
-
-            await handler.close()
-            del handlers[handlerId]
+            Logger.debug("worker: Node.js process disconnected")
 
+        sock = createListenSocket(args.listen)
+
+        if sock.family == socket.AF_UNIX:
+            server = await asyncio.start_unix_server(
+                handleConnection, sock=sock, limit=READ_BUFFER_SIZE
+            )
         else:
-            internal = notification.internal
-            handler = handlers.get(internal["handlerId"])
-            if handler is None:
-                return
+            server = await asyncio.start_server(
+                handleConnection, sock=sock, limit=READ_BUFFER_SIZE
+            )
+
+        announceListening(sock)
 
-            await handler.processNotification(notification)
+        stopped = asyncio.Event()
+        loop.add_signal_handler(signal.SIGTERM, stopped.set)
+        loop.add_signal_handler(signal.SIGINT, stopped.set)
 
-    async def run(channel: Channel) -> None:
-        Logger.debug("worker: run()")
+        await stopped.wait()
 
-        # tell the Node process that we are running
-        await channel.notify(str(getpid()), "running")
+        Logger.debug("worker: stop listening")
+
+        removeListenSocket(sock)
+        server.close()
+
+        for session in list(sessions):
+            await session.close()
+
+        await server.wait_closed()
+
+    def serveForked(conn: socket.socket, sdp: Optional[str]) -> None:
+        startedAt = time.monotonic()
+
+        # the zygote did not leave a running loop, so this is a fresh one
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        prepareRtpCapabilities(loop, sdp)
+        prepareCertificatePool(loop)
+
+        async def run() -> None:
+            reader, writer = await asyncio.open_connection(
+                sock=conn, limit=READ_BUFFER_SIZE
+            )
+            session = createSession(
+                loop, Channel(codec=codec, reader=reader, writer=writer), startedAt
+            )
 
-        while True:
             try:
-                obj = await channel.receive()
+                await session.runAuthenticated(args.token)
+            finally:
+                await session.close()
+
+        try:
+            loop.run_until_complete(run())
+        finally:
+            certificatePool.close()
+            loop.close()
+
+    def fork() -> None:
+        """
+        Zygote: the media stack is imported and the native RTP capabilities
+        generated before accepting connections, so each one is served at once
+        by a forked process (which is also what the Node.js Worker sees as its
+        subprocess).
+        """
+        # imported lazily by players and relays otherwise, which forked
+        # processes would do again each
+        import aiortc.contrib.media  # noqa: F401
+
+        sdp = None  # type: Optional[str]
+        try:
+            sdp = asyncio.run(generateRtpCapabilities())
+        except Exception as error:
+            Logger.warning(
+                "worker: cannot generate RTP capabilities: %s: %s",
+                error.__class__.__name__, error
+            )
 
-                if obj is None:
-                    continue
+        # pids of the forked processes
+        children: Set[int] = set()
 
-                elif "method" in obj:
-                    request = Request(**obj)
-                    request.setChannel(channel)
-                    try:
-                        result = await processRequest(request)
-                        await request.succeed(result)
-                    except Exception as error:
-                        errorStr = f"{error.__class__.__name__}: {error}"
-                        Logger.error(
-                            f"worker: request '{request.method}' failed: {errorStr}"
-                        )
-                        if not isinstance(error, TypeError):
-                            traceback.print_tb(error.__traceback__)
-                        await request.failed(error)
-
-                elif "event" in obj:
-                    notification = Notification(**obj)
+        def onChildExit(signum, frame) -> None:
+            while True:
+                try:
+                    pid, _ = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    return
+                if pid == 0:
+                    return
+                children.discard(pid)
+
+        def onStop(signum, frame) -> None:
+            sys.exit(0)
+
+        signal.signal(signal.SIGCHLD, onChildExit)
+        signal.signal(signal.SIGTERM, onStop)
+        signal.signal(signal.SIGINT, onStop)
+
+        sock = createListenSocket(args.listen)
+        announceListening(sock)
+
+        try:
+            while True:
+                conn, _ = sock.accept()
+
+                # so a child exiting at once is not reaped before being added
+                signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGCHLD})
+                pid = os.fork()
+
+                if pid == 0:
+                    sock.close()
+                    for signum in (signal.SIGCHLD, signal.SIGTERM, signal.SIGINT):
+                        signal.signal(signum, signal.SIG_DFL)
+                    signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGCHLD})
+
+                    status = 0
                     try:
-                        await processNotification(notification)
-                    except Exception as error:
-                        errorStr = f"{error.__class__.__name__}: {error}"
-                        Logger.error(
-                            f"worker: notification '{notification.event}' failed: {errorStr}"
-                        )
-                        if not isinstance(error, TypeError):
-                            traceback.print_tb(error.__traceback__)
-
-            except Exception:
-                break
-
-        Logger.debug("worker: run() done")
-
-    async def shutdown() -> None:
-        Logger.debug("worker: shutdown()")
-
-        # close channel
-        await channel.close()
-
-        # close all players
-        for player in players.values():
-            if player.audio:
-                player.audio.stop()
-            if player.video:
-                player.video.stop()
-        players.clear()
-
-        # close all handlers
-        for handler in handlers.values():
-            await handler.close()
-        handlers.clear()
-
-        # stop the loop (just in case)
-        loop.stop()
-
-        Logger.debug("worker: shutdown() done")
-
-    try:
-        loop.run_until_complete(
-            run(channel)
-        )
-    # reached after calling channel closure
-    except RuntimeError:
-        pass
-    finally:
-        loop.run_until_complete(
-            shutdown()
-        )
+                        serveForked(conn, sdp)
+                    except BaseException:
+                        status = 1
+                    finally:
+                        Logger.close()
+                        os._exit(status)
+
+                Logger.debug("worker: Node.js process connected [pid:%s]", pid)
+
+                children.add(pid)
+                signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGCHLD})
+                conn.close()
+
+        finally:
+            Logger.debug("worker: stop listening")
+
+            removeListenSocket(sock)
+            sock.close()
+
+            for pid in list(children):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    if args.fork:
+        fork()
+
+    elif args.listen:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        prepareRtpCapabilities(loop)
+        prepareCertificatePool(loop)
+
+        try:
+            loop.run_until_complete(listen(loop))
+        finally:
+            certificatePool.close()
+            loop.close()
+
+    else:
+        # get/create event loop
+        loop = asyncio.get_event_loop()
+        prepareRtpCapabilities(loop)
+        prepareCertificatePool(loop)
+
+        session = createSession(loop, Channel(CHANNEL_FD, codec), STARTED_AT)
+
+        try:
+            loop.run_until_complete(
+                session.run()
+            )
+        # reached after calling channel closure
+        except RuntimeError:
+            pass
+        finally:
+            loop.run_until_complete(
+                session.close()
+            )
+            certificatePool.close()